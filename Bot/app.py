@@ -1,23 +1,70 @@
+import hmac
 import os
 import time
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
-from web3 import Web3
 
 import config
-from bot_logger import get_logs
+import event_indexer
+import fleet
+import metrics
+import profiler
+import tracing
+import warmup
+from bot_logger import get_logs, info as log_info
 from bot_runner import BotRunner
 from notifier import send_test_email
+from proof_queue import get_proof
+from trade_archive import start_archiver
+from trade_export import FORMATS, export_stream
+from trade_ingest import get_ingestor
+from trade_rollups import RESOLUTIONS_MS, get_rollups, summarize
+from trade_store import get_run, get_run_trades, get_user_runs, get_user_trades
+from ttl_cache import cached_view
 from uniswap import get_account, get_web3
+from valkey_client import health as valkey_health
 
 app = Flask(__name__)
 CORS(app)
 
 runner = BotRunner()
 
+metrics.gauge("bot_runner_running", "1 while the in-process runner is active.", lambda: int(runner.is_running))
+metrics.gauge("bot_runner_iterations", "Iterations of the in-process runner's current run.", lambda: runner.iterations)
+
+
+@app.before_request
+def _start_timer():
+    g.t0 = time.perf_counter()
+
+
+@app.after_request
+def _record_latency(response):
+    # Streamed responses (exports) are timed up to the first byte.
+    t0 = g.pop("t0", None)
+    if t0 is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.API_SECONDS.observe(time.perf_counter() - t0, route, request.method, str(response.status_code))
+    return response
+
+
+def _is_address(value) -> bool:
+    from eth_utils import is_address  # imported on first use: it adds ~0.2 s to startup
+
+    return is_address(value)
+
+
+def _info_ttl():
+    return config.API_INFO_CACHE_TTL
+
+
+def _read_ttl():
+    return config.API_READ_CACHE_TTL
+
 
 @app.route("/bot/info", methods=["GET"])
+@cached_view(_info_ttl)
 def bot_info():
     """Return bot address and balance when PRIVATE_KEY is set; otherwise empty address (recipient comes from frontend at start)."""
     try:
@@ -33,7 +80,7 @@ def bot_info():
             "bot_recipient_address": addr,
             "wallet_address": addr,
             "eth_balance_wei": str(eth_balance_wei),
-            "eth_balance": str(Web3.from_wei(eth_balance_wei, "ether")),
+            "eth_balance": str(w3.from_wei(eth_balance_wei, "ether")),
             "network": "sepolia",
         })
     except Exception as e:
@@ -52,7 +99,7 @@ _FORBIDDEN_REQUEST_KEYS = frozenset({
 
 @app.route("/bot/start", methods=["POST"])
 def bot_start():
-    if runner.is_running:
+    if runner.is_running and not config.FLEET_MODE:
         return jsonify({"status": "error", "message": "Bot is already running"}), 409
 
     data = request.get_json(silent=True) or {}
@@ -68,7 +115,7 @@ def bot_start():
     # Vault address always from bot env; session key from frontend (UI) when starting the bot
     vault_address = config.MOCK_VAULT_ADDRESS
 
-    if bot_recipient_address is not None and not Web3.is_address(bot_recipient_address):
+    if bot_recipient_address is not None and not _is_address(bot_recipient_address):
         return jsonify({"status": "error", "message": "Invalid bot_recipient_address (must be 0x address)"}), 400
 
     if session_key_expiry is not None:
@@ -79,12 +126,44 @@ def bot_start():
         if session_key_expiry < time.time():
             return jsonify({"status": "error", "message": "Session key expiry is in the past"}), 400
 
+    if config.FLEET_MODE:
+        run_id = fleet.enqueue_run(session_key_expiry, session_key_address, vault_address, smart_account_address, bot_recipient_address)
+        return jsonify({"status": "ok", "message": "Bot queued", "run_id": run_id})
+
     runner.start(session_key_expiry, session_key_address, vault_address, smart_account_address, bot_recipient_address)
     return jsonify({"status": "ok", "message": "Bot started"})
 
 
+def _fleet_run_id():
+    """run_id from the query/body, else the latest run queued for `wallet` (smart account).
+
+    There is no process-wide "current run" in fleet mode, so without either one the
+    request cannot be tied to a run.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        data = {}
+    run_id = request.args.get("run_id") or data.get("run_id")
+    if run_id:
+        return run_id
+    wallet = request.args.get("wallet") or data.get("wallet")
+    if wallet and _is_address(wallet):
+        return fleet.latest_run_id(wallet)
+    return None
+
+
+_RUN_ID_REQUIRED = {"status": "error", "message": "run_id (or wallet) required in fleet mode"}
+
+
 @app.route("/bot/stop", methods=["POST"])
 def bot_stop():
+    if config.FLEET_MODE:
+        run_id = _fleet_run_id()
+        if not run_id:
+            return jsonify(_RUN_ID_REQUIRED), 400
+        fleet.request_stop(run_id)
+        return jsonify({"status": "ok", "message": "Bot stopping", "run_id": run_id})
+
     if not runner.is_running:
         return jsonify({"status": "error", "message": "Bot is not running"}), 409
 
@@ -94,7 +173,13 @@ def bot_stop():
 
 @app.route("/bot/status", methods=["GET"])
 def bot_status():
-    status = runner.get_status()
+    if config.FLEET_MODE:
+        run_id = _fleet_run_id()
+        if not run_id:
+            return jsonify(_RUN_ID_REQUIRED), 400
+        status = fleet.get_run_status(run_id)
+    else:
+        status = runner.get_status()
     if status.get("error"):
         err = str(status["error"])
         if "private_key" in err.lower() or "private key" in err.lower():
@@ -105,10 +190,236 @@ def bot_status():
 
 @app.route("/bot/logs", methods=["GET"])
 def bot_logs():
-    """Return recent bot logs for real-time dashboard display."""
+    """Return recent bot logs for real-time dashboard display.
+
+    Clients pass `after` (the last `seq` they received) and get only newer entries;
+    `cursor` in the response is the value to send next time. `run_id` reads a single
+    run's buffer (required in fleet mode, or `wallet` for that wallet's latest run).
+    `since` (timestamp) is still accepted for older clients.
+    """
     since = request.args.get("since", type=float)
-    logs = get_logs(since_ts=since)
-    return jsonify({"logs": logs})
+    after = request.args.get("after", type=int)
+    run_id = request.args.get("run_id") or None
+    if config.FLEET_MODE and not run_id:
+        run_id = _fleet_run_id()
+        if not run_id:
+            return jsonify(_RUN_ID_REQUIRED), 400
+    limit = request.args.get("limit", type=int)
+    logs = get_logs(since_ts=since, after_seq=after, run_id=run_id, limit=limit)
+    cursor = logs[-1]["seq"] if logs else after
+    return jsonify({"logs": logs, "cursor": cursor})
+
+
+@app.route("/insights/rollups", methods=["GET"])
+@cached_view(_read_ttl)
+def insights_rollups():
+    """Trade counts and wei totals per minute/hour/day bucket for a wallet or run.
+
+    Query: wallet or run_id, start/end (ms, default last 24h), resolution (minute|hour|day).
+    """
+    wallet = request.args.get("wallet")
+    run_id = request.args.get("run_id")
+    if not (wallet or run_id):
+        return jsonify({"status": "error", "message": "wallet or run_id required"}), 400
+    if wallet and not _is_address(wallet):
+        return jsonify({"status": "error", "message": "Invalid wallet"}), 400
+    end = request.args.get("end", type=int)
+    if end is None:
+        end = int(time.time() * 1000)
+    start = request.args.get("start", type=int)
+    if start is None:
+        start = end - 86_400_000
+    if start > end:
+        return jsonify({"status": "error", "message": "start must not be after end"}), 400
+    resolution = request.args.get("resolution")
+    if resolution and resolution not in RESOLUTIONS_MS:
+        return jsonify({"status": "error", "message": "resolution must be minute, hour or day"}), 400
+    scope, scope_id = ("run", run_id) if run_id else ("user", wallet)
+    try:
+        buckets = get_rollups(scope, scope_id, start, end, resolution)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Range too large for resolution"}), 400
+    return jsonify({"buckets": buckets, "totals": summarize(buckets)})
+
+
+@app.route("/trades", methods=["GET"])
+def trades_list():
+    """One page of trades for a wallet or run, newest first.
+
+    Query: wallet or run_id, start/end (ms), side, status, limit (max 5000), cursor,
+    order (desc|asc). Pass `next_cursor` from the response to get the next page;
+    it is null on the last page.
+    """
+    wallet = request.args.get("wallet")
+    run_id = request.args.get("run_id")
+    if not (wallet or run_id):
+        return jsonify({"status": "error", "message": "wallet or run_id required"}), 400
+    if wallet and not _is_address(wallet):
+        return jsonify({"status": "error", "message": "Invalid wallet"}), 400
+    order = request.args.get("order", "desc")
+    if order not in ("asc", "desc"):
+        return jsonify({"status": "error", "message": "order must be asc or desc"}), 400
+    kwargs = dict(
+        start_ms=request.args.get("start", type=int),
+        end_ms=request.args.get("end", type=int),
+        side=request.args.get("side"),
+        status=request.args.get("status"),
+        limit=request.args.get("limit", default=100, type=int),
+        cursor=request.args.get("cursor") or None,
+        newest_first=order == "desc",
+    )
+    try:
+        if run_id:
+            trades, next_cursor = get_run_trades(run_id, **kwargs)
+        else:
+            trades, next_cursor = get_user_trades(wallet, **kwargs)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid cursor"}), 400
+    return jsonify({"trades": [t.to_dict() for t in trades], "next_cursor": next_cursor})
+
+
+@app.route("/trades/export", methods=["GET"])
+def trades_export():
+    """Stream every matching trade as NDJSON or CSV.
+
+    Query: wallet or run_id, start/end (ms), side, status, order (desc|asc),
+    format (ndjson|csv), gzip=1. Rows are streamed as they are read, so large
+    exports never sit in memory.
+    """
+    wallet = request.args.get("wallet")
+    run_id = request.args.get("run_id")
+    if not (wallet or run_id):
+        return jsonify({"status": "error", "message": "wallet or run_id required"}), 400
+    if wallet and not _is_address(wallet):
+        return jsonify({"status": "error", "message": "Invalid wallet"}), 400
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in FORMATS:
+        return jsonify({"status": "error", "message": "format must be ndjson or csv"}), 400
+    order = request.args.get("order", "desc")
+    if order not in ("asc", "desc"):
+        return jsonify({"status": "error", "message": "order must be asc or desc"}), 400
+    gzip = request.args.get("gzip", "").lower() in ("1", "true")
+    body = export_stream(
+        fmt,
+        wallet=wallet,
+        run_id=run_id,
+        gzip=gzip,
+        start_ms=request.args.get("start", type=int),
+        end_ms=request.args.get("end", type=int),
+        side=request.args.get("side"),
+        status=request.args.get("status"),
+        newest_first=order == "desc",
+    )
+    name = (run_id or wallet).replace(":", "-")
+    headers = {"Content-Disposition": f'attachment; filename="trades-{name}.{fmt}{".gz" if gzip else ""}"'}
+    # A .gz file, not a compressed transfer: clients must not unpack it on the way in.
+    mimetype = "application/gzip" if gzip else FORMATS[fmt]
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+
+@app.route("/runs/<run_id>", methods=["GET"])
+@cached_view(_read_ttl)
+def run_detail(run_id):
+    """Run record with its lifetime trade metrics."""
+    run = get_run(run_id)
+    if run is None:
+        return jsonify({"status": "error", "message": "Run not found"}), 404
+    return jsonify(run)
+
+
+@app.route("/runs/<run_id>/traces", methods=["GET"])
+def run_traces(run_id):
+    """Newest per-iteration traces for a run (spans per phase), plus per-span mean/max."""
+    limit = min(request.args.get("limit", default=50, type=int), 500)
+    traces = tracing.get_traces(run_id, limit=limit)
+    return jsonify({"run_id": run_id, "traces": traces, "summary": tracing.summarize(traces)})
+
+
+@app.route("/runs", methods=["GET"])
+@cached_view(_read_ttl)
+def runs_list():
+    """Most recent runs for a wallet."""
+    wallet = request.args.get("wallet")
+    if not wallet or not _is_address(wallet):
+        return jsonify({"status": "error", "message": "Valid wallet required"}), 400
+    limit = min(request.args.get("limit", default=50, type=int), 500)
+    return jsonify({"runs": get_user_runs(wallet, limit=limit)})
+
+
+@app.route("/vault/events", methods=["GET"])
+@cached_view(_read_ttl)
+def vault_events():
+    """Indexed vault events (see event_indexer), newest first.
+
+    Query: vault (default MOCK_VAULT_ADDRESS), wallet (user, caller or recipient),
+    event (e.g. WithdrawnTo), from_block, to_block, limit (max 1000), order (desc|asc).
+    """
+    vault = request.args.get("vault") or config.MOCK_VAULT_ADDRESS
+    wallet = request.args.get("wallet")
+    if not vault or not _is_address(vault):
+        return jsonify({"status": "error", "message": "Valid vault required"}), 400
+    if wallet and not _is_address(wallet):
+        return jsonify({"status": "error", "message": "Invalid wallet"}), 400
+    order = request.args.get("order", "desc")
+    if order not in ("asc", "desc"):
+        return jsonify({"status": "error", "message": "order must be asc or desc"}), 400
+    events = event_indexer.vault_events(
+        vault,
+        account=wallet,
+        event=request.args.get("event"),
+        from_block=request.args.get("from_block", type=int),
+        to_block=request.args.get("to_block", type=int),
+        limit=min(request.args.get("limit", default=100, type=int), 1000),
+        newest_first=order == "desc",
+    )
+    return jsonify({"events": events, "indexer": event_indexer.status()})
+
+
+@app.route("/proofs/<swap_tx>", methods=["GET"])
+def proof_detail(swap_tx):
+    """Proof queue state for a swap plus its indexed on-chain log (TradeLogged or BatchLogged)."""
+    proof = get_proof(swap_tx)
+    onchain = event_indexer.trade_log(swap_tx)
+    if onchain is None and proof.get("batch_root"):
+        onchain = event_indexer.batch_log(proof["batch_root"])
+    if not proof and onchain is None:
+        return jsonify({"status": "error", "message": "Proof not found"}), 404
+    return jsonify({"proof": proof or None, "onchain": onchain})
+
+
+@app.route("/health", methods=["GET"])
+def health():
+    """Liveness plus Valkey round-trip latency and pool usage."""
+    valkey_status = valkey_health()
+    return jsonify({"status": "ok" if valkey_status["ok"] else "degraded", "valkey": valkey_status}), (
+        200 if valkey_status["ok"] else 503)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Counters, latency histograms and queue depths in the Prometheus text format."""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/admin/profile", methods=["POST"])
+def admin_profile():
+    """Sample all threads for `seconds` and return folded stacks (flamegraph.pl / speedscope).
+
+    Needs `Authorization: Bearer <ADMIN_TOKEN>`; disabled when ADMIN_TOKEN is unset.
+    """
+    if not config.ADMIN_TOKEN:
+        return jsonify({"status": "error", "message": "Admin endpoints disabled (set ADMIN_TOKEN)"}), 403
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(token, config.ADMIN_TOKEN):
+        return jsonify({"status": "error", "message": "Invalid admin token"}), 401
+    seconds = request.args.get("seconds", default=10, type=float)
+    if not 0 < seconds <= config.PROFILE_MAX_SECONDS:
+        return jsonify({"status": "error", "message": f"seconds must be in (0, {config.PROFILE_MAX_SECONDS:g}]"}), 400
+    try:
+        folded = profiler.profile(seconds, request.args.get("interval_ms", type=float))
+    except profiler.ProfilerBusy as e:
+        return jsonify({"status": "error", "message": str(e)}), 409
+    return Response(folded, mimetype="text/plain")
 
 
 @app.route("/bot/test-email", methods=["POST"])
@@ -120,8 +431,22 @@ def bot_test_email():
     return jsonify({"status": "error", "message": "Failed to send test email"}), 500
 
 
+def start_background_services():
+    """Start the per-process background work (also called per worker by serve.py)."""
+    # Pick up a run interrupted by a crash or redeploy (no-op when none is pending).
+    # In fleet mode the workers own resumption.
+    if not config.FLEET_MODE:
+        runner.resume_unfinished()
+    get_ingestor().start()  # replays trades spilled before a restart
+    start_archiver()
+    event_indexer.start_indexer()
+    warmup.start()
+
+
 if __name__ == "__main__":
+    # Development server; use `python serve.py` in production.
     port = int(os.environ.get("BOT_API_PORT", 5001))
-    print(f"Starting Bot API on port {port}...")
-    print("Routes:", [r.rule for r in app.url_map.iter_rules()])
+    log_info(f"Starting Bot API on port {port}...")
+    log_info(f"Routes: {[r.rule for r in app.url_map.iter_rules()]}")
+    start_background_services()
     app.run(host="0.0.0.0", port=port, debug=False)
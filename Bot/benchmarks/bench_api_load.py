@@ -0,0 +1,149 @@
+"""Load test for the Bot API read path against a local JSON-RPC stand-in.
+
+Starts a fake Ethereum RPC (fixed latency per call) and two API servers in turn:
+
+    baseline   python app.py   (Werkzeug dev server, response caches off)
+    serving    python serve.py (gunicorn, response caches on); falls back to the dev
+               server with caches on when gunicorn is not installed
+
+then hammers GET /bot/info (or --path) from --concurrency client threads and
+reports requests/sec and latency percentiles. Use a local, disposable Valkey.
+
+    python benchmarks/bench_api_load.py --duration 10 --concurrency 32 --rpc-latency-ms 40
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from mock_rpc import start_rpc
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Well-known local test key (Hardhat/Anvil account #0); never holds real funds.
+TEST_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(script: str, port: int, rpc_url: str, cache: bool) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "BOT_API_PORT": str(port),
+        "RPC_URL": rpc_url,
+        "PRIVATE_KEY": TEST_KEY,
+        "API_INFO_CACHE_TTL": "5" if cache else "0",
+        "API_READ_CACHE_TTL": "2" if cache else "0",
+        "TRADE_ARCHIVE_INTERVAL": "0",
+        "INDEXER_POLL_INTERVAL": "0",
+        "FLEET_MODE": "false",
+    })
+    proc = subprocess.Popen([sys.executable, script], cwd=BOT_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            return proc
+        except requests.RequestException:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{script} exited with {proc.returncode}")
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{script} did not start")
+
+
+def load(url: str, duration: float, concurrency: int) -> dict:
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        session = requests.Session()
+        mine, failed = [], 0
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            try:
+                ok = session.get(url, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            if ok:
+                mine.append(time.perf_counter() - t0)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+
+    def pct(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1) if latencies else None
+
+    return {"requests": len(latencies), "errors": errors[0], "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": pct(0.50), "p99_ms": pct(0.99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rpc-latency-ms", type=float, default=40)
+    parser.add_argument("--path", default="/bot/info")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    try:
+        import gunicorn  # noqa: F401
+        serving_script = "serve.py"
+    except ImportError:
+        serving_script = "app.py"
+
+    rpc = start_rpc(args.rpc_latency_ms / 1000)
+    rpc_url = f"http://127.0.0.1:{rpc.server_port}"
+    results = {}
+    try:
+        for name, script, cache in (("baseline", "app.py", False), ("serving", serving_script, True)):
+            port = _free_port()
+            proc = start_api(script, port, rpc_url, cache)
+            try:
+                results[name] = load(f"http://127.0.0.1:{port}{args.path}", args.duration, args.concurrency)
+                results[name]["server"] = script
+            finally:
+                proc.terminate()
+                proc.wait(10)
+    finally:
+        rpc.shutdown()
+    if results["baseline"]["rps"]:
+        results["rps_gain"] = round(results["serving"]["rps"] / results["baseline"]["rps"], 1)
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    for name in ("baseline", "serving"):
+        r = results[name]
+        print(f"{name:>9} ({r['server']}): {r['rps']:>8} req/s   p50 {r['p50_ms']} ms   p99 {r['p99_ms']} ms"
+              f"   errors {r['errors']}")
+    if "rps_gain" in results:
+        print(f"throughput x{results['rps_gain']}")
+
+
+if __name__ == "__main__":
+    main()
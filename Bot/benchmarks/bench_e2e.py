@@ -0,0 +1,345 @@
+"""End-to-end load harness: N concurrent bot sessions against a local stack, fully offline.
+
+Starts, on 127.0.0.1:
+
+    store      an in-memory Valkey stand-in (fakeredis TCP server in this process), or a
+               real local Valkey with --valkey (VALKEY_HOST/VALKEY_PORT; it is flushed)
+    chain      mock_rpc.VaultChain: JSON-RPC with MockVault balances, withdrawalCount and
+               WithdrawnTo logs (no EVM; see mock_rpc)
+    API        python app.py (or serve.py with --serve) in FLEET_MODE
+    workers    --workers x python fleet.py
+
+then starts --sessions runs through POST /bot/start (--ramp per second). Each session
+is one client thread acting as the dashboard: it polls /bot/status and /bot/logs
+every --poll-interval and, when the bot asks for a BUY (`pending_withdraw`), does the
+smart account's withdrawTo on the mock chain. Sessions still running after
+--duration are stopped through POST /bot/stop.
+
+Reports trades/s, RPC calls per trade (by method), API latency percentiles per route,
+BUY confirm latency (from run traces) and RSS growth of the API and workers.
+
+    python benchmarks/bench_e2e.py --sessions 200 --workers 4 --duration 120
+"""
+
+import argparse
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+import redis
+import requests
+from eth_utils import keccak, to_checksum_address
+
+from mock_rpc import VaultChain, start_rpc
+
+WORKERS_KEY = "fleet:workers"  # fleet.WORKERS_KEY; not imported so config is read only by the subprocesses
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Well-known local test key (Hardhat/Anvil account #0); never holds real funds.
+TEST_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"
+VAULT = to_checksum_address("0x" + "5a" * 20)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _address(kind: str, i: int) -> str:
+    return to_checksum_address(keccak(text=f"bench-e2e:{kind}:{i}")[-20:])
+
+
+def _rss_kb(pid: int) -> int:
+    """Resident set size from /proc (0 where that is not available)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _pct(values: list, p: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 1)
+
+
+def _latency(values: list) -> dict:
+    return {"count": len(values), "p50_ms": _pct(values, 0.50), "p95_ms": _pct(values, 0.95),
+            "p99_ms": _pct(values, 0.99), "max_ms": _pct(values, 1.0)}
+
+
+def start_store(use_valkey: bool):
+    """(host, port, server or None) of an empty store the subprocesses can share."""
+    if use_valkey:
+        host, port = os.getenv("VALKEY_HOST", "localhost"), int(os.getenv("VALKEY_PORT", "6379"))
+        redis.Redis(host=host, port=port).flushall()
+        return host, port, None
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer(("127.0.0.1", _free_port()), server_type="redis")
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return "127.0.0.1", server.server_address[1], server
+
+
+def spawn(script: str, env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, script], cwd=BOT_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_healthy(url: str, proc: subprocess.Popen, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(f"{url}/health", timeout=1)
+            return
+        except requests.RequestException:
+            if proc.poll() is not None:
+                raise RuntimeError(f"API exited with {proc.returncode}")
+            time.sleep(0.2)
+    raise RuntimeError("API did not start")
+
+
+class Session(threading.Thread):
+    """One dashboard: start a run, poll it, fund its BUYs, until it stops."""
+
+    def __init__(self, i: int, api: str, chain: VaultChain, args, stop_at: float, stats):
+        super().__init__(name=f"session-{i}", daemon=True)
+        self.i, self.api, self.chain, self.args, self.stop_at, self.stats = i, api, chain, args, stop_at, stats
+        self.user = _address("account", i)
+        self.session_key = _address("session-key", i)
+        self.recipient = _address("recipient", i)
+        self.run_id = None
+        self.funded: set = set()
+        self.http = requests.Session()
+
+    def _request(self, route: str, method: str, path: str, **kw):
+        t0 = time.perf_counter()
+        try:
+            resp = self.http.request(method, self.api + path, timeout=30, **kw)
+            ok = resp.status_code == 200
+        except requests.RequestException:
+            resp, ok = None, False
+        self.stats.observe(route, time.perf_counter() - t0, ok)
+        return resp.json() if ok else None
+
+    def run(self):
+        started = self._request("start", "POST", "/bot/start", json={
+            "session_key_expiry": time.time() + 3600,
+            "session_key_address": self.session_key,
+            "smart_account_address": self.user,
+            "bot_recipient_address": self.recipient,
+        })
+        if not started:
+            return
+        self.run_id = started["run_id"]
+        cursor = None
+        stopping = False
+        while True:
+            status = self._request("status", "GET", "/bot/status", params={"run_id": self.run_id})
+            params = {"run_id": self.run_id} if cursor is None else {"run_id": self.run_id, "after": cursor}
+            logs = self._request("logs", "GET", "/bot/logs", params=params)
+            if logs:
+                cursor = logs["cursor"]
+            if status:
+                pending = status.get("pending_withdraw")
+                if pending and pending["reason"] not in self.funded:
+                    self.funded.add(pending["reason"])
+                    self.chain.withdraw_to(pending["vault_address"], self.user, pending["recipient_address"],
+                                           int(pending["amount_wei"]), pending["session_key_address"])
+                    self.stats.withdraw_sent(self.run_id)
+                if not status.get("is_running"):
+                    return
+            if not stopping and time.time() > self.stop_at:
+                self._request("stop", "POST", "/bot/stop", json={"run_id": self.run_id})
+                stopping = True
+            time.sleep(self.args.poll_interval)
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)
+        self.errors = Counter()
+        self.withdrawals = Counter()
+
+    def observe(self, route: str, seconds: float, ok: bool):
+        with self.lock:
+            self.latency[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+
+    def withdraw_sent(self, run_id: str):
+        with self.lock:
+            self.withdrawals[run_id] += 1
+
+
+def buy_confirm_latency(store: redis.Redis, run_ids: list) -> list:
+    """Seconds from the bot asking for a BUY to its WithdrawnTo log being matched (confirm spans)."""
+    out = []
+    for run_id in run_ids:
+        for raw in store.lrange(f"{run_id}:traces", 0, -1):
+            trace = json.loads(raw)
+            if trace.get("side") != "BUY" or trace.get("error"):
+                continue
+            for span in trace["spans"]:
+                if span["name"] == "confirm" and "duration_ms" in span:
+                    out.append(span["duration_ms"] / 1000)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4, help="fleet.py worker processes")
+    parser.add_argument("--ramp", type=float, default=20, help="session starts per second")
+    parser.add_argument("--duration", type=float, default=120, help="seconds before unfinished runs are stopped")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="dashboard status/log poll, seconds")
+    parser.add_argument("--rpc-latency-ms", type=float, default=5)
+    parser.add_argument("--valkey", action="store_true", help="use the Valkey at VALKEY_HOST/VALKEY_PORT (flushed)")
+    parser.add_argument("--serve", action="store_true", help="run the API with serve.py instead of app.py")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    host, port, store_server = start_store(args.valkey)
+    store = redis.Redis(host=host, port=port, decode_responses=True)
+    rpc = start_rpc(args.rpc_latency_ms / 1000, chain=VaultChain())
+    chain = rpc.chain
+    api_port = _free_port()
+    api = f"http://127.0.0.1:{api_port}"
+    env = dict(os.environ)
+    env.update({
+        "VALKEY_BACKEND": "valkey",
+        "VALKEY_HOST": host,
+        "VALKEY_PORT": str(port),
+        "RPC_URL": f"http://127.0.0.1:{rpc.server_port}",
+        "PRIVATE_KEY": TEST_KEY,
+        "MOCK_VAULT_ADDRESS": VAULT,
+        "BOT_API_PORT": str(api_port),
+        "FLEET_MODE": "true",
+        "FLEET_MAX_RUNS_PER_WORKER": str(math.ceil(args.sessions / args.workers)),
+        "FLEET_LEASE_TTL_MS": "6000",  # status snapshots every 2 s
+        "LOG_STREAM_PERSIST": "true",
+        "WITHDRAWAL_POLL_INTERVAL": "0.5",
+        "TRADE_ARCHIVE_INTERVAL": "0",
+        "INDEXER_POLL_INTERVAL": "0",
+        "METRICS_PORT": "0",
+        "RESEND_API_KEY": "",
+        "PINATA_JWT": "",
+        "COINGECKO_API_KEY": "",
+    })
+    procs = {}
+    try:
+        procs["api"] = spawn("serve.py" if args.serve else "app.py", env)
+        wait_healthy(api, procs["api"])
+        for w in range(args.workers):
+            procs[f"worker-{w}"] = spawn("fleet.py", env)
+        deadline = time.time() + 30
+        while store.scard(WORKERS_KEY) < args.workers and time.time() < deadline:
+            time.sleep(0.2)
+        rss_start = {name: _rss_kb(p.pid) for name, p in procs.items()}
+        rss_peak = dict(rss_start)
+        store_mem_start = store.info("memory").get("used_memory") if args.valkey else None
+
+        stats = Stats()
+        sessions = []
+        t0, cpu0 = time.perf_counter(), time.process_time()
+        stop_at = time.time() + args.duration
+        for i in range(args.sessions):
+            s = Session(i, api, chain, args, stop_at, stats)
+            s.start()
+            sessions.append(s)
+            time.sleep(1 / args.ramp)
+        while any(s.is_alive() for s in sessions):
+            for name, p in procs.items():
+                rss_peak[name] = max(rss_peak[name], _rss_kb(p.pid))
+            time.sleep(1)
+        elapsed = time.perf_counter() - t0
+        client_cpu = time.process_time() - cpu0
+        rss_end = {name: _rss_kb(p.pid) for name, p in procs.items()}
+        store_mem_end = store.info("memory").get("used_memory") if args.valkey else None
+
+        run_ids = [s.run_id for s in sessions if s.run_id]
+        trades = Counter()
+        for run_id in run_ids:
+            m = store.hgetall(f"{run_id}:metrics")
+            trades["total"] += int(m.get("trades_total", 0))
+            trades["buy"] += int(m.get("buy_confirmed", 0))
+            trades["sell"] += int(m.get("sell_confirmed", 0))
+            trades["buy_timeout"] += int(m.get("buy_timeout", 0))
+        rpc_calls = {k: v for k, v in chain.counts.items() if ":" not in k}
+        total_calls = sum(rpc_calls.values())
+        per_trade = (lambda n: round(n / trades["total"], 2)) if trades["total"] else (lambda n: None)
+
+        results = {
+            "sessions": len(run_ids),
+            "workers": args.workers,
+            "elapsed_s": round(elapsed, 1),
+            # This process (sessions, mock chain, in-memory store) shares the host with the stack.
+            "client_cpu_s": round(client_cpu, 1),
+            "trades": dict(trades),
+            "trades_per_s": round(trades["total"] / elapsed, 2),
+            "withdrawals_sent": sum(stats.withdrawals.values()),
+            "rpc_calls": total_calls,
+            "rpc_calls_per_trade": per_trade(total_calls),
+            "rpc_per_trade_by_method": {k: per_trade(v) for k, v in sorted(rpc_calls.items(), key=lambda kv: -kv[1])},
+            "eth_call_by_function": {k.split(":", 1)[1]: v for k, v in chain.counts.items() if k.startswith("eth_call:")},
+            "api_latency": {route: _latency(v) for route, v in stats.latency.items()},
+            "api_errors": dict(stats.errors),
+            "buy_confirm_latency": _latency(buy_confirm_latency(store, run_ids)),
+            "rss_kb": {name: {"start": rss_start[name], "peak": rss_peak[name], "end": rss_end[name],
+                              "growth": rss_end[name] - rss_start[name]} for name in procs},
+        }
+        if store_mem_start is not None:
+            results["valkey_used_memory_growth"] = store_mem_end - store_mem_start
+    finally:
+        for p in procs.values():
+            p.terminate()
+        for p in procs.values():
+            try:
+                p.wait(15)
+            except subprocess.TimeoutExpired:
+                p.kill()
+        rpc.shutdown()
+        if store_server is not None:
+            store_server.shutdown()
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    t = results["trades"]
+    print(f"{results['sessions']} sessions on {args.workers} workers in {results['elapsed_s']} s: "
+          f"{t.get('total', 0)} trades ({t.get('buy', 0)} BUY, {t.get('sell', 0)} SELL, "
+          f"{t.get('buy_timeout', 0)} BUY timeouts), {results['trades_per_s']} trades/s")
+    print(f"harness CPU: {results['client_cpu_s']} s of {results['elapsed_s']} s")
+    print(f"RPC: {results['rpc_calls']} calls, {results['rpc_calls_per_trade']} per trade")
+    for method, n in results["rpc_per_trade_by_method"].items():
+        print(f"  {method:<28} {n} per trade")
+    print("API latency (ms):")
+    for route, r in results["api_latency"].items():
+        print(f"  {route:<8} n={r['count']:<7} p50 {r['p50_ms']}  p95 {r['p95_ms']}  p99 {r['p99_ms']}  "
+              f"max {r['max_ms']}  errors {results['api_errors'].get(route, 0)}")
+    b = results["buy_confirm_latency"]
+    print(f"BUY confirm (ms): n={b['count']} p50 {b['p50_ms']}  p95 {b['p95_ms']}  p99 {b['p99_ms']}")
+    print("RSS (MB): start -> peak -> end")
+    for name, r in results["rss_kb"].items():
+        print(f"  {name:<9} {r['start'] / 1024:.1f} -> {r['peak'] / 1024:.1f} -> {r['end'] / 1024:.1f}"
+              f"  (growth {r['growth'] / 1024:+.1f})")
+    if "valkey_used_memory_growth" in results:
+        print(f"Valkey used_memory growth: {results['valkey_used_memory_growth'] / 1024 / 1024:+.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
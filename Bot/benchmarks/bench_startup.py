@@ -0,0 +1,100 @@
+"""Startup-time benchmark: module import cost and API cold start to first request.
+
+For each entry point it runs `python -c "import <module>"` in fresh processes and reports
+the median wall time. It then starts `python app.py` (in-memory Valkey, local mock RPC)
+and times process start to the first 200 from GET /health and from GET /bot/info,
+the first request that needs the chain client.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+from bench_api_load import TEST_KEY, _free_port
+from mock_rpc import start_rpc
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ("config", "valkey_client", "trade_store", "bot_runner", "fleet", "app", "bot")
+
+
+def _env(**extra) -> dict:
+    env = dict(os.environ)
+    env.update({"VALKEY_BACKEND": "memory", "LOG_SINKS": "none", "TRADE_ARCHIVE_INTERVAL": "0",
+                "INDEXER_POLL_INTERVAL": "0", "API_INFO_CACHE_TTL": "0"})
+    env.update(extra)
+    return env
+
+
+def import_time(module: str, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=BOT_DIR, env=_env(), check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def _first_ok(url: str, proc: subprocess.Popen, t0: float, timeout: float = 60) -> float:
+    while time.perf_counter() - t0 < timeout:
+        try:
+            if requests.get(url, timeout=10).status_code == 200:
+                return time.perf_counter() - t0
+        except requests.RequestException:
+            if proc.poll() is not None:
+                raise RuntimeError(f"app.py exited with {proc.returncode}")
+        time.sleep(0.01)
+    raise RuntimeError(f"no 200 from {url}")
+
+
+def cold_start(rpc_url: str) -> dict:
+    port = _free_port()
+    env = _env(BOT_API_PORT=str(port), RPC_URL=rpc_url, PRIVATE_KEY=TEST_KEY, FLEET_MODE="false")
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "app.py"], cwd=BOT_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        health = _first_ok(f"http://127.0.0.1:{port}/health", proc, t0)
+        info = _first_ok(f"http://127.0.0.1:{port}/bot/info", proc, t0)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    return {"health_s": round(health, 3), "info_s": round(info, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per measurement (median)")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = {"python_s": round(import_time("sys", args.runs), 3), "import_s": {}}
+    for module in MODULES:
+        results["import_s"][module] = round(import_time(module, args.runs), 3)
+    rpc = start_rpc()
+    try:
+        starts = [cold_start(f"http://127.0.0.1:{rpc.server_port}") for _ in range(args.runs)]
+    finally:
+        rpc.shutdown()
+    results["cold_start"] = {k: round(statistics.median(s[k] for s in starts), 3) for k in starts[0]}
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"interpreter alone: {results['python_s']} s")
+    for module, t in results["import_s"].items():
+        print(f"import {module:<14} {t:.3f} s")
+    c = results["cold_start"]
+    print(f"app.py start -> first /health: {c['health_s']:.3f} s, first /bot/info: {c['info_s']:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""Benchmark suite for the bot's hot paths, compared against a stored baseline.
+
+Cases:
+    strategy.*    compute_sma / evaluate_signal over 100 to 100k prices
+    trade_store.* create_trade / start_run (in-memory Valkey stand-in, or --valkey)
+    rpc.*         uniswap.get_quote / execute_swap / send_eth against mock_rpc.py
+    vault.*       Vault reads through the vault cache (hit) and straight to RPC (miss)
+    logs.*        bot_logger.get_logs on a run buffer, idle and with 4 writer threads
+
+Each case is timed in `--repeat` samples of enough calls to last `--min-time`
+seconds. It reports per-call median and min (µs) and ops/s. Results are compared
+with benchmarks/baseline.json. A case whose median and min are both more than
+`--tolerance` slower is a regression, and the exit status is 1. The baseline is
+machine-specific: regenerate it with --save-baseline on the machine that runs the
+comparison.
+
+    python benchmarks/bench_suite.py                    # run all, compare with the baseline
+    python benchmarks/bench_suite.py -k strategy -k rpc # cases whose name contains either
+    python benchmarks/bench_suite.py --json out.json    # also write machine-readable results
+    python benchmarks/bench_suite.py --save-baseline    # replace the baseline with this run
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BOT_DIR)
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+# Well-known local test key (Hardhat/Anvil account #0); never holds real funds.
+TEST_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"
+
+CASES: list = []  # (name, setup); setup() returns (fn, teardown or None)
+
+
+def case(name: str):
+    def register(setup):
+        CASES.append((name, setup))
+        return setup
+    return register
+
+
+# ---- strategy ----
+
+def _prices(n: int) -> list:
+    import random
+    rng = random.Random(n)
+    price, out = 2000.0, []
+    for _ in range(n):
+        price *= 1 + rng.gauss(0, 0.002)
+        out.append(price)
+    return out
+
+
+for _n in (100, 1_000, 10_000, 100_000):
+    @case(f"strategy.compute_sma[n={_n}]")
+    def _sma_setup(n=_n):
+        import config
+        from strategy import compute_sma
+        prices = _prices(n)
+        return (lambda: compute_sma(prices, config.LONG_SMA_PERIOD)), None
+
+    @case(f"strategy.evaluate_signal[n={_n}]")
+    def _signal_setup(n=_n):
+        import config
+        from strategy import evaluate_signal
+        prices = _prices(n)
+        return (lambda: evaluate_signal(prices, config.SHORT_SMA_PERIOD, config.LONG_SMA_PERIOD)), None
+
+
+# ---- trade_store ----
+
+def _store_cleanup(tag: str, wallet: str):
+    from valkey_client import valkey
+    runs = [r for r in valkey.zrange(f"user:{wallet}:runs", 0, -1)]
+    keys = set(valkey.scan_iter(match=f"*{wallet}*")) | set(valkey.scan_iter(match=f"*{tag}*"))
+    for key in [k for k in keys if k.endswith(":trades") and not k.startswith("user:")]:
+        keys.update(valkey.zrange(key, 0, -1))
+    if runs:
+        valkey.zrem("runs:by_time", *runs)
+    for i in range(0, len(keys), 500):
+        valkey.delete(*list(keys)[i:i + 500])
+
+
+@case("trade_store.create_trade")
+def _create_trade_setup():
+    import trade_store
+    tag, wallet = f"bench-{uuid.uuid4().hex[:8]}", "0x" + uuid.uuid4().hex[:40].ljust(40, "0")
+    run_id = f"{tag}-run"
+    return (lambda: trade_store.create_trade(run_id, wallet, "BUY", 10, "0x" + "ab" * 32,
+                                             to_wallet=wallet, meta={"buy_seq": 1})), \
+        (lambda: _store_cleanup(tag, wallet))
+
+
+@case("trade_store.start_run")
+def _start_run_setup():
+    import trade_store
+    tag, wallet = f"bench-{uuid.uuid4().hex[:8]}", "0x" + uuid.uuid4().hex[:40].ljust(40, "0")
+    counter = iter(range(10**9))
+    return (lambda: trade_store.start_run(wallet, run_id=f"{tag}-{next(counter)}")), \
+        (lambda: _store_cleanup(tag, wallet))
+
+
+# ---- RPC paths against the mock JSON-RPC ----
+
+_rpc = {}
+
+
+def _chain():
+    """One mock RPC and one web3 connection for all rpc/vault cases."""
+    if not _rpc:
+        from mock_rpc import start_rpc
+        import config
+        server = start_rpc()
+        config.RPC_URL = f"http://127.0.0.1:{server.server_port}"
+        config.PRIVATE_KEY = TEST_KEY
+        import uniswap
+        w3 = uniswap.get_web3()
+        _rpc.update(server=server, w3=w3, account=uniswap.get_account(w3))
+    return _rpc["w3"], _rpc["account"]
+
+
+def _pair():
+    import config
+    weth = config.TOKENS["WETH"]["address"]
+    other = next(t["address"] for name, t in config.TOKENS.items() if name != "WETH")
+    return weth, other
+
+
+@case("rpc.get_quote")
+def _quote_setup():
+    import config
+    from uniswap import get_quote
+    w3, _ = _chain()
+    weth, other = _pair()
+    return (lambda: get_quote(w3, weth, other, config.POOL_FEE, 10**15)), None
+
+
+@case("rpc.execute_swap")
+def _swap_setup():
+    import config
+    from uniswap import execute_swap
+    w3, account = _chain()
+    weth, other = _pair()
+    return (lambda: execute_swap(w3, account, weth, other, config.POOL_FEE, 10**15, config.SLIPPAGE_PERCENT)), None
+
+
+@case("rpc.send_eth")
+def _send_setup():
+    from uniswap import send_eth
+    w3, account = _chain()
+    return (lambda: send_eth(w3, account, "0x" + "33" * 20, 10)), None
+
+
+def _vault(cached: bool):
+    from vault import Vault
+    from vault_cache import VaultStateCache
+    w3, account = _chain()
+    v = Vault(w3, account, session_key_address="0x" + "44" * 20, vault_address="0x" + "55" * 20)
+    # Own cache per case; the miss case expires entries at once and never polls the head.
+    v.cache = VaultStateCache(w3, poll_interval=3600, state_ttl=3600 if cached else 0, limits_ttl=3600 if cached else 0)
+    return v
+
+
+@case("vault.can_withdraw[cached]")
+def _vault_hit_setup():
+    v = _vault(cached=True)
+    return v.can_withdraw, None
+
+
+@case("vault.can_withdraw[uncached]")
+def _vault_miss_setup():
+    v = _vault(cached=False)
+    return v.can_withdraw, None
+
+
+@case("vault.get_vault_balance[uncached]")
+def _vault_balance_setup():
+    v = _vault(cached=False)
+    return v.get_vault_balance, None
+
+
+# ---- bot_logger ----
+
+def _logs_setup(writers: int):
+    import bot_logger
+    run_id = f"bench-{uuid.uuid4().hex[:8]}"
+    buf = bot_logger.open_run_buffer(run_id, persist=False)
+    bot_logger.close_run_buffer()  # the timing thread reads; only writers log to it
+    for i in range(buf.capacity):
+        buf.append("info", f"warmup {i}")
+    stop = threading.Event()
+
+    def writer():
+        bot_logger.open_run_buffer(run_id, persist=False)
+        while not stop.is_set():
+            bot_logger.warning("BUY #3: vault withdraw 10 wei...")
+            time.sleep(0)  # yield the GIL between writes, as the run loop does
+
+    threads = [threading.Thread(target=writer, daemon=True) for _ in range(writers)]
+    for t in threads:
+        t.start()
+
+    def read():
+        bot_logger.get_logs(run_id=run_id, after_seq=max(0, buf.last_seq - 100), limit=100)
+
+    def teardown():
+        stop.set()
+        for t in threads:
+            t.join()
+
+    return read, teardown
+
+
+@case("logs.get_logs[idle]")
+def _logs_idle_setup():
+    return _logs_setup(0)
+
+
+@case("logs.get_logs[4 writers]")
+def _logs_contended_setup():
+    return _logs_setup(4)
+
+
+# ---- runner ----
+
+def _timed(fn, loops: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(loops):
+        fn()
+    return time.perf_counter() - t0
+
+
+def measure(fn, repeat: int, min_time: float) -> dict:
+    fn()  # warm up (imports, connections, caches)
+    loops = 1
+    while True:
+        elapsed = _timed(fn, loops)
+        if elapsed >= min_time or loops >= 1 << 22:
+            break
+        loops = loops * 10 if elapsed < min_time / 10 else max(loops + 1, int(loops * min_time / elapsed * 1.1))
+    per_call = sorted(_timed(fn, loops) / loops for _ in range(repeat))
+    median = statistics.median(per_call)
+    return {
+        "median_us": round(median * 1e6, 3),
+        "min_us": round(per_call[0] * 1e6, 3),
+        "stdev_us": round(statistics.stdev(per_call) * 1e6, 3) if len(per_call) > 1 else 0.0,
+        "ops_per_s": round(1 / median, 1) if median else None,
+        "loops": loops,
+        "repeat": repeat,
+    }
+
+
+def _meta(args) -> dict:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BOT_DIR, capture_output=True,
+                             text=True, timeout=5).stdout.strip()
+    except Exception:
+        rev = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git": rev,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "valkey_backend": "valkey" if args.valkey else "memory",
+        "repeat": args.repeat,
+        "min_time": args.min_time,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> dict:
+    """name -> {"ratio", "status"} for cases present in both (ratio = median / baseline median).
+
+    A regression needs both the median and the min over tolerance, so one noisy sample
+    on a shared machine does not fail the run.
+    """
+    out = {}
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base or not base.get("median_us") or not base.get("min_us"):
+            continue
+        ratio = r["median_us"] / base["median_us"]
+        min_ratio = r["min_us"] / base["min_us"]
+        if ratio > 1 + tolerance and min_ratio > 1 + tolerance:
+            status = "regression"
+        elif ratio < 1 / (1 + tolerance) and min_ratio < 1 / (1 + tolerance):
+            status = "improved"
+        else:
+            status = "ok"
+        out[name] = {"baseline_us": base["median_us"], "ratio": round(ratio, 3), "min_ratio": round(min_ratio, 3),
+                     "status": status}
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", action="append", default=[], help="run cases whose name contains this (repeatable)")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per sample")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed median slowdown vs baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--json", metavar="PATH", help="write results to PATH ('-' for stdout)")
+    parser.add_argument("--valkey", action="store_true",
+                        help="trade_store cases against VALKEY_HOST/PORT (disposable!) instead of in-memory")
+    parser.add_argument("--list", action="store_true")
+    args = parser.parse_args()
+
+    # Before any bot module is imported: config and valkey_client read these at import.
+    if not args.valkey:
+        os.environ["VALKEY_BACKEND"] = "memory"
+    os.environ["LOG_SINKS"] = "none"
+    os.environ["LOG_STREAM_PERSIST"] = "false"
+    os.environ["LOG_LEVEL"] = "warning"  # per-swap info lines would be timed too
+
+    selected = [(n, s) for n, s in CASES if not args.k or any(k in n for k in args.k)]
+    if args.list:
+        print("\n".join(n for n, _ in selected))
+        return
+
+    results = {}
+    for name, setup in selected:
+        fn, teardown = setup()
+        try:
+            results[name] = measure(fn, args.repeat, args.min_time)
+        finally:
+            if teardown:
+                teardown()
+        print(f"  {name:<38} {results[name]['median_us']:>12.2f} us", file=sys.stderr)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("results", {})
+    comparison = compare(results, baseline, args.tolerance)
+    report = {"meta": _meta(args), "results": results, "comparison": comparison}
+
+    print(f"\n{'case':<38} {'median us':>12} {'ops/s':>12} {'baseline':>12} {'ratio':>7}")
+    for name, r in results.items():
+        c = comparison.get(name)
+        extra = f"{c['baseline_us']:>12.2f} {c['ratio']:>7.2f}  {c['status'] if c['status'] != 'ok' else ''}" if c else ""
+        print(f"{name:<38} {r['median_us']:>12.2f} {r['ops_per_s'] or 0:>12.1f} {extra}")
+
+    if args.json:
+        text = json.dumps(report, indent=2)
+        if args.json == "-":
+            print(text)
+        else:
+            with open(args.json, "w") as f:
+                f.write(text + "\n")
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"meta": report["meta"], "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return
+    regressions = [n for n, c in comparison.items() if c["status"] == "regression"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Valkey memory per trade: legacy hash of string fields vs packed trade_codec value.
+
+Writes the same bot-style trades both ways under a throwaway run id and reports
+MEMORY USAGE per trade key plus the used_memory delta (which also counts the
+user/run index entries and metrics). Use a local, disposable Valkey.
+
+    python benchmarks/bench_trade_memory.py -n 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import trade_store  # noqa: E402
+from valkey_client import valkey  # noqa: E402
+
+
+def _records(n, run_id, wallet):
+    out = []
+    for i in range(n):
+        side = "BUY" if i % 2 else "SELL"
+        # As in bot_runner: BUY refs are short synthetic hashes, SELLs are real tx hashes.
+        tx_ref = f"0x{uuid.uuid4().hex[:16]}" if side == "BUY" else f"0x{uuid.uuid4().hex * 2}"
+        out.append(trade_store.build_trade(
+            run_id, wallet, side, 10, tx_ref,
+            to_wallet=wallet, meta={f"{side.lower()}_seq": i // 2 + 1},
+        ))
+    return out
+
+
+def _write_legacy(records):
+    pipe = valkey.pipeline(transaction=False)
+    for r in records:
+        pipe.hset(r["trade_id"], mapping=r)
+        pipe.zadd(f"user:{r['user_wallet']}:trades", {r["trade_id"]: int(r["ts"])})
+        pipe.zadd(f"{r['run_id']}:trades", {r["trade_id"]: int(r["ts"])})
+    pipe.execute()
+
+
+def _measure(records, write):
+    before = valkey.info("memory")["used_memory"]
+    write(records)
+    after = valkey.info("memory")["used_memory"]
+    sample = records[:: max(1, len(records) // 200)]
+    per_key = [valkey.memory_usage(r["trade_id"], samples=0) for r in sample]
+    return {
+        "trade_key_bytes": round(sum(per_key) / len(per_key), 1),
+        "used_memory_per_trade": round((after - before) / len(records), 1),
+    }
+
+
+def _cleanup(records):
+    keys = {r["trade_id"] for r in records}
+    for r in records:
+        keys.update((f"user:{r['user_wallet']}:trades", f"{r['run_id']}:trades", f"{r['run_id']}:metrics"))
+    keys.update(valkey.scan_iter(match=f"rollup:*:{records[0]['run_id']}:*"))
+    keys.update(valkey.scan_iter(match=f"rollup:user:{records[0]['user_wallet']}:*"))
+    valkey.delete(*keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=5000, help="trades per variant")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    wallet = "0x" + uuid.uuid4().hex + uuid.uuid4().hex[:8]
+    results = {}
+    for name, write in (("hash", _write_legacy), ("packed", trade_store.write_trades)):
+        records = _records(args.n, f"run:{uuid.uuid4().hex}", wallet)
+        try:
+            results[name] = _measure(records, write)
+        finally:
+            _cleanup(records)
+    results["ratio"] = round(results["hash"]["trade_key_bytes"] / results["packed"]["trade_key_bytes"], 2)
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    for name in ("hash", "packed"):
+        r = results[name]
+        print(f"{name:>7}: {r['trade_key_bytes']:>7} B/trade key   {r['used_memory_per_trade']:>7} B/trade incl. indexes")
+    print(f"trade key shrinks {results['ratio']}x")
+
+
+if __name__ == "__main__":
+    main()
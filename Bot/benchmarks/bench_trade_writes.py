@@ -0,0 +1,96 @@
+"""Latency of trade_store writes: per-command round trips vs one MULTI/EXEC pipeline.
+
+Runs against the Valkey configured by VALKEY_HOST / VALKEY_PORT / VALKEY_DB (use a
+local, disposable instance — keys are written under a throwaway prefix and deleted).
+
+    python benchmarks/bench_trade_writes.py -n 2000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import trade_store  # noqa: E402
+from valkey_client import valkey  # noqa: E402
+
+
+def _sequential_create_trade(run_id, user_wallet, side, amount_wei, tx_ref):
+    """The pre-pipeline write path: one round trip per command."""
+    ts = trade_store.now_ms()
+    trade_id = trade_store.new_trade_id()
+    record = {
+        "trade_id": trade_id, "run_id": run_id, "user_wallet": user_wallet.lower(),
+        "side": side, "amount_wei": str(amount_wei), "tx_ref": tx_ref,
+        "status": "CONFIRMED", "ts": str(ts),
+    }
+    valkey.hset(trade_id, mapping=record)
+    valkey.zadd(f"user:{user_wallet.lower()}:trades", {trade_id: ts})
+    valkey.zadd(f"{run_id}:trades", {trade_id: ts})
+    valkey.hincrby(f"{run_id}:metrics", "trades_total", 1)
+    valkey.hincrby(f"{run_id}:metrics", "buy_confirmed" if side == "BUY" else "sell_confirmed", 1)
+    return trade_id
+
+
+def _pipelined_create_trade(run_id, user_wallet, side, amount_wei, tx_ref):
+    return trade_store.create_trade(run_id, user_wallet, side, amount_wei, tx_ref)
+
+
+def _measure(fn, n, run_id, wallet):
+    samples = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        fn(run_id, wallet, "BUY" if i % 2 else "SELL", 10, f"0x{i:064x}")
+        samples.append((time.perf_counter() - t0) * 1e6)
+    samples.sort()
+    return {
+        "n": n,
+        "mean_us": round(statistics.fmean(samples), 1),
+        "p50_us": round(samples[n // 2], 1),
+        "p99_us": round(samples[min(n - 1, int(n * 0.99))], 1),
+    }
+
+
+def _cleanup(run_id, wallet):
+    trade_ids = valkey.zrange(f"{run_id}:trades", 0, -1)
+    pipe = valkey.pipeline(transaction=False)
+    for tid in trade_ids:
+        pipe.delete(tid)
+    pipe.delete(f"{run_id}:trades", f"{run_id}:metrics", f"user:{wallet}:trades")
+    pipe.execute()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=1000, help="trades per variant")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    valkey.ping()
+    results = {}
+    for name, fn in (("sequential", _sequential_create_trade), ("pipelined", _pipelined_create_trade)):
+        run_id = f"run:bench-{uuid.uuid4().hex}"
+        wallet = f"0xbench{uuid.uuid4().hex[:8]}"
+        try:
+            _measure(fn, min(50, args.n), run_id, wallet)  # warm up connection
+            results[name] = _measure(fn, args.n, run_id, wallet)
+        finally:
+            _cleanup(run_id, wallet)
+
+    results["speedup_p50"] = round(results["sequential"]["p50_us"] / results["pipelined"]["p50_us"], 2)
+    if args.json:
+        print(json.dumps(results))
+        return
+    for name in ("sequential", "pipelined"):
+        r = results[name]
+        print(f"{name:>10}: mean {r['mean_us']:>8} us  p50 {r['p50_us']:>8} us  p99 {r['p99_us']:>8} us  (n={r['n']})")
+    print(f"p50 speedup: {results['speedup_p50']}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Local JSON-RPC stand-in for benchmarks: enough of the eth_* API for the bot's paths.
+
+Answers chain/fee queries, nonces, eth_call (every call returns four ABI words of 1,
+which decode under every output type the bot's ABIs use), raw transaction sends (hash = keccak of the
+raw tx) and receipts (status 1, no logs), with an optional fixed latency per request.
+It does not execute anything; it measures the client side (encoding, signing,
+HTTP, decoding) plus whatever latency you give it.
+
+`VaultChain` adds just enough MockVault state for end-to-end runs: per-account
+withdrawalCount history, `withdraw_to()` (what the frontend's smart account does)
+mining a block with a WithdrawnTo log, and eth_getLogs filtering by address, topics
+and block range. Every transaction mines a block. Calls are counted per method.
+"""
+
+import bisect
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from eth_utils import keccak
+
+ONE_ETH = 10**18
+_WORD = (1).to_bytes(32, "big").hex()
+ZERO_HASH = "0x" + "00" * 32
+
+
+class MockChain:
+    def __init__(self, block: int = 0x100):
+        self.block = block
+        self.sent = 0  # one nonce counter for every sender
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def handle(self, method: str, params: list):
+        self.calls += 1
+        if method == "eth_chainId":
+            return "0xaa36a7"
+        if method == "net_version":
+            return "11155111"
+        if method == "web3_clientVersion":
+            return "mock-rpc/1.0"
+        if method == "eth_blockNumber":
+            return hex(self.block)
+        if method in ("eth_getBalance",):
+            return hex(ONE_ETH)
+        if method in ("eth_gasPrice", "eth_maxPriorityFeePerGas"):
+            return hex(10**9)
+        if method == "eth_estimateGas":
+            return hex(200_000)
+        if method == "eth_getTransactionCount":
+            return hex(self.sent)
+        if method == "eth_call":
+            return "0x" + _WORD * 4
+        if method == "eth_getLogs":
+            return []
+        if method == "eth_getCode":
+            return "0x6080"
+        if method == "eth_sendRawTransaction":
+            raw = bytes.fromhex(params[0][2:])
+            with self.lock:
+                self.sent += 1
+            return "0x" + keccak(raw).hex()
+        if method == "eth_getTransactionReceipt":
+            return {
+                "transactionHash": params[0], "transactionIndex": "0x0", "blockHash": ZERO_HASH,
+                "blockNumber": hex(self.block), "from": "0x" + "11" * 20, "to": "0x" + "22" * 20,
+                "cumulativeGasUsed": "0x5208", "gasUsed": "0x5208", "effectiveGasPrice": hex(10**9),
+                "contractAddress": None, "logs": [], "logsBloom": "0x" + "00" * 256, "status": "0x1",
+                "type": "0x2",
+            }
+        if method == "eth_getBlockByNumber":
+            return {"number": hex(self.block), "hash": ZERO_HASH, "parentHash": ZERO_HASH,
+                    "timestamp": hex(int(time.time())), "baseFeePerGas": hex(10**9), "gasLimit": hex(30_000_000),
+                    "gasUsed": "0x0", "transactions": []}
+        raise KeyError(method)
+
+
+def _selector(signature: str) -> str:
+    return keccak(text=signature)[:4].hex()
+
+
+def _word(value: int) -> str:
+    return value.to_bytes(32, "big").hex()
+
+
+def _topic(address: str) -> str:
+    return "0x" + "0" * 24 + address.lower()[2:]
+
+
+def _block(tag, head: int) -> int:
+    if tag in (None, "latest", "pending", "safe", "finalized"):
+        return head
+    return 0 if tag == "earliest" else int(tag, 16)
+
+
+WITHDRAWN_TO_TOPIC = "0x" + keccak(text="WithdrawnTo(address,address,uint256)").hex()
+_VAULT_CALLS = {
+    _selector("balances(address,address)"): "balances",
+    _selector("withdrawalCount(address,address,address)"): "withdrawalCount",
+    _selector("maxWithdrawalsPerAccount(address)"): "maxWithdrawalsPerAccount",
+    _selector("withdrawalLimitPerAccount(address)"): "withdrawalLimitPerAccount",
+    _selector("totalWithdrawn(address,address,address)"): "totalWithdrawn",
+}
+
+
+class VaultChain(MockChain):
+    """MockChain plus MockVault withdrawals: every vault is funded and withdrawTo never reverts."""
+
+    def __init__(self, block: int = 0x100):
+        super().__init__(block)
+        self.counts = Counter()  # "eth_call:withdrawalCount", "eth_getLogs", ...
+        self.logs: list[dict] = []  # in block order
+        self._log_blocks: list[int] = []
+        self._withdrawals: dict = {}  # (vault, user, session_key) -> blocks of each withdrawTo
+
+    def _mine(self) -> int:
+        self.block += 1
+        return self.block
+
+    def withdraw_to(self, vault: str, user: str, recipient: str, amount_wei: int, session_key: str | None = None) -> str:
+        """The smart account's vault.withdrawTo(amount, recipient, sessionKey), mined in its own block."""
+        with self.lock:
+            block = self._mine()
+            tx_hash = "0x" + keccak(text=f"withdrawTo:{block}:{user}:{recipient}").hex()
+            if session_key:
+                self._withdrawals.setdefault((vault.lower(), user.lower(), session_key.lower()), []).append(block)
+            self.logs.append({
+                "address": vault.lower(), "topics": [WITHDRAWN_TO_TOPIC, _topic(user), _topic(recipient)],
+                "data": "0x" + _word(amount_wei), "blockNumber": hex(block), "blockHash": ZERO_HASH,
+                "transactionHash": tx_hash, "transactionIndex": "0x0", "logIndex": "0x0", "removed": False,
+            })
+            self._log_blocks.append(block)
+        return tx_hash
+
+    def handle(self, method: str, params: list):
+        self.counts[method] += 1
+        if method == "eth_sendRawTransaction":
+            with self.lock:
+                self._mine()
+        if method == "eth_call":
+            return self._call(params[0], _block(params[1] if len(params) > 1 else None, self.block))
+        if method == "eth_getLogs":
+            return self._get_logs(params[0])
+        return super().handle(method, params)
+
+    def _call(self, tx: dict, block: int) -> str:
+        self.calls += 1
+        data = (tx.get("data") or tx.get("input") or "0x")[2:]
+        fn = _VAULT_CALLS.get(data[:8])
+        self.counts[f"eth_call:{fn or data[:8]}"] += 1
+        args = ["0x" + data[8 + i * 64 + 24:8 + (i + 1) * 64] for i in range((len(data) - 8) // 64)]
+        if fn == "withdrawalCount":
+            blocks = self._withdrawals.get((tx["to"].lower(), args[1], args[2]), [])
+            return "0x" + _word(bisect.bisect_right(blocks, block))
+        if fn in ("balances", "maxWithdrawalsPerAccount", "withdrawalLimitPerAccount"):
+            return "0x" + _word(ONE_ETH)
+        if fn == "totalWithdrawn":
+            return "0x" + _word(0)
+        return "0x" + _WORD * 4
+
+    def _get_logs(self, flt: dict) -> list:
+        self.calls += 1
+        start = _block(flt.get("fromBlock"), self.block)
+        end = _block(flt.get("toBlock"), self.block)
+        addresses = flt.get("address")
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {a.lower() for a in addresses} if addresses else None
+        topics = flt.get("topics") or []
+        with self.lock:
+            window = self.logs[bisect.bisect_left(self._log_blocks, start):bisect.bisect_right(self._log_blocks, end)]
+        out = []
+        for log in window:
+            if addresses and log["address"] not in addresses:
+                continue
+            if all(want is None or log["topics"][i] in ([want.lower()] if isinstance(want, str) else
+                                                          [w.lower() for w in want])
+                   for i, want in enumerate(topics)):
+                out.append(log)
+        return out
+
+
+def start_rpc(latency_s: float = 0.0, chain: MockChain | None = None) -> ThreadingHTTPServer:
+    """Serve a MockChain on 127.0.0.1 (random port) from a daemon thread; `.chain` on the server."""
+    chain = chain or MockChain()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like a real RPC endpoint
+        disable_nagle_algorithm = True  # else delayed ACKs add ~40 ms per response
+
+        def do_POST(self):
+            req = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if latency_s:
+                time.sleep(latency_s)
+            calls = req if isinstance(req, list) else [req]
+            out = []
+            for c in calls:
+                try:
+                    out.append({"jsonrpc": "2.0", "id": c.get("id"), "result": chain.handle(c["method"], c.get("params", []))})
+                except KeyError:
+                    out.append({"jsonrpc": "2.0", "id": c.get("id"),
+                                "error": {"code": -32601, "message": f"method not found: {c['method']}"}})
+            body = json.dumps(out if isinstance(req, list) else out[0]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.chain = chain
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,15 +1,15 @@
-import sys
+import threading
 import time
 import traceback
 
-sys.stdout.reconfigure(line_buffering=True)
-
-from web3 import Web3
-
+import clock as clocks
 import config
+import metrics
+import tracing
+from bot_logger import info as log_info, error as log_err
 from price_feed import get_price_history
 from strategy import Signal, compute_sma, evaluate_signal
-from trade_proof import record_trade_proof
+from proof_queue import enqueue_trade_proof, start_proof_worker
 from uniswap import (
     check_and_approve,
     execute_swap,
@@ -18,27 +18,37 @@ from uniswap import (
     get_web3,
 )
 
+# Standalone bot traces are stored under this id (GET /runs/bot/traces).
+TRACE_RUN_ID = "bot"
+
 
 def print_banner(account, w3):
     eth_balance = w3.eth.get_balance(account.address)
-    print("=" * 60)
-    print("  Uniswap V3 Trading Bot")
-    print("=" * 60)
-    print(f"  Wallet:  {account.address}")
-    print(f"  ETH:     {Web3.from_wei(eth_balance, 'ether')} ETH")
-    print(f"  Pair:    {config.TRADE_TOKEN_IN} -> {config.TRADE_TOKEN_OUT}")
-    print(f"  Fee:     {config.POOL_FEE / 10000:.2%}")
-    print(f"  Amount:  {config.TRADE_AMOUNT} {config.TRADE_TOKEN_IN}")
-    print(f"  SMA:     {config.SHORT_SMA_PERIOD}/{config.LONG_SMA_PERIOD}")
-    print(f"  Interval: {config.CHECK_INTERVAL_SECONDS}s")
-    print("=" * 60)
-
-
-def main():
+    log_info("=" * 60)
+    log_info("  Uniswap V3 Trading Bot")
+    log_info("=" * 60)
+    log_info(f"  Wallet:  {account.address}")
+    log_info(f"  ETH:     {w3.from_wei(eth_balance, 'ether')} ETH")
+    log_info(f"  Pair:    {config.TRADE_TOKEN_IN} -> {config.TRADE_TOKEN_OUT}")
+    log_info(f"  Fee:     {config.POOL_FEE / 10000:.2%}")
+    log_info(f"  Amount:  {config.TRADE_AMOUNT} {config.TRADE_TOKEN_IN}")
+    log_info(f"  SMA:     {config.SHORT_SMA_PERIOD}/{config.LONG_SMA_PERIOD}")
+    log_info(f"  Interval: {config.CHECK_INTERVAL_SECONDS}s")
+    log_info("=" * 60)
+
+
+def main(clock=None, stop: threading.Event | None = None):
+    """Run until interrupted, or until `stop` is set. A VirtualClock runs the loop in simulated time."""
+    clock = clock or clocks.REAL
+    stop = stop or threading.Event()
     # --- Init ---
     w3 = get_web3()
     account = get_account(w3)
     print_banner(account, w3)
+    # Proofs (IPFS pin + logTrade) run on a background worker so swaps never wait on them.
+    start_proof_worker(w3, account)
+    if config.METRICS_PORT:
+        metrics.start_http_server(config.METRICS_PORT)
 
     token_in_cfg = config.TOKENS[config.TRADE_TOKEN_IN]
     token_out_cfg = config.TOKENS[config.TRADE_TOKEN_OUT]
@@ -54,15 +64,15 @@ def main():
     # One-time approval for token_in (skip if swapping native ETH)
     weth_address = config.TOKENS["WETH"]["address"]
     if token_in_address.lower() != weth_address.lower():
-        print("\nChecking token approval...")
+        log_info("Checking token approval...")
         check_and_approve(
             w3, account, token_in_address, config.SWAP_ROUTER_ADDRESS, amount_in_raw
         )
     else:
-        print("\nSwapping native ETH — no token approval needed.")
+        log_info("Swapping native ETH — no token approval needed.")
 
     # --- Test swap (one-time) ---
-    print("\n[TEST MODE] Executing a test swap to verify on-chain flow...")
+    log_info("[TEST MODE] Executing a test swap to verify on-chain flow...")
     try:
         receipt, quoted_out = execute_swap(
             w3, account,
@@ -70,10 +80,10 @@ def main():
             config.POOL_FEE, amount_in_raw,
             config.SLIPPAGE_PERCENT,
         )
-        print(f"[TEST MODE] SUCCESS! TX: {receipt['transactionHash'].hex()}")
-        print(f"[TEST MODE] View on Etherscan: https://sepolia.etherscan.io/tx/{receipt['transactionHash'].hex()}\n")
-        record_trade_proof(
-            w3, account, receipt, "TEST",
+        log_info(f"[TEST MODE] SUCCESS! TX: {receipt['transactionHash'].hex()}")
+        log_info(f"[TEST MODE] View on Etherscan: https://sepolia.etherscan.io/tx/{receipt['transactionHash'].hex()}")
+        enqueue_trade_proof(
+            receipt, "TEST",
             token_in_address, token_out_address,
             amount_in_raw, quoted_out,
             config.SLIPPAGE_PERCENT, 0,
@@ -81,52 +91,61 @@ def main():
             token_in_decimals, token_out_decimals,
         )
     except Exception as e:
-        print(f"[TEST MODE] Swap failed: {e}\n")
+        log_err(f"[TEST MODE] Swap failed: {e}")
 
     # Use the token_in's coingecko_id for price data
     coin_id = token_in_cfg["coingecko_id"]
 
     last_signal = Signal.HOLD
-    print("Bot started. Monitoring for signals...\n")
+    log_info("Bot started. Monitoring for signals...")
 
-    while True:
+    iteration = 0
+    while not stop.is_set():
+        iteration += 1
+        tracing.begin(TRACE_RUN_ID, iteration)
         try:
             # 1. Fetch price history
-            price_data = get_price_history(coin_id)
+            with tracing.span("price_fetch"):
+                price_data = get_price_history(coin_id)
             prices = [p[1] for p in price_data]  # extract price values
 
             # 2. Evaluate signal
-            signal = evaluate_signal(
-                prices, config.SHORT_SMA_PERIOD, config.LONG_SMA_PERIOD
-            )
+            with tracing.span("signal"):
+                signal = evaluate_signal(
+                    prices, config.SHORT_SMA_PERIOD, config.LONG_SMA_PERIOD
+                )
 
-            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+            timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(clock.time()))
             current_price = prices[-1] if prices else 0
 
             # Compute SMAs for proof logging
             short_sma = compute_sma(prices, config.SHORT_SMA_PERIOD)
             long_sma = compute_sma(prices, config.LONG_SMA_PERIOD)
 
-            print(f"[{timestamp}] Price: ${current_price:.2f} | Signal: {signal.value}")
+            log_info(f"[{timestamp}] Price: ${current_price:.2f} | Signal: {signal.value}")
+            tracing.annotate(signal=signal.value)
 
             # 3. Act on signal changes
             if signal == Signal.BUY and last_signal != Signal.BUY:
-                print(f"\n>>> BUY signal detected! Swapping {config.TRADE_AMOUNT} {config.TRADE_TOKEN_IN} -> {config.TRADE_TOKEN_OUT}")
-                receipt, quoted_out = execute_swap(
-                    w3, account,
-                    token_in_address, token_out_address,
-                    config.POOL_FEE, amount_in_raw,
-                    config.SLIPPAGE_PERCENT,
-                )
-                print(f">>> TX: {receipt['transactionHash'].hex()}\n")
-                record_trade_proof(
-                    w3, account, receipt, "BUY",
-                    token_in_address, token_out_address,
-                    amount_in_raw, quoted_out,
-                    config.SLIPPAGE_PERCENT, current_price,
-                    short_sma, long_sma,
-                    token_in_decimals, token_out_decimals,
-                )
+                log_info(f">>> BUY signal detected! Swapping {config.TRADE_AMOUNT} {config.TRADE_TOKEN_IN} -> {config.TRADE_TOKEN_OUT}")
+                metrics.LOOP_ITERATIONS.inc("BUY")
+                with tracing.span("swap"):
+                    receipt, quoted_out = execute_swap(
+                        w3, account,
+                        token_in_address, token_out_address,
+                        config.POOL_FEE, amount_in_raw,
+                        config.SLIPPAGE_PERCENT,
+                    )
+                log_info(f">>> TX: {receipt['transactionHash'].hex()}")
+                with tracing.span("proof"):
+                    enqueue_trade_proof(
+                        receipt, "BUY",
+                        token_in_address, token_out_address,
+                        amount_in_raw, quoted_out,
+                        config.SLIPPAGE_PERCENT, current_price,
+                        short_sma, long_sma,
+                        token_in_decimals, token_out_decimals,
+                    )
 
             elif signal == Signal.SELL and last_signal != Signal.SELL:
                 # Sell: swap token_out back to token_in
@@ -135,42 +154,47 @@ def main():
                     w3, account.address, token_out_address
                 )
                 if token_out_balance > 0:
-                    print(f"\n>>> SELL signal detected! Swapping {config.TRADE_TOKEN_OUT} -> {config.TRADE_TOKEN_IN}")
+                    log_info(f">>> SELL signal detected! Swapping {config.TRADE_TOKEN_OUT} -> {config.TRADE_TOKEN_IN}")
                     # Approve token_out for the router
                     check_and_approve(
                         w3, account, token_out_address,
                         config.SWAP_ROUTER_ADDRESS, token_out_balance,
                     )
-                    receipt, quoted_out = execute_swap(
-                        w3, account,
-                        token_out_address, token_in_address,
-                        config.POOL_FEE, token_out_balance,
-                        config.SLIPPAGE_PERCENT,
-                    )
-                    print(f">>> TX: {receipt['transactionHash'].hex()}\n")
-                    record_trade_proof(
-                        w3, account, receipt, "SELL",
-                        token_out_address, token_in_address,
-                        token_out_balance, quoted_out,
-                        config.SLIPPAGE_PERCENT, current_price,
-                        short_sma, long_sma,
-                        token_out_decimals, token_in_decimals,
-                    )
+                    metrics.LOOP_ITERATIONS.inc("SELL")
+                    with tracing.span("swap"):
+                        receipt, quoted_out = execute_swap(
+                            w3, account,
+                            token_out_address, token_in_address,
+                            config.POOL_FEE, token_out_balance,
+                            config.SLIPPAGE_PERCENT,
+                        )
+                    log_info(f">>> TX: {receipt['transactionHash'].hex()}")
+                    with tracing.span("proof"):
+                        enqueue_trade_proof(
+                            receipt, "SELL",
+                            token_out_address, token_in_address,
+                            token_out_balance, quoted_out,
+                            config.SLIPPAGE_PERCENT, current_price,
+                            short_sma, long_sma,
+                            token_out_decimals, token_in_decimals,
+                        )
                 else:
-                    print(f"  SELL signal but no {config.TRADE_TOKEN_OUT} balance to sell.")
+                    log_info(f"  SELL signal but no {config.TRADE_TOKEN_OUT} balance to sell.")
 
             if signal != Signal.HOLD:
                 last_signal = signal
 
         except KeyboardInterrupt:
-            print("\nBot stopped by user.")
+            log_info("Bot stopped by user.")
+            tracing.end("KeyboardInterrupt")
             break
-        except Exception:
-            print(f"\nError during loop iteration:")
-            traceback.print_exc()
-            print("Continuing...\n")
+        except Exception as e:
+            log_err(f"Error during loop iteration:\n{traceback.format_exc()}")
+            log_info("Continuing...")
+            tracing.end(type(e).__name__)
+        tracing.end()
 
-        time.sleep(config.CHECK_INTERVAL_SECONDS)
+        clock.sleep(config.CHECK_INTERVAL_SECONDS, stop)
 
 
 if __name__ == "__main__":
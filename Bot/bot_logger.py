@@ -1,40 +1,453 @@
-"""In-memory log buffer for real-time streaming to the dashboard."""
+"""Logging for the bot: in-memory buffer for the dashboard plus an async output pipeline.
 
-import collections
+Every entry gets a monotonically increasing sequence id ("seq"). Readers pass the
+last seq they saw and receive only newer entries; the start position is computed
+directly from the seq, so a read never scans or copies entries it does not return.
+
+Output (stdout / JSON-lines file / Valkey stream) never happens on the caller's
+thread: records go on a bounded queue and a background writer drains them in
+batches. Levels below LOG_LEVEL are dropped before any work is done.
+"""
+
+import atexit
+import json
+import queue
+import sys
 import threading
 import time
+from typing import NamedTuple
+
+import config
+
+# Global buffer size (default: keep last 500 log entries)
+MAX_LOGS = config.LOG_BUFFER_CAPACITY
+
+
+class LogBuffer:
+    """Fixed-capacity ring of log entries addressed by sequence id.
+
+    Entry `seq` lives at slot `seq % capacity`, so finding the first entry after a
+    cursor is O(1). When `stream_key` is set, entries are also appended to a Valkey
+    stream (XADD with explicit id `0-<seq>`) so they survive restarts and can be read
+    by other processes via `read_stream`. The XADD runs on the background writer; the
+    entry is queued for it under the buffer lock (a non-blocking put), so each stream
+    reaches the writer in seq order and its ids only ever increase.
+    """
+
+    def __init__(self, capacity: int = MAX_LOGS, stream_key: str | None = None):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.stream_key = stream_key
+        self._ring: list[dict | None] = [None] * capacity
+        self._next_seq = 1
+        self._lock = threading.Lock()
+        self.writers = 0  # threads bound to this buffer by open_run_buffer
+        if stream_key:
+            self._restore_from_stream()
+
+    @property
+    def last_seq(self) -> int:
+        return self._next_seq - 1
+
+    def append(self, level: str, msg: str) -> dict:
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            entry = {"seq": seq, "ts": time.time(), "level": level, "msg": msg}
+            self._ring[seq % self.capacity] = entry
+            if self.stream_key:
+                _writer.persist(self.stream_key, entry, self.capacity)
+        return entry
+
+    def read(self, after_seq: int | None = None, limit: int | None = None) -> list[dict]:
+        """Return entries with seq > after_seq (oldest first), at most `limit` of them."""
+        with self._lock:
+            last = self._next_seq - 1
+            oldest = max(1, last - self.capacity + 1)
+            start = oldest if after_seq is None else max(oldest, after_seq + 1)
+            out = []
+            for s in range(start, last + 1):
+                entry = self._entry(s)
+                if entry is None:
+                    continue
+                out.append(entry)
+                if limit is not None and len(out) >= limit:
+                    break
+            return out
+
+    def read_since_ts(self, since_ts: float) -> list[dict]:
+        """Timestamp cursor (legacy). Binary-searches the ring since ts is non-decreasing."""
+        with self._lock:
+            last = self._next_seq - 1
+            lo = max(1, last - self.capacity + 1)
+            hi = last + 1
+            while lo < hi:
+                mid = (lo + hi) // 2
+                probe = mid
+                while probe < hi and self._entry(probe) is None:
+                    probe += 1
+                if probe == hi or self._ring[probe % self.capacity]["ts"] > since_ts:
+                    hi = mid
+                else:
+                    lo = probe + 1
+            return [e for e in (self._entry(s) for s in range(lo, last + 1)) if e is not None]
+
+    def _entry(self, seq: int) -> dict | None:
+        """The entry for `seq`, or None for a seq that never reached this ring.
+
+        Only a ring restored from a stream has holes: persistence is best-effort, so the
+        stream can miss seqs, and it may start past the ring's first slot.
+        """
+        entry = self._ring[seq % self.capacity]
+        return entry if entry is not None and entry["seq"] == seq else None
+
+    # ---- Valkey stream persistence ----
+
+    def _restore_from_stream(self):
+        """Reload the tail of the stream so seq continues where a previous process stopped."""
+        try:
+            entries = read_stream(self.stream_key, count=self.capacity, latest=True)
+        except Exception:
+            return
+        for e in entries:
+            self._ring[e["seq"] % self.capacity] = e
+        if entries:
+            self._next_seq = entries[-1]["seq"] + 1
+
+
+def read_stream(stream_key: str, after_seq: int | None = None, count: int | None = None,
+                latest: bool = False) -> list[dict]:
+    """Read persisted log entries from a Valkey stream (any process).
+
+    With `latest=True` returns the newest `count` entries; otherwise entries after `after_seq`.
+    """
+    from valkey_client import valkey
+    if latest:
+        raw = list(reversed(valkey.xrevrange(stream_key, count=count)))
+    else:
+        start = "-" if after_seq is None else f"(0-{after_seq}"
+        raw = valkey.xrange(stream_key, min=start, count=count)
+    out = []
+    for stream_id, fields in raw:
+        out.append({
+            "seq": int(stream_id.split("-", 1)[1]),
+            "ts": float(fields.get("ts", 0)),
+            "level": fields.get("level", "info"),
+            "msg": fields.get("msg", ""),
+        })
+    return out
+
+
+_log_buffer = LogBuffer(MAX_LOGS)
+_run_buffers: dict[str, LogBuffer] = {}
+_run_buffers_lock = threading.Lock()
+_context = threading.local()
+
+
+def open_run_buffer(run_id: str, capacity: int | None = None, persist: bool | None = None) -> LogBuffer:
+    """Create (or return) the per-run buffer and bind it to the calling thread."""
+    if persist is None:
+        persist = config.LOG_STREAM_PERSIST
+    with _run_buffers_lock:
+        buf = _run_buffers.get(run_id)
+        if buf is None:
+            buf = LogBuffer(
+                capacity or config.LOG_RUN_BUFFER_CAPACITY,
+                stream_key=f"{run_id}:logs" if persist else None,
+            )
+            _run_buffers[run_id] = buf
+            # Bound memory: drop the oldest run buffers beyond the retention count,
+            # closed runs (no thread logging to them) before active ones.
+            while len(_run_buffers) > config.LOG_MAX_RUN_BUFFERS:
+                victim = next((r for r, b in _run_buffers.items() if b.writers <= 0 and r != run_id),
+                              next(iter(_run_buffers)))
+                _run_buffers.pop(victim)
+        previous = getattr(_context, "run_id", None)
+        if previous != run_id:
+            if previous and previous in _run_buffers:
+                _run_buffers[previous].writers -= 1
+            buf.writers += 1
+    _context.run_id = run_id
+    return buf
+
+
+def close_run_buffer():
+    """Unbind the current thread from its run buffer (the buffer stays readable)."""
+    run_id = getattr(_context, "run_id", None)
+    if run_id:
+        with _run_buffers_lock:
+            buf = _run_buffers.get(run_id)
+            if buf is not None:
+                buf.writers -= 1
+    _context.run_id = None
+
+
+def get_run_buffer(run_id: str) -> LogBuffer | None:
+    with _run_buffers_lock:
+        return _run_buffers.get(run_id)
+
+
+# ---- Async output pipeline ----
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+_PREFIXES = {"debug": "[DEBUG] ", "info": "", "warning": "[WARN] ", "error": "[ERROR] "}
+_min_level = LEVELS.get(config.LOG_LEVEL, LEVELS["info"])
+
+
+def set_level(level: str):
+    """Change the minimum level at runtime (e.g. "debug")."""
+    global _min_level
+    _min_level = LEVELS[level]
+
+
+def is_enabled(level: str) -> bool:
+    return LEVELS[level] >= _min_level
+
+
+class StdoutSink:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def write(self, records: list[dict]):
+        lines = []
+        for r in records:
+            msg = r["msg"]
+            if r.get("source"):
+                msg = f"[{r['source']}] {msg}"
+            lines.append(_PREFIXES.get(r["level"], "") + msg)
+        self.stream.write("\n".join(lines) + "\n")
+        self.stream.flush()
+
+
+class FileSink:
+    """Appends one JSON object per record (JSON lines)."""
+
+    def __init__(self, path: str):
+        self._f = open(path, "a", encoding="utf-8")
+
+    def write(self, records: list[dict]):
+        self._f.write("".join(json.dumps(r, default=str) + "\n" for r in records))
+        self._f.flush()
+
+
+class ValkeySink:
+    """Appends records to a capped Valkey stream, one pipelined round trip per batch."""
+
+    def __init__(self, stream_key: str = "bot:logs", maxlen: int = 10000):
+        self.stream_key = stream_key
+        self.maxlen = maxlen
+
+    def write(self, records: list[dict]):
+        from valkey_client import valkey
+        pipe = valkey.pipeline(transaction=False)
+        for r in records:
+            pipe.xadd(
+                self.stream_key,
+                {k: str(v) for k, v in r.items()},
+                maxlen=self.maxlen,
+                approximate=True,
+            )
+        pipe.execute()
+
+
+class _Persist(NamedTuple):
+    """A run-buffer entry to append to its Valkey stream (see LogBuffer)."""
+    stream_key: str
+    entry: dict
+    maxlen: int
+
+
+def _persist_entries(items: list[_Persist]):
+    """XADD run-buffer entries in one pipelined round trip, in seq order per stream."""
+    from valkey_client import valkey
+    pipe = valkey.pipeline(transaction=False)
+    for item in sorted(items, key=lambda i: (i.stream_key, i.entry["seq"])):
+        e = item.entry
+        pipe.xadd(
+            item.stream_key,
+            {"ts": repr(e["ts"]), "level": e["level"], "msg": e["msg"]},
+            id=f"0-{e['seq']}",
+            maxlen=item.maxlen,
+            approximate=True,
+        )
+    # One rejected id (say, a stream already ahead after a restart) must not drop the rest.
+    pipe.execute(raise_on_error=False)
+
+
+class LogWriter:
+    """Background thread that drains the record queue into the configured sinks."""
+
+    def __init__(self, sinks, max_queue: int, batch_size: int, flush_interval: float):
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, record: dict):
+        """Enqueue without blocking; when the queue is full the record is counted and dropped."""
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def persist(self, stream_key: str, entry: dict, maxlen: int):
+        """Queue a run-buffer entry for its stream; same non-blocking rules as submit."""
+        self.submit(_Persist(stream_key, entry, maxlen))
+
+    def flush(self, timeout: float = 5.0):
+        """Block until everything queued so far has been written (used at exit and by CLIs)."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                if isinstance(batch[-1], threading.Event):
+                    break
+            markers = [r for r in batch if isinstance(r, threading.Event)]
+            records = [r for r in batch if not isinstance(r, threading.Event)]
+            if records:
+                self._write(records)
+            for m in markers:
+                m.set()
+
+    def _write(self, records: list):
+        persists = [r for r in records if isinstance(r, _Persist)]
+        if persists:
+            records = [r for r in records if not isinstance(r, _Persist)]
+            try:
+                _persist_entries(persists)
+            except Exception as e:
+                # Persistence is best-effort; the entries stay readable in memory.
+                try:
+                    sys.stderr.write(f"[bot_logger] run log persist failed: {e}\n")
+                except Exception:
+                    pass
+            if not records and not self.dropped:
+                return
+        if self.dropped:
+            records.append({"ts": time.time(), "level": "warning",
+                            "msg": f"log queue full; dropped {self.dropped} records"})
+            self.dropped = 0
+        for sink in self.sinks:
+            try:
+                sink.write(records)
+            except Exception as e:
+                # A failing sink must not take the others (or the writer thread) down.
+                try:
+                    sys.stderr.write(f"[bot_logger] {type(sink).__name__} failed: {e}\n")
+                except Exception:
+                    pass
+
+
+def _build_sinks():
+    sinks = []
+    for name in (n.strip() for n in config.LOG_SINKS.split(",")):
+        if name == "stdout":
+            sinks.append(StdoutSink())
+        elif name == "file" and config.LOG_FILE:
+            sinks.append(FileSink(config.LOG_FILE))
+        elif name == "valkey":
+            sinks.append(ValkeySink(config.LOG_VALKEY_STREAM))
+    return sinks
+
+
+_writer = LogWriter(
+    _build_sinks(),
+    max_queue=config.LOG_QUEUE_SIZE,
+    batch_size=config.LOG_BATCH_SIZE,
+    flush_interval=config.LOG_FLUSH_INTERVAL,
+)
+atexit.register(_writer.flush)
+
+
+def flush(timeout: float = 5.0):
+    _writer.flush(timeout)
+
+
+def _emit(level: str, msg: str, source: str | None = None, **fields):
+    if LEVELS[level] < _min_level:
+        return
+    entry = _log_buffer.append(level, msg)
+    run_id = getattr(_context, "run_id", None)
+    if run_id:
+        buf = get_run_buffer(run_id)
+        if buf is not None:
+            buf.append(level, msg)
+    record = {"ts": entry["ts"], "level": level, "msg": msg}
+    if source:
+        record["source"] = source
+    if run_id:
+        record["run_id"] = run_id
+    if fields:
+        record.update(fields)
+    _writer.submit(record)
 
-# Keep last 500 log entries
-MAX_LOGS = 500
-_log_buffer: collections.deque = collections.deque(maxlen=MAX_LOGS)
-_lock = threading.Lock()
 
+def debug(msg: str, source: str | None = None, **fields):
+    if LEVELS["debug"] < _min_level:
+        return
+    _emit("debug", msg, source, **fields)
 
-def _emit(level: str, msg: str, prefix: str = ""):
-    ts = time.time()
-    entry = {"ts": ts, "level": level, "msg": msg}
-    with _lock:
-        _log_buffer.append(entry)
-    out = f"{prefix}{msg}" if prefix else msg
-    print(out)
 
+def info(msg: str, source: str | None = None, **fields):
+    _emit("info", msg, source, **fields)
 
-def info(msg: str):
-    _emit("info", msg)
 
+def warning(msg: str, source: str | None = None, **fields):
+    _emit("warning", msg, source, **fields)
 
-def warning(msg: str):
-    _emit("warning", msg, "[WARN] ")
 
+def error(msg: str, source: str | None = None, **fields):
+    _emit("error", msg, source, **fields)
 
-def error(msg: str):
-    _emit("error", msg, "[ERROR] ")
 
+def get_logs(since_ts: float | None = None, after_seq: int | None = None,
+             run_id: str | None = None, limit: int | None = None) -> list[dict]:
+    """Return log entries after a seq cursor (preferred) or, for old clients, after since_ts.
 
-def get_logs(since_ts: float | None = None) -> list[dict]:
-    """Return log entries, optionally after since_ts."""
-    with _lock:
-        logs = list(_log_buffer)
-    if since_ts is not None:
-        logs = [e for e in logs if e["ts"] > since_ts]
-    return logs
+    With `run_id`, reads that run's buffer, falling back to its Valkey stream when the
+    run was logged by another process or before a restart.
+    """
+    buf = _log_buffer
+    if run_id:
+        buf = get_run_buffer(run_id)
+        if buf is None:
+            try:
+                if after_seq is None and since_ts is not None:
+                    # Stream ids are seqs, not times: read the (capped) stream and filter.
+                    entries = [e for e in read_stream(f"{run_id}:logs") if e["ts"] > since_ts]
+                    return entries[:limit] if limit is not None else entries
+                return read_stream(f"{run_id}:logs", after_seq=after_seq, count=limit)
+            except Exception:
+                return []
+    if after_seq is None and since_ts is not None:
+        return buf.read_since_ts(since_ts)
+    return buf.read(after_seq=after_seq, limit=limit)
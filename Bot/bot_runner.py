@@ -2,14 +2,25 @@ import random
 import threading
 import time
 import traceback
-import uuid
-
-from web3 import Web3
 
+import clock as clocks
 import config
-from bot_logger import info as log_info, warning as log_warn, error as log_err
-from notifier import send_bot_stop_email
-from trade_store import create_trade, start_run, stop_run
+import metrics
+import tracing
+from bot_logger import info as log_info, warning as log_warn, error as log_err, open_run_buffer, close_run_buffer
+from notifier import notify_bot_stop
+from trade_ingest import get_ingestor
+from trade_store import (
+    build_trade,
+    fetch_records,
+    new_trade_id,
+    save_checkpoint,
+    start_run,
+    stop_run,
+    trade_exists,
+    unfinished_runs,
+    write_trades,
+)
 from uniswap import get_web3, get_account, send_eth
 from valkey_client import valkey, valkey_ping
 
@@ -20,9 +31,11 @@ POC_AMOUNT_WEI = 10
 class BotRunner:
     """Agent: vault withdrawals (BUY) and wallet sends (SELL). No swap logic."""
 
-    def __init__(self):
+    def __init__(self, clock=None):
+        self.clock = clock or clocks.REAL  # a VirtualClock runs the loop in simulated time
         self._thread = None
         self._stop_event = threading.Event()
+        self._expected = None  # the BUY withdrawal being waited on
         self._lock = threading.Lock()
 
         self.is_running = False
@@ -44,15 +57,22 @@ class BotRunner:
         self.smart_account_address = None
         self.bot_recipient_address = None
         self.stop_alert_email_sent = False
+        self.run_id = None
         self.price_history = []
         self.trade_history = []
+        self._resumed = False
+        self._detached = False
+        self._sides = None
+        self._next_tx = 1
+        self._inflight = None
+        self._unwritten = []  # trade records queued for write-behind but not yet written
 
     def _synthetic_price(self):
         """POC: synthetic price for chart (not real market data)."""
         base = 100.0 + self.iterations * 0.4 + (self.buy_count - self.sell_count) * 2.0
         return round(base + random.uniform(-0.5, 0.5), 2)
 
-    def start(self, session_key_expiry, session_key_address=None, vault_address=None, smart_account_address=None, bot_recipient_address=None):
+    def start(self, session_key_expiry, session_key_address=None, vault_address=None, smart_account_address=None, bot_recipient_address=None, run_id=None):
         with self._lock:
             if self.is_running:
                 return False
@@ -69,28 +89,193 @@ class BotRunner:
             self.vault_address = vault_address
             self.smart_account_address = smart_account_address
             self.bot_recipient_address = bot_recipient_address
-            self.started_at = time.time()
+            self.started_at = self.clock.time()
             self.iterations = 0
             self.pending_withdraw = None
             self.buy_count = 0
             self.sell_count = 0
             self.stop_reason = None
             self.stop_alert_email_sent = False
-            self.run_id = None
+            self.run_id = run_id  # pre-allocated by the fleet queue; otherwise start_run creates one
+            self.price_history = []
+            self.trade_history = []
+            self._resumed = False
+            self._detached = False
+            self._sides = None
+            self._next_tx = 1
+            self._inflight = None
+            self._unwritten = []
+
+            self._thread = threading.Thread(target=self._run_loop, daemon=True)
+            self._thread.start()
+            return True
+
+    def resume(self, checkpoint):
+        """Continue a run from a checkpoint written by a previous process (see _checkpoint)."""
+        with self._lock:
+            if self.is_running:
+                return False
+            self._stop_event.clear()
+            self.is_running = True
+            self.current_signal = "HOLD"
+            self.current_price = None
+            self.last_trade = checkpoint.get("last_trade")
+            self.total_trades = checkpoint["total_trades"]
+            self.error = None
+            self.session_key_expiry = checkpoint.get("session_key_expiry")
+            self.session_key_expired = False
+            self.session_key_address = checkpoint.get("session_key_address")
+            self.vault_address = checkpoint.get("vault_address")
+            self.smart_account_address = checkpoint.get("smart_account_address")
+            self.bot_recipient_address = checkpoint.get("bot_recipient_address")
+            self.started_at = checkpoint.get("started_at")
+            self.iterations = checkpoint["iterations"]
+            self.pending_withdraw = None
+            self.buy_count = checkpoint["buy_count"]
+            self.sell_count = checkpoint["sell_count"]
+            self.stop_reason = None
+            self.stop_alert_email_sent = False
+            self.run_id = checkpoint["run_id"]
             self.price_history = []
             self.trade_history = []
+            self._resumed = True
+            self._detached = False
+            self._sides = ["BUY" if c == "B" else "SELL" for c in checkpoint["sides"]]
+            self._next_tx = checkpoint["next_tx"]
+            self._inflight = checkpoint.get("inflight")
+            self._unwritten = checkpoint.get("unwritten", [])
 
             self._thread = threading.Thread(target=self._run_loop, daemon=True)
             self._thread.start()
             return True
 
+    def resume_unfinished(self):
+        """On startup: resume the newest unfinished run; close out any older ones."""
+        try:
+            checkpoints = unfinished_runs()
+        except Exception as e:
+            log_warn(f"Could not load run checkpoints: {e}")
+            return None
+        if not checkpoints:
+            return None
+        latest, stale = checkpoints[0], checkpoints[1:]
+        for cp in stale:
+            try:
+                stop_run(cp["run_id"], reason="ABANDONED")
+            except Exception as e:
+                log_warn(f"Could not close stale run {cp['run_id']}: {e}")
+        if self.resume(latest):
+            log_info(f"Resuming run {latest['run_id']} at trade #{latest['next_tx']}")
+            return latest["run_id"]
+        return None
+
+    @staticmethod
+    def _trade_recorded(trade_id):
+        """True if the trade is in Valkey or still queued for write (resume dedupe)."""
+        return get_ingestor().is_pending(trade_id) or trade_exists(trade_id)
+
+    @staticmethod
+    def _sell_receipt(w3, account, inflight):
+        """Receipt of a SELL broadcast before a crash, or None if it never went out."""
+        from web3.exceptions import TransactionNotFound
+
+        tx_hash = inflight.get("tx_hash")
+        if not tx_hash:
+            # Checkpoints from before tx hashes were stored only have the nonce.
+            return {} if w3.eth.get_transaction_count(account.address) > inflight["nonce"] else None
+        try:
+            return w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            pass
+        try:
+            w3.eth.get_transaction(tx_hash)  # broadcast but not mined yet
+        except TransactionNotFound:
+            return None  # never reached the node (or dropped): send again
+        return w3.eth.wait_for_transaction_receipt(tx_hash)
+
+    def _record_trade(self, **kwargs):
+        """Queue a trade for write-behind; it stays in the checkpoint until the ingestor has written it."""
+        record = build_trade(**kwargs)
+        self._unwritten.append(record)
+        get_ingestor().submit_record(record)
+
+    def _write_unwritten(self):
+        """On resume: write trades a crashed process had queued but not yet written."""
+        if not self._unwritten:
+            return
+        try:
+            written = write_trades(self._unwritten, skip_existing=True)
+            if written:
+                log_info(f"Recovered {len(written)} queued trade(s) from the checkpoint")
+        except Exception as e:
+            log_warn(f"Could not write recovered trades ({e}); spilling them for replay")
+            get_ingestor().spill(self._unwritten)
+        self._unwritten = []
+
+    def _checkpoint(self, inflight=None):
+        """Persist everything needed to continue this run after a crash.
+
+        `inflight` describes a trade that has been started but not yet recorded; it holds
+        the pre-allocated trade_id plus what is needed to tell whether the side effect
+        already happened (SELL: the signed tx hash; BUY: the block the withdrawal is watched from).
+        Recorded trades the write-behind ingestor has not written yet are kept in full
+        under "unwritten", so a crash before the flush does not lose them.
+        """
+        self._inflight = inflight
+        if not self.run_id:
+            return
+        ingestor = get_ingestor()
+        self._unwritten = [r for r in self._unwritten if ingestor.is_pending(r["trade_id"])]
+        state = {
+            "v": 1,
+            "run_id": self.run_id,
+            "session_key_expiry": self.session_key_expiry,
+            "session_key_address": self.session_key_address,
+            "vault_address": self.vault_address,
+            "smart_account_address": self.smart_account_address,
+            "bot_recipient_address": self.bot_recipient_address,
+            "started_at": self.started_at,
+            "sides": "".join(side[0] for side in self._sides),
+            "next_tx": self._next_tx,
+            "iterations": self.iterations,
+            "total_trades": self.total_trades,
+            "buy_count": self.buy_count,
+            "sell_count": self.sell_count,
+            "last_trade": self.last_trade,
+            "inflight": inflight,
+            "unwritten": self._unwritten,
+            "updated": time.time(),
+        }
+        try:
+            save_checkpoint(self.run_id, state)
+        except Exception as e:
+            log_warn(f"Checkpoint write failed: {e}")
+
     def stop(self):
         with self._lock:
             if not self.is_running:
                 return False
-            self._stop_event.set()
+            self._signal_stop()
             return True
 
+    def _signal_stop(self):
+        """Set the stop flag and wake the loop from whatever it is waiting on."""
+        self._stop_event.set()
+        expected = self._expected
+        if expected is not None:
+            expected.interrupt()
+
+    def detach(self, timeout=None):
+        """Stop the loop but leave the run open (checkpoint kept) so another process can resume it."""
+        with self._lock:
+            if not self.is_running:
+                return False
+            self._detached = True
+            self._signal_stop()
+        if self._thread:
+            self._thread.join(timeout)
+        return True
+
     def get_status(self):
         return {
             "is_running": self.is_running,
@@ -111,6 +296,7 @@ class BotRunner:
             "buy_count": self.buy_count,
             "sell_count": self.sell_count,
             "stop_reason": self.stop_reason,
+            "run_id": self.run_id,
             "price_history": getattr(self, "price_history", [])[-300:],
             "trade_history": getattr(self, "trade_history", [])[-100:],
         }
@@ -118,7 +304,7 @@ class BotRunner:
     def _check_session_key_expiry(self):
         if self.session_key_expiry is None:
             return True
-        if time.time() > self.session_key_expiry:
+        if self.clock.time() > self.session_key_expiry:
             self.session_key_expired = True
             self.error = "Session key expired"
             self._send_stop_alert_once("Session key expired")
@@ -127,15 +313,16 @@ class BotRunner:
         return True
 
     def _send_stop_alert_once(self, reason: str, force: bool = False):
-        """Send failure/expiry email once per run."""
+        """Queue the failure/expiry email once per run (sent by the notifier thread)."""
         if self.stop_alert_email_sent:
             return
         should_email = force or self.session_key_expired or bool(self.error)
         if not should_email:
             return
-        self.stop_alert_email_sent = send_bot_stop_email(
+        self.stop_alert_email_sent = notify_bot_stop(
             reason=reason,
             session_key_expired=self.session_key_expired,
+            run_id=self.run_id,
         )
 
     def _can_proceed_with_vault_withdraw(self, w3, amount_wei, recipient_address):
@@ -156,6 +343,11 @@ class BotRunner:
             return True
 
     def _run_loop(self):
+        # Under a shared VirtualClock, other threads wait while this run is working.
+        with self.clock.attach():
+            self._run_trades()
+
+    def _run_trades(self):
         try:
             w3 = get_web3()
             recipient_address = (self.bot_recipient_address or "").strip() or None
@@ -168,19 +360,29 @@ class BotRunner:
 
             assert valkey_ping(), "Valkey not reachable"
             user_wallet = recipient_address
-            self.run_id = start_run(user_wallet, buy_amount_wei=POC_AMOUNT_WEI)
-            log_info(f"Valkey run started: {self.run_id}")
+            amount_wei = POC_AMOUNT_WEI
+            if self._resumed:
+                open_run_buffer(self.run_id)
+                log_info(f"Valkey run resumed: {self.run_id}")
+                self._write_unwritten()
+            else:
+                self.run_id = start_run(user_wallet, buy_amount_wei=POC_AMOUNT_WEI, run_id=self.run_id)
+                open_run_buffer(self.run_id)
+                log_info(f"Valkey run started: {self.run_id}")
 
-            log_info("POC bot started: BUY = vault→your wallet, SELL = bot wallet→your wallet (10 wei)")
-            log_info("Agent started: session active.")
+                log_info("POC bot started: BUY = vault→your wallet, SELL = bot wallet→your wallet (10 wei)")
+                log_info("Agent started: session active.")
 
-            amount_wei = POC_AMOUNT_WEI
-            # Random number of trades (7 to 30) so run length is unpredictable
-            num_trades = random.randint(7, 30)
-            # Random BUY/SELL sequence — looks like normal market activity
-            sides = [random.choice(["BUY", "SELL"]) for _ in range(num_trades)]
+                # Random number of trades (7 to 30) so run length is unpredictable
+                num_trades = random.randint(7, 30)
+                # Random BUY/SELL sequence — looks like normal market activity
+                self._sides = [random.choice(["BUY", "SELL"]) for _ in range(num_trades)]
+                self._checkpoint()
+
+            sides = self._sides
+            num_trades = len(sides)
 
-            for tx_num in range(1, num_trades + 1):
+            for tx_num in range(self._next_tx, num_trades + 1):
                 if self._stop_event.is_set():
                     break
                 if not self._check_session_key_expiry():
@@ -188,58 +390,102 @@ class BotRunner:
 
                 side = sides[tx_num - 1]
                 self.iterations += 1
+                metrics.LOOP_ITERATIONS.inc(side)
+                tracing.begin(self.run_id, tx_num, side=side)
                 self.current_signal = side
                 price = self._synthetic_price()
                 self.current_price = price
-                self.price_history.append({"t": time.time(), "price": price})
+                self.price_history.append({"t": self.clock.time(), "price": price})
+
+                inflight = self._inflight if (self._inflight or {}).get("tx_num") == tx_num else None
 
                 if side == "BUY":
                     # BUY: withdraw from vault to your wallet (same as before; frontend does withdrawToBot to recipient)
-                    if not self._can_proceed_with_vault_withdraw(w3, amount_wei, recipient_address):
-                        log_err(f"BUY #{tx_num}: skipping — {self.error}")
-                        self.stop_reason = f"Stopped after {self.total_trades} trades (insufficient vault balance)"
-                        self._send_stop_alert_once(self.stop_reason)
-                        break
+                    vault_addr = self.vault_address or config.MOCK_VAULT_ADDRESS
+                    if inflight:
+                        trade_id = inflight["trade_id"]
+                        # Checkpoints from before log-based confirmation have no from_block.
+                        from_block = inflight.get("from_block", max(0, w3.eth.block_number - 300))
+                    else:
+                        with tracing.span("balance_check"):
+                            can_withdraw = self._can_proceed_with_vault_withdraw(w3, amount_wei, recipient_address)
+                        if not can_withdraw:
+                            log_err(f"BUY #{tx_num}: skipping — {self.error}")
+                            self.stop_reason = f"Stopped after {self.total_trades} trades (insufficient vault balance)"
+                            self._send_stop_alert_once(self.stop_reason)
+                            break
+                        trade_id = new_trade_id()
+                        from_block = w3.eth.block_number
+                        self._checkpoint({"tx_num": tx_num, "trade_id": trade_id, "from_block": from_block})
                     self.pending_withdraw = {
                         "amount_wei": str(amount_wei),
                         "reason": f"BUY #{tx_num}",
-                        "vault_address": self.vault_address or config.MOCK_VAULT_ADDRESS,
+                        "vault_address": vault_addr,
                         "session_key_address": self.session_key_address,
                         "recipient_address": recipient_address,
                     }
                     log_info(f"BUY #{tx_num}: vault withdraw {amount_wei} wei...")
-                    initial_balance = w3.eth.get_balance(Web3.to_checksum_address(recipient_address))
-                    deadline = time.time() + 60
-                    funded = False
-                    while not self._stop_event.is_set() and time.time() < deadline:
-                        time.sleep(3)
-                        self.price_history.append({"t": time.time(), "price": self._synthetic_price()})
-                        current_balance = w3.eth.get_balance(Web3.to_checksum_address(recipient_address))
-                        if current_balance > initial_balance:
-                            funded = True
-                            break
+                    deadline = self.clock.time() + 60
+                    funded = bool(inflight) and self._trade_recorded(trade_id)
+                    match = None
+                    if not funded:
+                        from withdrawal_watch import get_withdrawal_watcher
+
+                        # Filled when the vault logs WithdrawnTo for this recipient, amount and session key.
+                        watcher = get_withdrawal_watcher(w3, self.clock)
+                        expected = watcher.expect(
+                            vault=vault_addr,
+                            recipient=recipient_address,
+                            amount_wei=amount_wei,
+                            session_key=self.session_key_address,
+                            user=self.smart_account_address,
+                            from_block=from_block,
+                        )
+                        self._expected = expected
+                        try:
+                            with tracing.span("confirm"):
+                                while not self._stop_event.is_set() and self.clock.time() < deadline:
+                                    match = self.clock.wait(expected, min(3, max(0, deadline - self.clock.time())),
+                                                             self._stop_event)
+                                    self.price_history.append({"t": self.clock.time(), "price": self._synthetic_price()})
+                                    if match:
+                                        break
+                        finally:
+                            self._expected = None
+                            watcher.cancel(expected)
+                        funded = match is not None
                     self.pending_withdraw = None
+                    if not funded and self._detached:
+                        break
                     if funded:
-                        tx_hash = f"0x{uuid.uuid4().hex[:16]}"
+                        if match:
+                            tx_hash = match["tx_hash"]
+                        else:
+                            recorded = fetch_records([trade_id])[0]
+                            tx_hash = recorded["tx_ref"] if recorded else ""
                         log_info(f"BUY #{tx_num}: filled (tx: {tx_hash[:18]}...)")
+                        tracing.annotate(tx_hash=tx_hash)
                         self.total_trades += 1
                         self.buy_count += 1
-                        t = time.time()
+                        t = self.clock.time()
                         self.last_trade = {
                             "signal": "BUY",
                             "tx_hash": tx_hash,
                             "timestamp": t,
                             "amount": str(amount_wei),
                         }
-                        create_trade(
-                            run_id=self.run_id,
-                            user_wallet=user_wallet,
-                            side="BUY",
-                            amount_wei=amount_wei,
-                            tx_ref=tx_hash,
-                            to_wallet=user_wallet,
-                            meta={"buy_seq": self.buy_count},
-                        )
+                        if not (inflight and self._trade_recorded(trade_id)):
+                            with tracing.span("store"):
+                                self._record_trade(
+                                    run_id=self.run_id,
+                                    user_wallet=user_wallet,
+                                    side="BUY",
+                                    amount_wei=amount_wei,
+                                    tx_ref=tx_hash,
+                                    to_wallet=user_wallet,
+                                    meta={"buy_seq": self.buy_count},
+                                    trade_id=trade_id,
+                                )
                         self.trade_history.append({"signal": "BUY", "timestamp": t, "price": self._synthetic_price()})
                     else:
                         log_err(f"BUY #{tx_num}: timed out waiting for vault withdrawal (60s)")
@@ -254,30 +500,48 @@ class BotRunner:
                         log_err("SELL: skipped — no PRIVATE_KEY set")
                         self.error = "SELL requires PRIVATE_KEY in .env"
                         self._send_stop_alert_once(self.error)
+                        self._next_tx = tx_num + 1
+                        self._checkpoint()
                         continue
                     try:
                         account = get_account(w3)
-                        send_eth(w3, account, recipient_address, amount_wei)
-                        tx_hash = f"0x{uuid.uuid4().hex[:16]}"
+                        if inflight:
+                            trade_id = inflight["trade_id"]
+                            receipt = self._sell_receipt(w3, account, inflight)
+                        else:
+                            trade_id = new_trade_id()
+                            receipt = None
+                        if receipt is None:
+                            # send_eth picks the nonce under uniswap.tx_lock; the signed tx hash is
+                            # checkpointed before the broadcast so a resume can look it up.
+                            receipt = send_eth(w3, account, recipient_address, amount_wei,
+                                               before_send=lambda signed, nonce: self._checkpoint({
+                                                   "tx_num": tx_num, "trade_id": trade_id, "nonce": nonce,
+                                                   "tx_hash": w3.to_hex(signed.hash)}))
+                        # An empty receipt means a pre-hash checkpoint showed the SELL already went out.
+                        tx_hash = w3.to_hex(receipt["transactionHash"]) if receipt else inflight.get("tx_hash", "")
                         log_info(f"SELL #{tx_num}: filled (tx: {tx_hash[:18]}...)")
                         self.total_trades += 1
                         self.sell_count += 1
-                        t = time.time()
+                        t = self.clock.time()
                         self.last_trade = {
                             "signal": "SELL",
                             "tx_hash": tx_hash,
                             "timestamp": t,
                             "amount": str(amount_wei),
                         }
-                        create_trade(
-                            run_id=self.run_id,
-                            user_wallet=user_wallet,
-                            side="SELL",
-                            amount_wei=amount_wei,
-                            tx_ref=tx_hash,
-                            to_wallet=user_wallet,
-                            meta={"sell_seq": self.sell_count},
-                        )
+                        if not (inflight and self._trade_recorded(trade_id)):
+                            with tracing.span("store"):
+                                self._record_trade(
+                                    run_id=self.run_id,
+                                    user_wallet=user_wallet,
+                                    side="SELL",
+                                    amount_wei=amount_wei,
+                                    tx_ref=tx_hash,
+                                    to_wallet=user_wallet,
+                                    meta={"sell_seq": self.sell_count},
+                                    trade_id=trade_id,
+                                )
                         self.trade_history.append({"signal": "SELL", "timestamp": t, "price": self._synthetic_price()})
                     except Exception as e:
                         log_err(f"SELL #{tx_num}: failed — {e}")
@@ -286,15 +550,19 @@ class BotRunner:
                         self._send_stop_alert_once(self.stop_reason)
                         break
 
+                self._next_tx = tx_num + 1
+                with tracing.span("checkpoint"):
+                    self._checkpoint()
+                tracing.end()
+
                 if tx_num < num_trades:
-                    # Variable delay between trades (1–4 s) so timing isn’t fixed
-                    delay = random.uniform(1.0, 4.0)
-                    steps = max(1, int(delay))
-                    for _ in range(steps):
-                        if self._stop_event.is_set():
+                    # Variable delay between trades (1–4 s) so timing isn’t fixed; a price
+                    # point about every second for the chart. stop() wakes the sleep at once.
+                    wake_at = self.clock.time() + random.uniform(1.0, 4.0)
+                    while (remaining := wake_at - self.clock.time()) > 0:
+                        if self.clock.sleep(min(1.0, remaining), self._stop_event):
                             break
-                        time.sleep(delay / steps)
-                        self.price_history.append({"t": time.time(), "price": self._synthetic_price()})
+                        self.price_history.append({"t": self.clock.time(), "price": self._synthetic_price()})
 
             if not self.stop_reason:
                 self.stop_reason = f"Session complete. BUY: {self.buy_count}, SELL: {self.sell_count}."
@@ -305,23 +573,32 @@ class BotRunner:
             self.error = err_msg.strip().split("\n")[-1]
             self._send_stop_alert_once(self.error)
         finally:
-            reason = self.stop_reason or (f"Session key expired" if self.session_key_expired else (self.error or "User stopped"))
-            if self.run_id:
-                stop_reason = "POC_COMPLETE"
-                if self.session_key_expired:
-                    stop_reason = "SESSION_KEY_EXPIRED"
-                elif self.error:
-                    stop_reason = "ERROR"
-                if "timeout" in reason.lower():
-                    stop_reason = "TIMEOUT"
-                try:
-                    stop_run(self.run_id, reason=stop_reason)
-                except Exception as e:
-                    log_warn(f"Valkey stop_run failed: {e}")
-            # Also notify on graceful completion (e.g., full POC cycle done).
-            is_graceful_complete = isinstance(reason, str) and reason.startswith("POC complete")
-            # Notify on graceful session completion.
-            is_graceful_complete = isinstance(reason, str) and "Session complete" in reason
-            self._send_stop_alert_once(reason, force=is_graceful_complete)
-            log_info(f"Bot stopped: {reason}")
+            tracing.end(self.error)  # an iteration cut short by break or an exception
+            if self._detached:
+                log_info(f"Run {self.run_id} detached for handoff (checkpoint kept)")
+            else:
+                reason = self.stop_reason or (f"Session key expired" if self.session_key_expired else (self.error or "User stopped"))
+                if self.run_id:
+                    stop_reason = "POC_COMPLETE"
+                    if self.session_key_expired:
+                        stop_reason = "SESSION_KEY_EXPIRED"
+                    elif self.error:
+                        stop_reason = "ERROR"
+                    if "timeout" in reason.lower():
+                        stop_reason = "TIMEOUT"
+                    # Let queued trades land before the run is marked stopped. Trades still
+                    # queued after a timeout are written (or spilled) by the ingestor later.
+                    if not get_ingestor().flush():
+                        log_warn(f"Trade ingest still busy; run {self.run_id} stopped with trades queued")
+                    try:
+                        stop_run(self.run_id, reason=stop_reason)
+                    except Exception as e:
+                        log_warn(f"Valkey stop_run failed: {e}")
+                # Also notify on graceful completion (e.g., full POC cycle done).
+                is_graceful_complete = isinstance(reason, str) and reason.startswith("POC complete")
+                # Notify on graceful session completion.
+                is_graceful_complete = isinstance(reason, str) and "Session complete" in reason
+                self._send_stop_alert_once(reason, force=is_graceful_complete)
+                log_info(f"Bot stopped: {reason}")
+            close_run_buffer()
             self.is_running = False
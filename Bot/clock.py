@@ -0,0 +1,119 @@
+"""Clocks for the run loops: real time in production, virtual time for simulations.
+
+Loops take their time and their waits from a clock instead of `time`:
+
+    clock.time()                      seconds since the epoch (time.time())
+    clock.sleep(seconds, stop)        True if `stop` (a threading.Event) was set first
+    clock.wait(waitable, timeout, stop)
+                                      waitable.wait(timeout) for a threading.Event or anything
+                                      with the same wait(), in this clock's time; a virtual
+                                      wait also ends when `stop` is set
+
+`REAL` sleeps on the stop event itself, so a stop request wakes the sleeper at once
+instead of at the end of the current slice.
+
+`VirtualClock` is for tests, simulations and backtests. Its time only moves when
+threads sleep: sleep(s) schedules a wake-up at now + s, and once every attached
+thread is asleep the clock jumps to the earliest wake-up and releases that sleeper.
+A loop that runs on its own needs no attaching: each sleep returns at once with the
+clock moved on, so a day of trading runs as fast as the loop body. Threads that share
+one timeline wrap their loop in `with clock.attach():` so none runs ahead while
+another is still working. A thread that attaches later joins at the current virtual time.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class RealClock:
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float, stop: threading.Event | None = None) -> bool:
+        if stop is None:
+            time.sleep(max(0.0, seconds))
+            return False
+        return stop.wait(max(0.0, seconds))
+
+    def wait(self, waitable, timeout: float, stop: threading.Event | None = None):
+        return waitable.wait(timeout)
+
+    def attach(self):
+        return nullcontext()
+
+
+REAL = RealClock()
+
+
+class VirtualClock:
+    # How often (real seconds) a virtual sleeper blocked behind other threads checks
+    # its stop event.
+    STOP_POLL = 0.05
+
+    def __init__(self, start: float | None = None):
+        self._now = time.time() if start is None else float(start)
+        self._cond = threading.Condition()
+        self._heap: list = []  # [wake_at, seq, thread ident, released]
+        self._seq = itertools.count()
+        self._attached: dict = {}  # thread ident -> attach depth
+        self._sleeping: set = set()  # thread idents with a pending wake-up
+
+    def time(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float, stop: threading.Event | None = None) -> bool:
+        ident = threading.get_ident()
+        with self._cond:
+            if stop is not None and stop.is_set():
+                return True
+            entry = [self._now + max(0.0, seconds), next(self._seq), ident, False]
+            heapq.heappush(self._heap, entry)
+            self._sleeping.add(ident)
+            self._advance()
+            while not entry[3]:
+                if stop is not None and stop.is_set():
+                    entry[3] = True  # dropped from the heap by _advance
+                    self._sleeping.discard(ident)
+                    self._advance()
+                    return True
+                self._cond.wait(self.STOP_POLL if stop is not None else None)
+            return stop is not None and stop.is_set()
+
+    def wait(self, waitable, timeout: float, stop: threading.Event | None = None):
+        """Return at once if `waitable` is already set, else after `timeout` virtual seconds
+        (or as soon as `stop` is set)."""
+        result = waitable.wait(0)
+        if result:
+            return result
+        self.sleep(timeout, stop)
+        return waitable.wait(0)
+
+    @contextmanager
+    def attach(self):
+        """Count the calling thread in the timeline until the block exits."""
+        ident = threading.get_ident()
+        with self._cond:
+            self._attached[ident] = self._attached.get(ident, 0) + 1
+        try:
+            yield self
+        finally:
+            with self._cond:
+                depth = self._attached.pop(ident) - 1
+                if depth:
+                    self._attached[ident] = depth
+                self._advance()
+
+    def _advance(self):
+        # Caller holds self._cond.
+        while self._heap and all(ident in self._sleeping for ident in self._attached):
+            entry = heapq.heappop(self._heap)
+            if entry[3]:
+                continue
+            wake_at, _, ident, _ = entry
+            self._now = max(self._now, wake_at)
+            entry[3] = True
+            self._sleeping.discard(ident)
+            self._cond.notify_all()
@@ -16,6 +16,13 @@ TRADE_LOGGER_ADDRESS = os.getenv("TRADE_LOGGER_ADDRESS")
 RESEND_API_KEY = os.getenv("RESEND_API_KEY", "")
 BOT_ALERT_EMAIL_TO = os.getenv("BOT_ALERT_EMAIL_TO", "")
 BOT_ALERT_EMAIL_FROM = os.getenv("BOT_ALERT_EMAIL_FROM", "")
+RESEND_API_URL = os.getenv("RESEND_API_URL", "https://api.resend.com/emails")
+# Stop alerts (see notifier.py): alerts arriving within NOTIFY_DIGEST_WINDOW seconds share one
+# digest email; at most NOTIFY_MAX_PER_MINUTE emails; one alert per run and reason per NOTIFY_DEDUP_TTL s.
+NOTIFY_DIGEST_WINDOW = float(os.getenv("NOTIFY_DIGEST_WINDOW", "10"))
+NOTIFY_MAX_PER_MINUTE = int(os.getenv("NOTIFY_MAX_PER_MINUTE", "6"))
+NOTIFY_DEDUP_TTL = int(os.getenv("NOTIFY_DEDUP_TTL", "86400"))
+NOTIFY_HTTP_TIMEOUT = float(os.getenv("NOTIFY_HTTP_TIMEOUT", "10"))
 
 # --- Contract Addresses (Sepolia Testnet) ---
 SWAP_ROUTER_ADDRESS = "0x3bFA4769FB09eefC5a80d6E87c3B9C650f7Ae48E"  # SwapRouter02
@@ -59,3 +66,101 @@ CHECK_INTERVAL_SECONDS = 5 if SIMULATION_MODE else int(os.getenv("CHECK_INTERVAL
 
 # --- Demo Mode: force 3 BUY attempts within 1 minute to trigger withdrawal limit error ---
 DEMO_FORCE_3_BUYS = os.getenv("DEMO_FORCE_3_BUYS", "true").lower() == "true"
+
+# --- Fleet Mode ---
+# When true, /bot/start enqueues runs in Valkey and worker processes (python fleet.py) execute them.
+FLEET_MODE = os.getenv("FLEET_MODE", "false").lower() == "true"
+FLEET_MAX_RUNS_PER_WORKER = int(os.getenv("FLEET_MAX_RUNS_PER_WORKER", "8"))
+FLEET_LEASE_TTL_MS = int(os.getenv("FLEET_LEASE_TTL_MS", "15000"))
+
+# --- Log Buffer ---
+# Global buffer feeds /bot/logs; each run also gets its own buffer (optionally mirrored to a Valkey stream).
+LOG_BUFFER_CAPACITY = int(os.getenv("LOG_BUFFER_CAPACITY", "500"))
+LOG_RUN_BUFFER_CAPACITY = int(os.getenv("LOG_RUN_BUFFER_CAPACITY", "2000"))
+LOG_MAX_RUN_BUFFERS = int(os.getenv("LOG_MAX_RUN_BUFFERS", "20"))
+# Fleet workers persist run logs by default so the API process can serve them.
+LOG_STREAM_PERSIST = os.getenv("LOG_STREAM_PERSIST", "true" if FLEET_MODE else "false").lower() == "true"
+
+# --- Log Output ---
+# Output is written by a background thread; LOG_SINKS is a comma list of stdout,file,valkey.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info").lower()
+LOG_SINKS = os.getenv("LOG_SINKS", "stdout")
+LOG_FILE = os.getenv("LOG_FILE", "")
+LOG_VALKEY_STREAM = os.getenv("LOG_VALKEY_STREAM", "bot:logs")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "256"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "0.05"))
+
+# --- Trade Ingestion (write-behind) ---
+TRADE_INGEST_MAX_QUEUE = int(os.getenv("TRADE_INGEST_MAX_QUEUE", "10000"))
+TRADE_INGEST_BATCH_SIZE = int(os.getenv("TRADE_INGEST_BATCH_SIZE", "200"))
+TRADE_INGEST_FLUSH_MS = int(os.getenv("TRADE_INGEST_FLUSH_MS", "50"))
+TRADE_INGEST_PUT_TIMEOUT = float(os.getenv("TRADE_INGEST_PUT_TIMEOUT", "2.0"))
+TRADE_SPILL_PATH = os.getenv("TRADE_SPILL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "trade_spill.jsonl"))
+
+# --- Trade Retention ---
+# Trades older than TRADE_HOT_DAYS move from Valkey to compressed day segments under
+# TRADE_ARCHIVE_DIR (still readable through the query API). Stopped runs' keys expire
+# after RUN_RETENTION_DAYS. TRADE_ARCHIVE_INTERVAL is in seconds; 0 disables the archiver.
+TRADE_HOT_DAYS = int(os.getenv("TRADE_HOT_DAYS", "7"))
+RUN_RETENTION_DAYS = int(os.getenv("RUN_RETENTION_DAYS", "90"))
+TRADE_ARCHIVE_DIR = os.getenv("TRADE_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive"))
+TRADE_ARCHIVE_INTERVAL = int(os.getenv("TRADE_ARCHIVE_INTERVAL", "3600"))
+TRADE_ARCHIVE_CACHE_BYTES = int(os.getenv("TRADE_ARCHIVE_CACHE_BYTES", str(16 * 1024 * 1024)))  # per process
+# Day rollup buckets (trade_rollups.py) expire after this many days; 0 keeps them.
+ROLLUP_DAY_RETENTION_DAYS = int(os.getenv("ROLLUP_DAY_RETENTION_DAYS", "400"))
+
+# --- Trade Proofs (background worker, see proof_queue.py) ---
+PROOF_MAX_ATTEMPTS = int(os.getenv("PROOF_MAX_ATTEMPTS", "8"))
+PROOF_RETRY_BASE_SECONDS = float(os.getenv("PROOF_RETRY_BASE_SECONDS", "5"))
+PROOF_RECEIPT_TIMEOUT = int(os.getenv("PROOF_RECEIPT_TIMEOUT", "180"))
+# A claimed proof whose worker disappears goes back on the queue after this long.
+PROOF_LEASE_MS = int(os.getenv("PROOF_LEASE_MS", "300000"))
+# Batch mode: >1 anchors up to this many trades per IPFS pin + logBatch (Merkle root).
+# Needs a TradeLogger deployed with logBatch. A partial batch goes out after PROOF_BATCH_MAX_WAIT seconds.
+PROOF_BATCH_SIZE = int(os.getenv("PROOF_BATCH_SIZE", "1"))
+PROOF_BATCH_MAX_WAIT = float(os.getenv("PROOF_BATCH_MAX_WAIT", "60"))
+# Where proof JSON is pinned: pinata | local (files under PIN_DIR) | memory. CIDs are computed
+# locally either way, so the on-chain log does not wait for the upload.
+PINNING_BACKEND = os.getenv("PINNING_BACKEND", "pinata")
+PIN_DIR = os.getenv("PIN_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "pins"))
+
+# --- Event Indexer (see event_indexer.py) ---
+# Vaults to index (comma-separated); defaults to MOCK_VAULT_ADDRESS. TradeLogger events are
+# indexed whenever TRADE_LOGGER_ADDRESS is set. INDEXER_START_BLOCK < 0 starts at the head.
+INDEXER_VAULT_ADDRESSES = [a.strip() for a in os.getenv("INDEXER_VAULT_ADDRESSES", MOCK_VAULT_ADDRESS).split(",") if a.strip()]
+INDEXER_START_BLOCK = int(os.getenv("INDEXER_START_BLOCK", "-1"))
+INDEXER_CONFIRMATIONS = int(os.getenv("INDEXER_CONFIRMATIONS", "12"))
+INDEXER_MAX_BLOCK_RANGE = int(os.getenv("INDEXER_MAX_BLOCK_RANGE", "2000"))
+INDEXER_POLL_INTERVAL = int(os.getenv("INDEXER_POLL_INTERVAL", "15"))  # seconds; 0 disables
+
+# --- Vault read cache (see vault_cache.py) ---
+VAULT_CACHE_POLL_INTERVAL = float(os.getenv("VAULT_CACHE_POLL_INTERVAL", "2"))  # head/log poll, seconds
+VAULT_STATE_TTL = float(os.getenv("VAULT_STATE_TTL", "60"))  # balances, withdrawal counts
+VAULT_LIMITS_TTL = float(os.getenv("VAULT_LIMITS_TTL", "3600"))  # withdrawal limits
+# BUY fills are confirmed from WithdrawnTo logs polled this often (seconds; see withdrawal_watch.py).
+WITHDRAWAL_POLL_INTERVAL = float(os.getenv("WITHDRAWAL_POLL_INTERVAL", "2"))
+
+# --- API serving (see serve.py) ---
+# Workers > 1 needs FLEET_MODE: without it the bot runs inside the API process, so every
+# request must reach the same process. 0 = automatic (2 x CPUs + 1 with fleet mode, else 1).
+API_WORKERS = int(os.getenv("API_WORKERS", "0"))
+API_THREADS = int(os.getenv("API_THREADS", "8"))
+API_TIMEOUT = int(os.getenv("API_TIMEOUT", "60"))
+# Per-worker response caches (seconds; 0 disables): /bot/info, and the other read endpoints.
+API_INFO_CACHE_TTL = float(os.getenv("API_INFO_CACHE_TTL", "5"))
+API_READ_CACHE_TTL = float(os.getenv("API_READ_CACHE_TTL", "2"))
+# Load web3 and the chain clients on a background thread once the API or a fleet worker
+# is up (see warmup.py); false leaves them to the first request that needs them.
+PREWARM = os.getenv("PREWARM", "true").lower() == "true"
+
+# --- Metrics (see metrics.py) ---
+# The API serves GET /metrics itself; bot.py and fleet.py serve it on this port when set.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# --- Tracing and profiling (see tracing.py, profiler.py) ---
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))  # traces kept per run; 0 = off
+# Admin endpoints (/admin/profile) need this token as a Bearer header; unset = disabled.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
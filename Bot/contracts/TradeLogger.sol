@@ -9,9 +9,22 @@ contract TradeLogger {
         uint256 timestamp;
     }
 
+    // A batch anchors many trades at once: the IPFS document lists every trade's
+    // metadata and merkleRoot commits to them (see Bot/merkle.py for the leaf encoding).
+    struct Batch {
+        address trader;
+        bytes32 merkleRoot;
+        string ipfsCid;
+        uint256 count;
+        uint256 timestamp;
+    }
+
     Trade[] public trades;
     mapping(bytes32 => Trade) public tradeByHash;
 
+    Batch[] public batches;
+    mapping(bytes32 => uint256) public batchIdByRoot; // batch id + 1; 0 = not logged
+
     event TradeLogged(
         uint256 indexed tradeId,
         bytes32 indexed swapTxHash,
@@ -20,6 +33,15 @@ contract TradeLogger {
         uint256 timestamp
     );
 
+    event BatchLogged(
+        uint256 indexed batchId,
+        bytes32 indexed merkleRoot,
+        address indexed trader,
+        string ipfsCid,
+        uint256 count,
+        uint256 timestamp
+    );
+
     function logTrade(bytes32 swapTxHash, string calldata ipfsCid) external {
         Trade memory t = Trade({
             trader: msg.sender,
@@ -32,6 +54,43 @@ contract TradeLogger {
         emit TradeLogged(trades.length - 1, swapTxHash, msg.sender, ipfsCid, block.timestamp);
     }
 
+    function logBatch(bytes32 merkleRoot, string calldata ipfsCid, uint256 count) external {
+        require(batchIdByRoot[merkleRoot] == 0, "batch already logged");
+        batches.push(Batch({
+            trader: msg.sender,
+            merkleRoot: merkleRoot,
+            ipfsCid: ipfsCid,
+            count: count,
+            timestamp: block.timestamp
+        }));
+        batchIdByRoot[merkleRoot] = batches.length;
+        emit BatchLogged(batches.length - 1, merkleRoot, msg.sender, ipfsCid, count, block.timestamp);
+    }
+
+    /// @notice True when `leaf` is in a logged batch with root `merkleRoot`.
+    /// Pairs are hashed in sorted order, so `proof` is just the sibling hashes.
+    function verifyTrade(bytes32 merkleRoot, bytes32 leaf, bytes32[] calldata proof)
+        external
+        view
+        returns (bool)
+    {
+        if (batchIdByRoot[merkleRoot] == 0) {
+            return false;
+        }
+        bytes32 computed = leaf;
+        for (uint256 i = 0; i < proof.length; i++) {
+            bytes32 sibling = proof[i];
+            computed = computed < sibling
+                ? keccak256(abi.encodePacked(computed, sibling))
+                : keccak256(abi.encodePacked(sibling, computed));
+        }
+        return computed == merkleRoot;
+    }
+
+    function getBatchCount() external view returns (uint256) {
+        return batches.length;
+    }
+
     function getTradeByHash(bytes32 swapTxHash)
         external
         view
@@ -1,24 +1,65 @@
-"""One-shot script to deploy TradeLogger contract to Sepolia."""
+"""One-shot script to deploy TradeLogger contract to Sepolia.
 
+    python deploy_logger.py             deploy abi/trade_logger_bytecode.txt
+    python deploy_logger.py --compile   compile contracts/TradeLogger.sol (py-solc-x, solc
+                                        SOLC_VERSION) into abi/ first, then deploy
+    python deploy_logger.py --compile-only
+
+The deploy refuses bytecode that does not implement every function in the ABI, so a
+logger without logBatch cannot be deployed by accident.
+"""
+
+import argparse
 import json
 import os
 
+from eth_utils import function_abi_to_4byte_selector
 from web3 import Web3
 
 import config
+from bot_logger import info as log_info, error as log_err
 
 ABI_DIR = os.path.join(os.path.dirname(__file__), "abi")
+SOURCE = os.path.join(os.path.dirname(__file__), "contracts", "TradeLogger.sol")
+SOLC_VERSION = "0.8.19"
 
 
-def main():
-    # Connect
-    w3 = Web3(Web3.HTTPProvider(config.RPC_URL))
-    if not w3.is_connected():
-        raise ConnectionError(f"Cannot connect to {config.RPC_URL}")
+def compile_logger():
+    """Compile TradeLogger.sol and write its ABI and bytecode into abi/."""
+    try:
+        import solcx
+    except ImportError:
+        raise SystemExit("--compile needs py-solc-x: pip install py-solc-x")
+
+    solcx.install_solc(SOLC_VERSION)
+    out = solcx.compile_files(
+        [SOURCE], output_values=["abi", "bin"], solc_version=SOLC_VERSION,
+        optimize=True, optimize_runs=200,
+    )
+    contract = next(v for k, v in out.items() if k.endswith(":TradeLogger"))
+    with open(os.path.join(ABI_DIR, "trade_logger_abi.json"), "w") as f:
+        json.dump(contract["abi"], f, indent=2)
+        f.write("\n")
+    with open(os.path.join(ABI_DIR, "trade_logger_bytecode.txt"), "w") as f:
+        f.write(contract["bin"] + "\n")
+    log_info(f"Compiled {SOURCE} with solc {SOLC_VERSION}")
+
+
+def missing_functions(abi: list, bytecode: str) -> list[str]:
+    """ABI functions whose selector is not in the bytecode's dispatcher."""
+    return [fn["name"] for fn in abi
+            if fn["type"] == "function" and function_abi_to_4byte_selector(fn).hex() not in bytecode]
 
-    account = w3.eth.account.from_key(config.PRIVATE_KEY)
-    print(f"Deploying from: {account.address}")
-    print(f"ETH balance: {Web3.from_wei(w3.eth.get_balance(account.address), 'ether')} ETH")
+
+def main():
+    parser = argparse.ArgumentParser(description="Deploy the TradeLogger contract")
+    parser.add_argument("--compile", action="store_true", help="recompile contracts/TradeLogger.sol first")
+    parser.add_argument("--compile-only", action="store_true", help="recompile and exit without deploying")
+    args = parser.parse_args()
+    if args.compile or args.compile_only:
+        compile_logger()
+        if args.compile_only:
+            return
 
     # Load ABI and bytecode
     with open(os.path.join(ABI_DIR, "trade_logger_abi.json")) as f:
@@ -27,6 +68,20 @@ def main():
     with open(os.path.join(ABI_DIR, "trade_logger_bytecode.txt")) as f:
         bytecode = f.read().strip()
 
+    missing = missing_functions(abi, bytecode)
+    if missing:
+        raise SystemExit(f"trade_logger_bytecode.txt does not implement {', '.join(missing)} from the ABI; "
+                         "run `python deploy_logger.py --compile` to rebuild it from contracts/TradeLogger.sol")
+
+    # Connect
+    w3 = Web3(Web3.HTTPProvider(config.RPC_URL))
+    if not w3.is_connected():
+        raise ConnectionError(f"Cannot connect to {config.RPC_URL}")
+
+    account = w3.eth.account.from_key(config.PRIVATE_KEY)
+    log_info(f"Deploying from: {account.address}")
+    log_info(f"ETH balance: {Web3.from_wei(w3.eth.get_balance(account.address), 'ether')} ETH")
+
     # Build deployment transaction
     contract = w3.eth.contract(abi=abi, bytecode=bytecode)
     nonce = w3.eth.get_transaction_count(account.address)
@@ -40,20 +95,20 @@ def main():
     # Sign and send
     signed = account.sign_transaction(tx)
     tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
-    print(f"Deploy tx sent: {tx_hash.hex()}")
-    print("Waiting for confirmation...")
+    log_info(f"Deploy tx sent: {tx_hash.hex()}")
+    log_info("Waiting for confirmation...")
 
     receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
     if receipt["status"] == 1:
-        print(f"\nTradeLogger deployed successfully!")
-        print(f"  Contract address: {receipt['contractAddress']}")
-        print(f"  Block: {receipt['blockNumber']}")
-        print(f"  Gas used: {receipt['gasUsed']}")
-        print(f"\nAdd this to your .env file:")
-        print(f"  TRADE_LOGGER_ADDRESS={receipt['contractAddress']}")
-        print(f"\nEtherscan: https://sepolia.etherscan.io/address/{receipt['contractAddress']}")
+        log_info("TradeLogger deployed successfully!")
+        log_info(f"  Contract address: {receipt['contractAddress']}")
+        log_info(f"  Block: {receipt['blockNumber']}")
+        log_info(f"  Gas used: {receipt['gasUsed']}")
+        log_info("Add this to your .env file:")
+        log_info(f"  TRADE_LOGGER_ADDRESS={receipt['contractAddress']}")
+        log_info(f"Etherscan: https://sepolia.etherscan.io/address/{receipt['contractAddress']}")
     else:
-        print(f"\nDeployment FAILED in block {receipt['blockNumber']}")
+        log_err(f"Deployment FAILED in block {receipt['blockNumber']}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,364 @@
+"""On-chain event indexer for TradeLogger and MockVault.
+
+Scans eth_getLogs for the TradeLogger (TRADE_LOGGER_ADDRESS) and vault
+(INDEXER_VAULT_ADDRESSES, default MOCK_VAULT_ADDRESS) contracts and stores every
+decoded event in Valkey, so proof and vault-history lookups are local reads:
+
+    evt:<tx_hash>:<log_index>              JSON record: event, address, block, tx_hash, log_index, ts, args
+    idx:events                             zset of every event, score = block * 100000 + log_index
+    idx:<address>:<Event>                  zset per contract and event name
+    idx:tradelog:<swap_tx>                 event id of TradeLogged for a swap
+    idx:batchlog:<merkle_root>             event id of BatchLogged for a root
+    idx:trader:<address>:logs              zset of TradeLogged / BatchLogged by trader
+    idx:vault:<vault>:events               zset of a vault's events
+    idx:vault:<vault>:account:<address>    zset of a vault's events naming that user/caller/recipient
+    indexer:checkpoint                     hash: block, hash (last indexed block), span
+    indexer:blocks                         zset of recent "<block>:<hash>" chunk ends, for reorg checks
+
+Only blocks at least INDEXER_CONFIRMATIONS deep are indexed, so ordinary reorgs never
+reach the index. If the checkpoint block's hash changes anyway (a deeper reorg), the
+indexer rewinds to the newest recorded chunk end still on the canonical chain and drops
+the events above it. Block ranges start at INDEXER_MAX_BLOCK_RANGE, halve when the RPC
+rejects or times out on a range, and double after successes up to the last size that
+worked.
+Each chunk's events and the new checkpoint are written in one transaction. Only one
+process indexes at a time (Valkey lock).
+
+    python event_indexer.py           # run forever, every INDEXER_POLL_INTERVAL seconds
+    python event_indexer.py --once    # catch up to the confirmed head and exit
+"""
+
+import argparse
+import json
+import threading
+import uuid
+
+import config
+from bot_logger import info as log_info, warning as log_warn, error as log_err
+from uniswap import load_abi
+from valkey_client import valkey
+
+CHECKPOINT_KEY = "indexer:checkpoint"
+BLOCKS_KEY = "indexer:blocks"
+_BLOCK_HISTORY = 128
+LOCK_KEY = "lock:event_indexer"
+ALL_KEY = "idx:events"
+_ACCOUNT_ARGS = ("user", "caller", "recipient", "account")
+
+
+def _score(block: int, log_index: int) -> int:
+    return block * 100_000 + log_index
+
+
+def _hex(value) -> str:
+    h = value.hex() if isinstance(value, (bytes, bytearray)) else str(value)
+    h = h.lower()
+    return h if h.startswith("0x") else "0x" + h
+
+
+def _plain(value):
+    """JSON-safe event argument: addresses lowercased, bytes as 0x hex, uint256 as a decimal string."""
+    if isinstance(value, (bytes, bytearray)):
+        return _hex(value)
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, str):
+        from eth_utils import is_address
+
+        if is_address(value):
+            return value.lower()
+    return value
+
+
+def _index_keys(record: dict) -> list[str]:
+    """Every index an event belongs to (used both to add and to remove it)."""
+    address, name, args = record["address"], record["event"], record["args"]
+    keys = [ALL_KEY, f"idx:{address}:{name}"]
+    if record["source"] == "trade_logger":
+        keys.append(f"idx:trader:{args['trader']}:logs")
+    else:
+        keys.append(f"idx:vault:{address}:events")
+        keys.extend(f"idx:vault:{address}:account:{args[a]}" for a in _ACCOUNT_ARGS if a in args)
+    return keys
+
+
+def _lookup_key(record: dict) -> str | None:
+    if record["event"] == "TradeLogged":
+        return f"idx:tradelog:{record['args']['swapTxHash']}"
+    if record["event"] == "BatchLogged":
+        return f"idx:batchlog:{record['args']['merkleRoot']}"
+    return None
+
+
+class EventIndexer:
+    def __init__(self, w3, trade_logger: str | None = None, vaults: list[str] | None = None):
+        self.w3 = w3
+        self.confirmations = config.INDEXER_CONFIRMATIONS
+        self.max_span = config.INDEXER_MAX_BLOCK_RANGE
+        self._events = {}  # (address, topic0) -> (source, contract event)
+        self.addresses = []
+        trade_logger = trade_logger if trade_logger is not None else config.TRADE_LOGGER_ADDRESS
+        vaults = vaults if vaults is not None else config.INDEXER_VAULT_ADDRESSES
+        if trade_logger:
+            self._add("trade_logger", trade_logger, "trade_logger_abi.json")
+        for vault in vaults:
+            self._add("vault", vault, "mock_vault_abi.json")
+
+    def _add(self, source: str, address: str, abi_file: str):
+        from eth_utils import event_abi_to_log_topic
+
+        abi = load_abi(abi_file)
+        contract = self.w3.eth.contract(address=self.w3.to_checksum_address(address), abi=abi)
+        for entry in abi:
+            if entry["type"] == "event":
+                topic = _hex(event_abi_to_log_topic(entry))
+                self._events[(address.lower(), topic)] = (source, contract.events[entry["name"]]())
+        self.addresses.append(self.w3.to_checksum_address(address))
+
+    # ---- scanning ----
+
+    def _get_logs(self, start: int, end: int) -> list:
+        return self.w3.eth.get_logs({"fromBlock": start, "toBlock": end, "address": self.addresses})
+
+    def _decode(self, log) -> dict | None:
+        address = log["address"].lower()
+        topics = log["topics"]
+        if not topics:
+            return None
+        found = self._events.get((address, _hex(topics[0])))
+        if not found:
+            return None
+        source, event = found
+        decoded = event.process_log(log)
+        return {
+            "source": source,
+            "event": decoded["event"],
+            "address": address,
+            "block": log["blockNumber"],
+            "block_hash": _hex(log["blockHash"]),
+            "tx_hash": _hex(log["transactionHash"]),
+            "log_index": log["logIndex"],
+            "args": {k: _plain(v) for k, v in decoded["args"].items()},
+        }
+
+    def _block_times(self, blocks) -> dict:
+        return {b: self.w3.eth.get_block(b)["timestamp"] for b in blocks}
+
+    def _write_chunk(self, records: list, end: int, end_hash: str, span: int):
+        times = self._block_times({r["block"] for r in records if "timestamp" not in r["args"]})
+        pipe = valkey.pipeline(transaction=True)
+        for r in records:
+            r["ts"] = int(r["args"]["timestamp"]) if "timestamp" in r["args"] else times[r["block"]]
+            event_id = f"{r['tx_hash']}:{r['log_index']}"
+            pipe.set(f"evt:{event_id}", json.dumps(r, separators=(",", ":")))
+            score = _score(r["block"], r["log_index"])
+            for key in _index_keys(r):
+                pipe.zadd(key, {event_id: score})
+            lookup = _lookup_key(r)
+            if lookup:
+                pipe.set(lookup, event_id)
+        pipe.hset(CHECKPOINT_KEY, mapping={"block": end, "hash": end_hash, "span": span})
+        pipe.zadd(BLOCKS_KEY, {f"{end}:{end_hash}": end})
+        pipe.zremrangebyrank(BLOCKS_KEY, 0, -_BLOCK_HISTORY - 1)
+        pipe.execute()
+
+    def _rewind(self, to_block: int):
+        """Drop indexed events above `to_block` and move the checkpoint back to it."""
+        ids = valkey.zrangebyscore(ALL_KEY, _score(to_block + 1, 0), "+inf")
+        records = [json.loads(r) for r in valkey.mget([f"evt:{i}" for i in ids])] if ids else []
+        pipe = valkey.pipeline(transaction=True)
+        for event_id, r in zip(ids, records):
+            pipe.delete(f"evt:{event_id}")
+            for key in _index_keys(r):
+                pipe.zrem(key, event_id)
+            lookup = _lookup_key(r)
+            if lookup:
+                pipe.delete(lookup)
+        block_hash = _hex(self.w3.eth.get_block(to_block)["hash"])
+        pipe.hset(CHECKPOINT_KEY, mapping={"block": to_block, "hash": block_hash})
+        pipe.zremrangebyscore(BLOCKS_KEY, f"({to_block}", "+inf")
+        pipe.execute()
+        log_warn(f"Event indexer: reorg, rewound to block {to_block} ({len(ids)} events dropped)")
+
+    def _checkpoint(self, head: int) -> tuple[int, int]:
+        """(last indexed block, current span), after rewinding past any reorged blocks."""
+        cp = valkey.hgetall(CHECKPOINT_KEY)
+        if not cp:
+            start = config.INDEXER_START_BLOCK
+            return (start - 1 if start >= 0 else head), self.max_span
+        block, span = int(cp["block"]), int(cp.get("span") or self.max_span)
+        if _hex(self.w3.eth.get_block(block)["hash"]) == cp["hash"]:
+            return block, span
+        # Reorged past the confirmation depth: back to the newest chunk end still canonical.
+        to_block = None
+        for member, score in valkey.zrevrange(BLOCKS_KEY, 0, -1, withscores=True):
+            n = int(score)
+            if n < block and _hex(self.w3.eth.get_block(n)["hash"]) == member.split(":", 1)[1]:
+                to_block = n
+                break
+        if to_block is None:
+            to_block = max(0, block - _BLOCK_HISTORY * self.confirmations)
+        self._rewind(to_block)
+        return to_block, span
+
+    def index_once(self, max_chunks: int | None = None) -> int:
+        """Catch up to head - INDEXER_CONFIRMATIONS; returns how many events were indexed."""
+        if not self.addresses:
+            return 0
+        token = uuid.uuid4().hex
+        if not valkey.set(LOCK_KEY, token, nx=True, ex=600):
+            return 0
+        indexed = 0
+        try:
+            head = self.w3.eth.block_number - self.confirmations
+            last, span = self._checkpoint(head)
+            chunks = 0
+            cap = self.max_span
+            while last < head and (max_chunks is None or chunks < max_chunks):
+                start = last + 1
+                end = min(head, start + span - 1)
+                try:
+                    logs = self._get_logs(start, end)
+                except Exception as e:
+                    if end == start:
+                        raise
+                    span = cap = max(1, (end - start + 1) // 2)
+                    log_warn(f"Event indexer: getLogs {start}-{end} failed ({e}); range now {span} blocks")
+                    continue
+                records = [r for r in (self._decode(log) for log in logs) if r]
+                end_hash = _hex(self.w3.eth.get_block(end)["hash"])
+                self._write_chunk(records, end, end_hash, span)
+                indexed += len(records)
+                last = end
+                chunks += 1
+                span = min(cap, span * 2)
+                valkey.expire(LOCK_KEY, 600)
+        finally:
+            if valkey.get(LOCK_KEY) == token:
+                valkey.delete(LOCK_KEY)
+        if indexed:
+            log_info(f"Event indexer: indexed {indexed} events up to block {last}")
+        return indexed
+
+
+# ---- queries ----
+
+def get_event(event_id: str) -> dict | None:
+    raw = valkey.get(f"evt:{event_id}")
+    return json.loads(raw) if raw else None
+
+
+def _lookup(key: str) -> dict | None:
+    event_id = valkey.get(key)
+    return get_event(event_id) if event_id else None
+
+
+def trade_log(swap_tx: str) -> dict | None:
+    """Indexed TradeLogged event for a swap (local stand-in for getTradeByHash)."""
+    return _lookup(f"idx:tradelog:{_hex(swap_tx)}")
+
+
+def batch_log(merkle_root: str) -> dict | None:
+    return _lookup(f"idx:batchlog:{_hex(merkle_root)}")
+
+
+def _event_ids(index_key: str, from_block: int | None, to_block: int | None, offset: int, num: int,
+               newest_first: bool) -> list[str]:
+    lo = _score(from_block, 0) if from_block is not None else "-inf"
+    hi = _score(to_block + 1, 0) - 1 if to_block is not None else "+inf"
+    if newest_first:
+        return valkey.zrevrangebyscore(index_key, hi, lo, start=offset, num=num)
+    return valkey.zrangebyscore(index_key, lo, hi, start=offset, num=num)
+
+
+def _load(ids: list[str]) -> list[dict]:
+    return [json.loads(r) for r in valkey.mget([f"evt:{i}" for i in ids]) if r] if ids else []
+
+
+def query_events(index_key: str, from_block: int | None = None, to_block: int | None = None,
+                 limit: int = 100, newest_first: bool = True) -> list[dict]:
+    """Events in one index, optionally limited to a block range."""
+    return _load(_event_ids(index_key, from_block, to_block, 0, limit, newest_first))
+
+
+def vault_events(vault: str, account: str | None = None, event: str | None = None,
+                 from_block: int | None = None, to_block: int | None = None,
+                 limit: int = 100, newest_first: bool = True) -> list[dict]:
+    """A vault's events, optionally only those naming `account` and/or of one event type."""
+    vault = vault.lower()
+    if account:
+        key = f"idx:vault:{vault}:account:{account.lower()}"
+    elif event:
+        key = f"idx:{vault}:{event}"
+        event = None
+    else:
+        key = f"idx:vault:{vault}:events"
+    if not event:
+        return query_events(key, from_block, to_block, limit, newest_first)
+    # account + event: filter the per-account index, reading ahead and paging on until
+    # the page is full or the index runs out.
+    out: list[dict] = []
+    offset, chunk = 0, limit * 4
+    while len(out) < limit:
+        ids = _event_ids(key, from_block, to_block, offset, chunk, newest_first)
+        out.extend(e for e in _load(ids) if e["event"] == event)
+        if len(ids) < chunk:
+            break
+        offset += chunk
+    return out[:limit]
+
+
+def trader_logs(trader: str, **kwargs) -> list[dict]:
+    return query_events(f"idx:trader:{trader.lower()}:logs", **kwargs)
+
+
+def status() -> dict:
+    cp = valkey.hgetall(CHECKPOINT_KEY)
+    return {
+        "block": int(cp["block"]) if cp else None,
+        "span": int(cp["span"]) if cp.get("span") else None,
+        "events": valkey.zcard(ALL_KEY),
+    }
+
+
+# ---- runner ----
+
+def run_forever(w3=None, interval: int | None = None, stop_event: threading.Event | None = None):
+    if w3 is None:
+        from uniswap import get_web3
+        w3 = get_web3()
+    interval = interval or config.INDEXER_POLL_INTERVAL
+    stop_event = stop_event or threading.Event()
+    indexer = EventIndexer(w3)
+    while not stop_event.is_set():
+        try:
+            indexer.index_once()
+        except Exception as e:
+            log_err(f"Event indexer pass failed: {e}")
+        stop_event.wait(interval)
+
+
+def start_indexer() -> threading.Thread | None:
+    """Run the indexer on a daemon thread (no-op when INDEXER_POLL_INTERVAL is 0 or nothing to index)."""
+    if config.INDEXER_POLL_INTERVAL <= 0 or not (config.TRADE_LOGGER_ADDRESS or config.INDEXER_VAULT_ADDRESSES):
+        return None
+    t = threading.Thread(target=run_forever, name="event-indexer", daemon=True)
+    t.start()
+    return t
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index TradeLogger and vault events into Valkey")
+    parser.add_argument("--once", action="store_true", help="catch up once and exit")
+    args = parser.parse_args()
+    if args.once:
+        from uniswap import get_web3
+        EventIndexer(get_web3()).index_once()
+    else:
+        run_forever()
+
+
+if __name__ == "__main__":
+    main()
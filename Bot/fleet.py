@@ -0,0 +1,379 @@
+"""Distributed runner fleet: a Valkey-backed run queue, renewable leases and pub/sub control.
+
+The API process enqueues run requests (`enqueue_run`); any number of worker processes
+(`python fleet.py`) claim them and run each one in its own BotRunner. Ownership is a
+lease key (`lease:<run_id>` = worker id, PX TTL) the owner renews. When a worker dies its
+leases expire, and another worker adopts the run from its checkpoint (see
+BotRunner.resume). Stop requests are published to the owning worker's control channel
+and also left as a flag, so a stop issued during a handoff is not lost.
+
+Keys:
+    runs:queue                  list of pending run requests (JSON), LPUSH / BLMOVE RIGHT
+    fleet:claimed:<worker>      requests a worker has taken off the queue
+    fleet:runs                  run ids that came through the queue and are not finished
+    fleet:workers               known worker ids; fleet:worker:<id> is the heartbeat (PX TTL)
+    lease:<run_id>              owning worker id (PX TTL)
+    <run_id>:status             latest BotRunner.get_status() snapshot (JSON, PX TTL); once the
+                                run ends, its final snapshot (or CANCELLED if it never started)
+                                is kept for FINAL_STATUS_TTL seconds
+    <run_id>:stop_requested     set by request_stop
+    fleet:last_run:<wallet>     the wallet's most recently queued run id
+"""
+
+import json
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+
+import config
+import metrics
+import warmup
+from bot_logger import info as log_info, warning as log_warn, error as log_err
+from bot_runner import BotRunner
+from trade_ingest import get_ingestor
+from trade_store import load_checkpoint, new_run_id, stop_run
+from valkey_client import valkey
+
+QUEUE_KEY = "runs:queue"
+FLEET_RUNS_KEY = "fleet:runs"
+WORKERS_KEY = "fleet:workers"
+FINAL_STATUS_TTL = 86400
+
+_RENEW_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def lease_key(run_id: str) -> str:
+    return f"lease:{run_id}"
+
+
+def claimed_key(worker_id: str) -> str:
+    return f"fleet:claimed:{worker_id}"
+
+
+def heartbeat_key(worker_id: str) -> str:
+    return f"fleet:worker:{worker_id}"
+
+
+def control_channel(worker_id: str) -> str:
+    return f"fleet:control:{worker_id}"
+
+
+def last_run_key(wallet: str) -> str:
+    return f"fleet:last_run:{wallet.lower()}"
+
+
+# ---- API side ----
+
+def enqueue_run(session_key_expiry=None, session_key_address=None, vault_address=None,
+                smart_account_address=None, bot_recipient_address=None) -> str:
+    """Queue a run request for the fleet and return its (pre-allocated) run id."""
+    run_id = new_run_id()
+    job = {
+        "run_id": run_id,
+        "session_key_expiry": session_key_expiry,
+        "session_key_address": session_key_address,
+        "vault_address": vault_address,
+        "smart_account_address": smart_account_address,
+        "bot_recipient_address": bot_recipient_address,
+        "enqueued_at": time.time(),
+    }
+    pipe = valkey.pipeline(transaction=True)
+    if smart_account_address:
+        pipe.set(last_run_key(smart_account_address), run_id)
+    pipe.lpush(QUEUE_KEY, json.dumps(job, separators=(",", ":")))
+    pipe.execute()
+    return run_id
+
+
+def latest_run_id(wallet: str):
+    """Most recently enqueued run for a smart account (lets clients that lost the run_id find it)."""
+    return valkey.get(last_run_key(wallet))
+
+
+def request_stop(run_id: str) -> bool:
+    """Ask the owning worker to stop a run. Returns True if a live owner was notified."""
+    valkey.set(f"{run_id}:stop_requested", "1", ex=86400)
+    owner = valkey.get(lease_key(run_id))
+    if not owner:
+        # Still queued or between owners: the flag is picked up on claim/adoption.
+        return False
+    valkey.publish(control_channel(owner), json.dumps({"cmd": "stop", "run_id": run_id}))
+    return True
+
+
+metrics.gauge("bot_fleet_queue_depth", "Runs queued for a fleet worker.", lambda: valkey.llen(QUEUE_KEY))
+
+
+def get_run_status(run_id: str):
+    """Latest status snapshot published by the owning worker, or a placeholder while queued."""
+    raw = valkey.get(f"{run_id}:status")
+    if raw:
+        return json.loads(raw)
+    run = valkey.hgetall(run_id)
+    status = BotRunner().get_status()
+    status["run_id"] = run_id
+    if run.get("status") == "STOPPED":
+        status["stop_reason"] = run.get("stop_reason")
+    else:
+        status["is_running"] = True
+        status["current_signal"] = "QUEUED"
+    return status
+
+
+# ---- Worker side ----
+
+class FleetWorker:
+    """Claims queued runs, keeps their leases alive and adopts runs from dead workers."""
+
+    def __init__(self, worker_id=None, max_runs=None, lease_ttl_ms=None):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.max_runs = max_runs or config.FLEET_MAX_RUNS_PER_WORKER
+        self.lease_ttl_ms = lease_ttl_ms or config.FLEET_LEASE_TTL_MS
+        self.renew_interval = self.lease_ttl_ms / 3000.0
+        self._runners: dict[str, BotRunner] = {}
+        self._jobs: dict[str, str] = {}  # run_id -> raw job in our claimed list
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._renew = valkey.register_script(_RENEW_LUA)
+        self._release = valkey.register_script(_RELEASE_LUA)
+        self._pubsub = None
+
+    # ---- leases ----
+
+    def _acquire(self, run_id: str) -> bool:
+        return bool(valkey.set(lease_key(run_id), self.worker_id, nx=True, px=self.lease_ttl_ms))
+
+    def _renew_lease(self, run_id: str) -> bool:
+        return bool(self._renew(keys=[lease_key(run_id)], args=[self.worker_id, self.lease_ttl_ms]))
+
+    def _release_lease(self, run_id: str):
+        self._release(keys=[lease_key(run_id)], args=[self.worker_id])
+
+    # ---- lifecycle ----
+
+    def run_forever(self):
+        log_info(f"[fleet] worker {self.worker_id} up (max {self.max_runs} runs)")
+        self._heartbeat()
+        self._pubsub = valkey.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{control_channel(self.worker_id): self._on_control})
+        control_thread = self._pubsub.run_in_thread(sleep_time=0.5, daemon=True)
+        maint = threading.Thread(target=self._maintenance_loop, name="fleet-maint", daemon=True)
+        maint.start()
+        try:
+            self._claim_loop()
+        finally:
+            control_thread.stop()
+            self.shutdown()
+
+    def shutdown(self):
+        """Hand off every owned run: detach runners, release leases, requeue unstarted jobs."""
+        self._stopping.set()
+        with self._lock:
+            runners = dict(self._runners)
+            jobs = dict(self._jobs)
+        for run_id, runner in list(runners.items()):
+            if not runner.detach(timeout=10):
+                # Already finished: close it out instead of handing it off.
+                self._finish(run_id, jobs.pop(run_id, None))
+                runners.pop(run_id)
+                continue
+            self._release_lease(run_id)
+        ckey = claimed_key(self.worker_id)
+        for run_id, raw in jobs.items():
+            if run_id not in runners or load_checkpoint(run_id) is None:
+                valkey.rpush(QUEUE_KEY, raw)
+            valkey.lrem(ckey, 1, raw)
+        valkey.delete(heartbeat_key(self.worker_id))
+        valkey.srem(WORKERS_KEY, self.worker_id)
+        log_info(f"[fleet] worker {self.worker_id} stopped; {len(runners)} run(s) handed off")
+
+    def _claim_loop(self):
+        ckey = claimed_key(self.worker_id)
+        while not self._stopping.is_set():
+            with self._lock:
+                full = len(self._runners) >= self.max_runs
+            if full:
+                self._stopping.wait(self.renew_interval)
+                continue
+            raw = valkey.blmove(QUEUE_KEY, ckey, timeout=1, src="RIGHT", dest="LEFT")
+            if raw is None:
+                continue
+            job = json.loads(raw)
+            run_id = job["run_id"]
+            if not self._acquire(run_id):
+                valkey.lrem(ckey, 1, raw)
+                continue
+            valkey.sadd(FLEET_RUNS_KEY, run_id)
+            if valkey.exists(f"{run_id}:stop_requested"):
+                self._cancel(run_id)
+                self._finish(run_id, raw)
+                continue
+            runner = BotRunner()
+            with self._lock:
+                self._runners[run_id] = runner
+                self._jobs[run_id] = raw
+            runner.start(
+                job.get("session_key_expiry"),
+                job.get("session_key_address"),
+                job.get("vault_address"),
+                job.get("smart_account_address"),
+                job.get("bot_recipient_address"),
+                run_id=run_id,
+            )
+            log_info(f"[fleet] claimed {run_id}")
+
+    def _cancel(self, run_id: str):
+        """Stopped before it started: no run record is written, only a status for pollers."""
+        status = BotRunner().get_status()
+        status.update(run_id=run_id, stop_reason="CANCELLED")
+        valkey.set(f"{run_id}:status", json.dumps(status, default=str), ex=FINAL_STATUS_TTL)
+        log_info(f"[fleet] {run_id} cancelled before it started")
+
+    def _finish(self, run_id: str, raw=None):
+        pipe = valkey.pipeline(transaction=False)
+        if raw is not None:
+            pipe.lrem(claimed_key(self.worker_id), 1, raw)
+        pipe.srem(FLEET_RUNS_KEY, run_id)
+        pipe.delete(f"{run_id}:stop_requested")
+        pipe.execute()
+        self._release_lease(run_id)
+
+    def _on_control(self, message):
+        try:
+            cmd = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if cmd.get("cmd") == "stop":
+            with self._lock:
+                runner = self._runners.get(cmd.get("run_id"))
+            if runner:
+                runner.stop()
+
+    # ---- periodic work ----
+
+    def _heartbeat(self):
+        pipe = valkey.pipeline(transaction=False)
+        pipe.set(heartbeat_key(self.worker_id), str(time.time()), px=self.lease_ttl_ms)
+        pipe.sadd(WORKERS_KEY, self.worker_id)
+        pipe.execute()
+
+    def _maintenance_loop(self):
+        while not self._stopping.wait(self.renew_interval):
+            try:
+                self._heartbeat()
+                self._tend_runs()
+                self._reap_dead_workers()
+                self._adopt_orphans()
+            except Exception as e:
+                log_warn(f"[fleet] maintenance failed: {e}")
+
+    def _tend_runs(self):
+        with self._lock:
+            owned = list(self._runners.items())
+        for run_id, runner in owned:
+            if not runner.is_running:
+                with self._lock:
+                    self._runners.pop(run_id, None)
+                    raw = self._jobs.pop(run_id, None)
+                status = runner.get_status()
+                status["worker_id"] = self.worker_id
+                # Pollers keep seeing the final counts, not an empty placeholder.
+                valkey.set(f"{run_id}:status", json.dumps(status, default=str), ex=FINAL_STATUS_TTL)
+                self._finish(run_id, raw)
+                log_info(f"[fleet] finished {run_id}")
+                continue
+            if not self._renew_lease(run_id):
+                # Someone else owns it now (we stalled past the TTL): stop without closing the run.
+                log_err(f"[fleet] lost lease on {run_id}; detaching")
+                runner.detach(timeout=0)
+                with self._lock:
+                    self._runners.pop(run_id, None)
+                    raw = self._jobs.pop(run_id, None)
+                if raw is not None:
+                    # No checkpoint means nobody can adopt it: run it again from the queue.
+                    if load_checkpoint(run_id) is None:
+                        valkey.rpush(QUEUE_KEY, raw)
+                    valkey.lrem(claimed_key(self.worker_id), 1, raw)
+                continue
+            if valkey.exists(f"{run_id}:stop_requested"):
+                runner.stop()
+            status = runner.get_status()
+            status["worker_id"] = self.worker_id
+            valkey.set(f"{run_id}:status", json.dumps(status, default=str), px=self.lease_ttl_ms * 2)
+
+    def _reap_dead_workers(self):
+        """Return queue items claimed by workers whose heartbeat expired."""
+        for worker_id in valkey.smembers(WORKERS_KEY):
+            if worker_id == self.worker_id or valkey.exists(heartbeat_key(worker_id)):
+                continue
+            ckey = claimed_key(worker_id)
+            claimed = valkey.lrange(ckey, 0, -1)
+            if any(valkey.exists(lease_key(json.loads(raw)["run_id"])) for raw in claimed):
+                continue  # its leases have not expired yet; try again next round
+            for raw in claimed:
+                # Runs with a checkpoint are adopted below; unstarted ones go back to the queue head.
+                if load_checkpoint(json.loads(raw)["run_id"]) is None:
+                    valkey.rpush(QUEUE_KEY, raw)
+                valkey.lrem(ckey, 1, raw)
+            valkey.srem(WORKERS_KEY, worker_id)
+            log_warn(f"[fleet] reaped dead worker {worker_id}")
+
+    def _adopt_orphans(self):
+        for run_id in valkey.smembers(FLEET_RUNS_KEY):
+            with self._lock:
+                if run_id in self._runners or len(self._runners) >= self.max_runs:
+                    continue
+            if valkey.exists(lease_key(run_id)):
+                continue
+            checkpoint = load_checkpoint(run_id)
+            if checkpoint is None:
+                # Finished (checkpoint cleared), or its owner died before the first checkpoint.
+                # Nothing to adopt either way: an unstarted job is requeued (_reap_dead_workers,
+                # or the owner on a lost lease) and is added back here when it is claimed again.
+                valkey.srem(FLEET_RUNS_KEY, run_id)
+                continue
+            if not self._acquire(run_id):
+                continue
+            if valkey.exists(f"{run_id}:stop_requested"):
+                stop_run(run_id, reason="USER_STOPPED")
+                self._finish(run_id)
+                continue
+            runner = BotRunner()
+            with self._lock:
+                self._runners[run_id] = runner
+            runner.resume(checkpoint)
+            log_info(f"[fleet] adopted {run_id} at trade #{checkpoint['next_tx']}")
+
+
+def main():
+    worker = FleetWorker()
+    if config.METRICS_PORT:
+        metrics.gauge("bot_fleet_worker_runs", "Runs held by this worker.", lambda: len(worker._runners))
+        metrics.start_http_server(config.METRICS_PORT)
+
+    def _term(signum, frame):
+        worker._stopping.set()
+
+    signal.signal(signal.SIGTERM, _term)
+    signal.signal(signal.SIGINT, _term)
+    warmup.start()
+    get_ingestor().start()  # replays trades spilled before a restart
+    worker.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Local IPFS content addressing: the CIDv1 a pinning service will report for a file.
+
+Matches `ipfs add --cid-version=1` (the layout Pinata uses): 256 KiB chunks stored as
+raw blocks, sha2-256, base32. A file that fits in one chunk (every trade and any
+realistic batch document) is a single raw block, so its CID is the hash of the bytes.
+Larger files get a balanced UnixFS dag-pb tree with up to 174 links per node.
+"""
+
+import base64
+import hashlib
+
+from trade_codec import put_varint
+
+CHUNK_SIZE = 256 * 1024
+MAX_LINKS = 174
+
+_RAW = 0x55
+_DAG_PB = 0x70
+_SHA2_256 = 0x12
+
+
+def _cid_bytes(codec: int, block: bytes) -> bytes:
+    out = bytearray()
+    put_varint(out, 1)  # CID version
+    put_varint(out, codec)
+    put_varint(out, _SHA2_256)
+    put_varint(out, 32)
+    out += hashlib.sha256(block).digest()
+    return bytes(out)
+
+
+def _field_bytes(out: bytearray, field: int, value: bytes):
+    put_varint(out, field << 3 | 2)
+    put_varint(out, len(value))
+    out += value
+
+
+def _field_varint(out: bytearray, field: int, value: int):
+    put_varint(out, field << 3)
+    put_varint(out, value)
+
+
+def _file_node(children: list) -> tuple:
+    """dag-pb node linking `children` (cid, tsize, filesize) tuples; returns the same tuple."""
+    filesize = sum(c[2] for c in children)
+    unixfs = bytearray()
+    _field_varint(unixfs, 1, 2)  # Type = File
+    _field_varint(unixfs, 3, filesize)
+    for c in children:
+        _field_varint(unixfs, 4, c[2])  # blocksizes
+    node = bytearray()
+    for cid, tsize, _ in children:  # PBNode.Links (field 2) are encoded before Data
+        link = bytearray()
+        _field_bytes(link, 1, cid)
+        _field_bytes(link, 2, b"")
+        _field_varint(link, 3, tsize)
+        _field_bytes(node, 2, link)
+    _field_bytes(node, 1, bytes(unixfs))
+    block = bytes(node)
+    return _cid_bytes(_DAG_PB, block), len(block) + sum(c[1] for c in children), filesize
+
+
+def cid_for_bytes(data: bytes) -> str:
+    """Base32 CIDv1 (`bafk...` for one raw block, `bafy...` for a chunked file)."""
+    if len(data) <= CHUNK_SIZE:
+        cid = _cid_bytes(_RAW, data)
+    else:
+        level = []
+        for i in range(0, len(data), CHUNK_SIZE):
+            chunk = data[i:i + CHUNK_SIZE]
+            level.append((_cid_bytes(_RAW, chunk), len(chunk), len(chunk)))
+        while len(level) > 1:
+            level = [_file_node(level[i:i + MAX_LINKS]) for i in range(0, len(level), MAX_LINKS)]
+        cid = level[0][0]
+    return "b" + base64.b32encode(cid).decode("ascii").lower().rstrip("=")
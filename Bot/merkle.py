@@ -0,0 +1,66 @@
+"""Merkle trees over trade metadata for batched proofs.
+
+Leaf = keccak256(keccak256(canonical JSON of the metadata)); the double hash keeps a
+leaf from ever equalling an interior node. Interior node = keccak256 of the two child
+hashes in sorted order, so a proof is just the list of siblings and needs no
+left/right flags. An odd node at the end of a level is carried up unchanged. This
+matches TradeLogger.verifyTrade.
+"""
+
+import json
+
+from eth_hash.auto import keccak
+
+
+def canonical_json(obj) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def leaf_hash(metadata: dict) -> bytes:
+    return keccak(keccak(canonical_json(metadata)))
+
+
+def _parent(a: bytes, b: bytes) -> bytes:
+    return keccak(a + b) if a < b else keccak(b + a)
+
+
+def build_levels(leaves: list[bytes]) -> list[list[bytes]]:
+    """All tree levels, leaves first and the root level last."""
+    if not leaves:
+        raise ValueError("cannot build a Merkle tree with no leaves")
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        nxt = [_parent(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        levels.append(nxt)
+    return levels
+
+
+def root(levels: list[list[bytes]]) -> bytes:
+    return levels[-1][0]
+
+
+def inclusion_proof(levels: list[list[bytes]], index: int) -> list[bytes]:
+    """Sibling hashes from leaf `index` up to the root."""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(level[sibling])
+        index //= 2
+    return proof
+
+
+def verify(leaf: bytes, proof: list[bytes], expected_root: bytes) -> bool:
+    node = leaf
+    for sibling in proof:
+        node = _parent(node, sibling)
+    return node == expected_root
+
+
+def verify_metadata(metadata: dict, proof_hex: list[str], root_hex: str) -> bool:
+    """Check that trade metadata (as pinned) is included under a batch root."""
+    proof = [bytes.fromhex(p.removeprefix("0x")) for p in proof_hex]
+    return verify(leaf_hash(metadata), proof, bytes.fromhex(root_hex.removeprefix("0x")))
@@ -0,0 +1,211 @@
+"""Process-local metrics, rendered in the Prometheus text format (GET /metrics).
+
+Counters and histograms are in-memory and keyed by a tuple of positional label
+values. Recording a value costs one lock, a dict lookup and a bisect, which is cheap
+enough for every RPC call and Valkey command. Keep label values low-cardinality:
+method, command, service or phase, never tx hashes or addresses.
+
+Gauges are callbacks evaluated at scrape time, so queue depths cost nothing between
+scrapes. Modules register their own (`gauge(...)`) next to the queue they describe.
+
+Numbers are per process. The API serves its own; fleet workers serve theirs on
+METRICS_PORT (`start_http_server`). With API_WORKERS > 1 each scrape reports the
+worker that answered it.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bot_logger import info as log_info, warning as log_warn
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers a local Valkey round trip (~0.1 ms) up to a stuck RPC call.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: list = []
+_registry_lock = threading.Lock()
+
+
+def _register(metric):
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labelnames=()):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labelnames)
+        self._values: dict = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}_total{_labels(self.labelnames, labels)} {_fmt(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: dict = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, *labels, errors: Counter | None = None):
+        """Observe the block's duration; on an exception also count it in `errors`."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            if errors is not None:
+                errors.inc(*labels)
+            raise
+        finally:
+            self.observe(time.perf_counter() - t0, *labels)
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return series[-1] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                le = 'le="%s"' % _fmt(bound)
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {series[-1]}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_fmt(series[-2])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}"
+
+
+class Gauge:
+    """Value read at scrape time. `fn` returns a number, or {label tuple: number}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str, fn, labelnames=()):
+        self.name, self.doc, self.fn, self.labelnames = name, doc, fn, tuple(labelnames)
+
+    def samples(self):
+        try:
+            value = self.fn()
+        except Exception as e:
+            log_warn(f"Metrics: gauge {self.name} failed ({e})")
+            return
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, v in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_fmt(v)}"
+
+
+def counter(name: str, doc: str, labelnames=()) -> Counter:
+    return _register(Counter(name, doc, labelnames))
+
+
+def histogram(name: str, doc: str, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+    return _register(Histogram(name, doc, labelnames, buckets))
+
+
+def gauge(name: str, doc: str, fn, labelnames=()) -> Gauge:
+    return _register(Gauge(name, doc, fn, labelnames))
+
+
+def render() -> str:
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for m in metrics:
+        lines.append(f"# HELP {m.name} {m.doc}")
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        lines.extend(m.samples())
+    return "\n".join(lines) + "\n"
+
+
+# ---- outbound calls ----
+
+RPC_SECONDS = histogram("bot_rpc_request_seconds", "JSON-RPC call latency by method.", ["method"])
+RPC_ERRORS = counter("bot_rpc_errors", "JSON-RPC calls that raised or returned an error.", ["method"])
+VALKEY_SECONDS = histogram("bot_valkey_command_seconds", "Valkey command latency (pipelines as PIPELINE).", ["command"])
+VALKEY_ERRORS = counter("bot_valkey_errors", "Valkey commands that raised.", ["command"])
+HTTP_SECONDS = histogram("bot_http_request_seconds", "Outbound HTTP API latency.", ["service", "operation"])
+HTTP_ERRORS = counter("bot_http_errors", "Outbound HTTP API calls that raised or returned an error status.",
+                      ["service", "operation"])
+
+# ---- run loop and API ----
+
+LOOP_PHASE_SECONDS = histogram("bot_loop_phase_seconds", "Run loop time per phase.", ["phase"])
+LOOP_ITERATIONS = counter("bot_loop_iterations", "Run loop iterations (trades attempted).", ["side"])
+API_SECONDS = histogram("bot_api_request_seconds", "Bot API request latency by route.", ["route", "method", "status"])
+
+_started = time.time()
+gauge("bot_process_start_time_seconds", "Process start time (unix seconds).", lambda: _started)
+
+
+def start_http_server(port: int, host: str = "0.0.0.0"):
+    """Serve /metrics from a daemon thread (for processes without the Flask API, e.g. fleet.py)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    log_info(f"Metrics on :{port}/metrics")
+    return server
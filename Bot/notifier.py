@@ -1,10 +1,50 @@
-import requests
+"""Alert emails via Resend.
+
+Stop alerts go through a background dispatcher so the run loop never waits on the email
+API: `notify_bot_stop` dedups the alert and queues it, then returns. The dispatcher
+thread holds alerts for NOTIFY_DIGEST_WINDOW seconds after the first one arrives. A
+single alert is sent as-is, and several are combined into one digest email. At most
+NOTIFY_MAX_PER_MINUTE emails are sent (token bucket); alerts that arrive while the
+bucket is empty join the next digest. Each (run_id, reason) is emailed once per
+NOTIFY_DEDUP_TTL seconds across processes (Valkey SET NX); failures before a run
+exists (no run_id) are not deduplicated here. The dedup mark is taken when the alert is
+queued and released if the alert is dropped (queue full, or out of send attempts), so a
+later stop for the same run and reason can still alert. All requests share one
+pooled HTTP session, created with the first email.
+"""
+
+import atexit
+import queue
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 
 import config
+import metrics
 from bot_logger import error as log_err, info as log_info, warning as log_warn
+from valkey_client import valkey
+
+
+RESEND_EMAILS_URL = config.RESEND_API_URL
+
+_session = None
+_session_lock = threading.Lock()
+
 
+def _get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
 
-RESEND_EMAILS_URL = "https://api.resend.com/emails"
+                session = requests.Session()
+                session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+                session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+                _session = session
+    return _session
 
 
 def _send_email(subject: str, text_body: str) -> bool:
@@ -24,10 +64,12 @@ def _send_email(subject: str, text_body: str) -> bool:
     }
 
     try:
-        resp = requests.post(RESEND_EMAILS_URL, json=payload, headers=headers, timeout=20)
+        with metrics.HTTP_SECONDS.time("resend", "send_email", errors=metrics.HTTP_ERRORS):
+            resp = _get_session().post(RESEND_EMAILS_URL, json=payload, headers=headers, timeout=config.NOTIFY_HTTP_TIMEOUT)
         if 200 <= resp.status_code < 300:
             log_info(f"Alert email sent to {config.BOT_ALERT_EMAIL_TO}")
             return True
+        metrics.HTTP_ERRORS.inc("resend", "send_email")
         log_err(f"Failed to send alert email: HTTP {resp.status_code} {resp.text}")
         return False
     except Exception as e:
@@ -35,8 +77,7 @@ def _send_email(subject: str, text_body: str) -> bool:
         return False
 
 
-def send_bot_stop_email(reason: str, session_key_expired: bool) -> bool:
-    """Send a bot stop alert email via Resend. Returns True on success."""
+def _stop_email(reason: str, session_key_expired: bool) -> tuple[str, str]:
     subject = "Bot stopped"
     if session_key_expired:
         subject = "Bot stopped: session key expired"
@@ -46,7 +87,12 @@ def send_bot_stop_email(reason: str, session_key_expired: bool) -> bool:
         "",
         "Please create a new issue key.",
     ]
-    return _send_email(subject, "\n".join(lines))
+    return subject, "\n".join(lines)
+
+
+def send_bot_stop_email(reason: str, session_key_expired: bool) -> bool:
+    """Send a bot stop alert email via Resend, blocking. Returns True on success."""
+    return _send_email(*_stop_email(reason, session_key_expired))
 
 
 def send_test_email() -> bool:
@@ -58,3 +104,197 @@ def send_test_email() -> bool:
         "Please create a new issue key.",
     ]
     return _send_email(subject, "\n".join(lines))
+
+
+@dataclass
+class StopAlert:
+    run_id: str
+    reason: str
+    session_key_expired: bool
+    ts: float
+    attempts: int = 0
+
+
+_SEEN_MAX = 10_000  # in-process dedup keys kept while Valkey is down
+
+
+def _dedup_key(run_id, reason: str) -> str:
+    return f"notify:sent:{run_id}:{reason[:200]}"
+
+
+class NotificationDispatcher:
+    def __init__(self, digest_window=None, max_per_minute=None, dedup_ttl=None, max_attempts=3,
+                 send=None):
+        self.digest_window = config.NOTIFY_DIGEST_WINDOW if digest_window is None else digest_window
+        self.max_per_minute = max_per_minute or config.NOTIFY_MAX_PER_MINUTE
+        self.dedup_ttl = dedup_ttl or config.NOTIFY_DEDUP_TTL
+        self.max_attempts = max_attempts
+        self._send = send or _send_email
+        self._queue: queue.Queue = queue.Queue(maxsize=1000)
+        self._tokens = float(self.max_per_minute)
+        self._refilled = time.monotonic()
+        self._seen: OrderedDict = OrderedDict()  # dedup fallback while Valkey is unreachable
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.sent = 0
+        self.deduped = 0
+
+    # ---- producer side ----
+
+    def notify_stop(self, run_id, reason: str, session_key_expired: bool) -> bool:
+        """Queue a stop alert; False when this run already alerted for this reason."""
+        if not self._first_time(run_id, reason):
+            self.deduped += 1
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(StopAlert(str(run_id or ""), reason, session_key_expired, time.time()))
+        except queue.Full:
+            log_warn(f"Notification queue full; dropping stop alert for run {run_id}")
+            self._release(run_id, reason)
+            return False
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Try to send everything queued so far now, ignoring the digest window and rate limit."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _first_time(self, run_id, reason: str) -> bool:
+        if not run_id:
+            # No run to key on (e.g. a start that failed before start_run); the runner's
+            # own once-per-start flag is the only dedup.
+            return True
+        key = _dedup_key(run_id, reason)
+        try:
+            return bool(valkey.set(key, 1, nx=True, ex=self.dedup_ttl))
+        except Exception:
+            if key in self._seen:
+                return False
+            self._seen[key] = True
+            while len(self._seen) > _SEEN_MAX:
+                self._seen.popitem(last=False)
+            return True
+
+    def _release(self, run_id, reason: str):
+        """Undo _first_time for an alert that will not be sent."""
+        if not run_id:
+            return
+        key = _dedup_key(run_id, reason)
+        self._seen.pop(key, None)
+        try:
+            valkey.delete(key)
+        except Exception as e:
+            log_warn(f"Could not clear alert dedup key {key}: {e}")
+
+    # ---- dispatcher ----
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+                    self._thread.start()
+
+    def _take_token(self) -> float:
+        """0 when an email may go out now (and uses the token), else seconds until one is free."""
+        now = time.monotonic()
+        self._tokens = min(self.max_per_minute, self._tokens + (now - self._refilled) * self.max_per_minute / 60)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) * 60 / self.max_per_minute
+
+    def _run(self):
+        pending: list[StopAlert] = []
+        due = 0.0  # monotonic time the pending alerts may go out
+        while True:
+            timeout = max(0.0, due - time.monotonic()) if pending else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if isinstance(item, threading.Event):
+                if pending:
+                    pending = self._deliver(pending)
+                item.set()
+                continue
+            if item is not None:
+                if not pending:
+                    due = time.monotonic() + self.digest_window
+                pending.append(item)
+            if not pending or time.monotonic() < due:
+                continue
+            wait = self._take_token()
+            if wait:
+                due = time.monotonic() + wait
+                continue
+            pending = self._deliver(pending)
+            if pending:
+                due = time.monotonic() + min(60.0, 5.0 * 2 ** max(a.attempts for a in pending))
+
+    def _deliver(self, alerts: list) -> list:
+        """Send one email for `alerts`; returns the alerts to retry."""
+        email = _stop_email(alerts[0].reason, alerts[0].session_key_expired) if len(alerts) == 1 else _digest(alerts)
+        try:
+            ok = self._send(*email)
+        except Exception as e:
+            log_err(f"Failed to send alert email: {e}")
+            ok = False
+        if ok:
+            self.sent += 1
+            return []
+        retry = []
+        for a in alerts:
+            a.attempts += 1
+            if a.attempts < self.max_attempts:
+                retry.append(a)
+            else:
+                log_err(f"Giving up on stop alert for run {a.run_id}: {a.reason}")
+                self._release(a.run_id, a.reason)
+        return retry
+
+
+def _digest(alerts: list) -> tuple[str, str]:
+    expired = sum(1 for a in alerts if a.session_key_expired)
+    subject = f"{len(alerts)} bots stopped"
+    if expired:
+        subject += f" ({expired} session key{'s' if expired > 1 else ''} expired)"
+    lines = [f"{len(alerts)} bot runs have stopped and require attention.", ""]
+    for a in alerts:
+        when = time.strftime("%H:%M:%S", time.gmtime(a.ts))
+        flag = " [session key expired]" if a.session_key_expired else ""
+        lines.append(f"- {when} UTC  run {a.run_id or '?'}: {a.reason}{flag}")
+    lines += ["", "Please create a new issue key."]
+    return subject, "\n".join(lines)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> NotificationDispatcher:
+    """Process-wide dispatcher shared by all runners."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = NotificationDispatcher()
+                atexit.register(_dispatcher.flush, 5.0)  # alerts still in the digest window
+    return _dispatcher
+
+
+metrics.gauge("bot_notify_queue_depth", "Stop alerts waiting for the dispatcher.",
+              lambda: _dispatcher._queue.qsize() if _dispatcher else 0)
+
+
+def notify_bot_stop(reason: str, session_key_expired: bool, run_id=None) -> bool:
+    """Queue a stop alert for background delivery. Returns True if it was queued."""
+    return get_dispatcher().notify_stop(run_id, reason, session_key_expired)
@@ -0,0 +1,120 @@
+"""Pinning backends for trade proofs.
+
+Every backend takes the exact bytes whose CID was computed locally (ipfs_cid) and
+returns the CID it stored them under. PINNING_BACKEND picks one:
+
+    pinata   Pinata V3 Files API (needs PINATA_JWT)
+    local    files named <cid>.json under PIN_DIR, for tests and offline runs
+    memory   a dict in this process, for tests
+"""
+
+import os
+import threading
+from abc import ABC, abstractmethod
+
+import config
+import metrics
+from ipfs_cid import cid_for_bytes
+
+
+class PinningBackend(ABC):
+    name = "base"
+
+    @abstractmethod
+    def pin(self, data: bytes, filename: str) -> str:
+        """Store data and return its CID."""
+
+    def get(self, cid: str) -> bytes | None:
+        """Pinned bytes for a CID, where the backend can read them back (local, memory)."""
+        return None
+
+
+class PinataBackend(PinningBackend):
+    name = "pinata"
+    url = "https://uploads.pinata.cloud/v3/files"
+
+    def pin(self, data: bytes, filename: str) -> str:
+        import requests
+
+        # V3 API uses multipart form-data with a file upload
+        with metrics.HTTP_SECONDS.time("pinata", "pin", errors=metrics.HTTP_ERRORS):
+            resp = requests.post(
+                self.url,
+                headers={"Authorization": f"Bearer {config.PINATA_JWT}"},
+                files={"file": (filename, data, "application/json")},
+                data={"network": "public", "name": filename.rsplit(".", 1)[0]},
+                timeout=30,
+            )
+            resp.raise_for_status()
+        return resp.json()["data"]["cid"]
+
+
+class LocalBackend(PinningBackend):
+    name = "local"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def pin(self, data: bytes, filename: str) -> str:
+        cid = cid_for_bytes(data)
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{cid}.json")
+        if not os.path.exists(path):
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return cid
+
+    def get(self, cid: str) -> bytes | None:
+        try:
+            with open(os.path.join(self.directory, f"{cid}.json"), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+class MemoryBackend(PinningBackend):
+    name = "memory"
+
+    def __init__(self):
+        self.blobs = {}
+
+    def pin(self, data: bytes, filename: str) -> str:
+        cid = cid_for_bytes(data)
+        self.blobs[cid] = data
+        return cid
+
+    def get(self, cid: str) -> bytes | None:
+        return self.blobs.get(cid)
+
+
+_backend = None
+_lock = threading.Lock()
+
+
+def create_backend(name: str | None = None) -> PinningBackend:
+    name = (name or config.PINNING_BACKEND).lower()
+    if name == "pinata":
+        return PinataBackend()
+    if name == "local":
+        return LocalBackend(config.PIN_DIR)
+    if name == "memory":
+        return MemoryBackend()
+    raise ValueError(f"unknown PINNING_BACKEND {name!r} (pinata, local or memory)")
+
+
+def get_backend() -> PinningBackend:
+    """The process-wide backend from PINNING_BACKEND."""
+    global _backend
+    with _lock:
+        if _backend is None:
+            _backend = create_backend()
+        return _backend
+
+
+def set_backend(backend: PinningBackend) -> None:
+    """Swap the process-wide backend (tests, benchmarks)."""
+    global _backend
+    with _lock:
+        _backend = backend
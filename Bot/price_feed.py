@@ -2,6 +2,7 @@ import random
 import time
 import requests
 import config
+import metrics
 
 
 COINGECKO_BASE = "https://api.coingecko.com/api/v3"
@@ -28,8 +29,9 @@ def get_price_history(coin_id, vs_currency="usd", days=None):
 
     url = f"{COINGECKO_BASE}/coins/{coin_id}/market_chart"
     params = {"vs_currency": vs_currency, "days": days}
-    resp = requests.get(url, params=params, headers=_headers(), timeout=30)
-    resp.raise_for_status()
+    with metrics.HTTP_SECONDS.time("coingecko", "market_chart", errors=metrics.HTTP_ERRORS):
+        resp = requests.get(url, params=params, headers=_headers(), timeout=30)
+        resp.raise_for_status()
     return resp.json()["prices"]  # [[timestamp_ms, price], ...]
 
 
@@ -40,8 +42,9 @@ def get_current_price(coin_id, vs_currency="usd"):
     """
     url = f"{COINGECKO_BASE}/simple/price"
     params = {"ids": coin_id, "vs_currencies": vs_currency}
-    resp = requests.get(url, params=params, headers=_headers(), timeout=30)
-    resp.raise_for_status()
+    with metrics.HTTP_SECONDS.time("coingecko", "simple_price", errors=metrics.HTTP_ERRORS):
+        resp = requests.get(url, params=params, headers=_headers(), timeout=30)
+        resp.raise_for_status()
     return float(resp.json()[coin_id][vs_currency])
 
 
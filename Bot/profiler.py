@@ -0,0 +1,76 @@
+"""On-demand sampling profiler for the running process (POST /admin/profile).
+
+A profile samples every thread's stack with sys._current_frames() every `interval`
+seconds for a bounded time. It returns collapsed ("folded") stacks, one line per
+distinct stack with its sample count:
+
+    Thread-3 (_run_loop);_run_loop (bot_runner.py:289);send_eth (uniswap.py:75) 41
+
+flamegraph.pl, speedscope and inferno read this format directly. Nothing is hooked
+into the interpreter (no sys.setprofile), so code runs at full speed between samples.
+The cost is the sampling thread walking the stacks about 100 times a second. Samples
+are wall-clock: threads blocked on I/O or a lock show up where they wait. One profile
+runs at a time per process, and its length is capped by PROFILE_MAX_SECONDS.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import config
+
+_busy = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _label(code) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample(seconds: float, interval: float = 0.01) -> Counter:
+    """Folded stack -> sample count for every thread but the caller's."""
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    try:
+        me = threading.get_ident()
+        counts: Counter = Counter()
+        names: dict = {}
+        names_at = 0.0
+        deadline = time.monotonic() + seconds
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if now - names_at > 1.0:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                names_at = now
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                counts[";".join(reversed(stack))] += 1
+            time.sleep(interval)
+        return counts
+    finally:
+        _busy.release()
+
+
+def folded(counts: Counter) -> str:
+    return "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+
+
+def profile(seconds: float, interval_ms: float | None = None) -> str:
+    """Sample for `seconds` (capped by PROFILE_MAX_SECONDS) and return folded stacks."""
+    seconds = min(float(seconds), config.PROFILE_MAX_SECONDS)
+    interval = max(1.0, float(interval_ms or config.PROFILE_INTERVAL_MS)) / 1000
+    return folded(sample(seconds, interval))
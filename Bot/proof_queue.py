@@ -0,0 +1,465 @@
+"""Durable queue and background worker for trade proofs (IPFS pin + on-chain logTrade).
+
+The trading loop only builds the proof metadata and enqueues it (one Valkey round
+trip). A worker thread does the slow part. Everything is keyed by the swap tx hash:
+
+    proof:<swap_tx>     hash: status, metadata (JSON), cid, pinned, log_tx, attempts, error
+    proofs:ready        list of swap tx hashes waiting for a worker
+    proofs:inflight     zset, score = lease deadline (ms) of the worker that claimed it
+    proofs:delayed      zset, score = next attempt (ms) after a failure
+    proofs:failed       list of swap tx hashes that used up PROOF_MAX_ATTEMPTS
+    proofbatch:<root>   hash (batch mode): status, members (JSON), count, cid, pinned, log_tx
+
+Each step is recorded before the next one starts, so a retry or a restarted process
+continues where the last attempt stopped. The CID is computed locally (ipfs_cid), so
+the log tx goes out while the metadata is still uploading; a proof is LOGGED only once
+both are done. A sent log tx is awaited rather than re-sent. A swap already logged
+on-chain is marked done. Claims expire after PROOF_LEASE_MS, so proofs held by a dead
+process are retried.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import config
+import metrics
+from bot_logger import info as log_info, warning as log_warn, error as log_err
+import merkle
+from trade_proof import (
+    batch_logged,
+    build_trade_metadata,
+    logged_cid,
+    logger_supports_batches,
+    pin_batch_to_ipfs,
+    pin_to_ipfs,
+    proof_cid,
+    send_log_batch,
+    send_log_trade,
+)
+from valkey_client import valkey
+
+READY_KEY = "proofs:ready"
+INFLIGHT_KEY = "proofs:inflight"
+DELAYED_KEY = "proofs:delayed"
+FAILED_KEY = "proofs:failed"
+
+# Only the first enqueue of a swap creates the record and queues it.
+_ENQUEUE_LUA = """
+if redis.call('exists', KEYS[1]) == 1 then return 0 end
+redis.call('hset', KEYS[1], 'swap_tx', ARGV[1], 'status', 'QUEUED', 'metadata', ARGV[2],
+           'attempts', 0, 'created', ARGV[3])
+redis.call('lpush', KEYS[2], ARGV[1])
+return 1
+"""
+
+# Pop up to ARGV[2] ready proofs and hold them under a lease.
+_CLAIM_LUA = """
+local out = {}
+for i = 1, tonumber(ARGV[2]) do
+    local id = redis.call('rpop', KEYS[1])
+    if not id then break end
+    redis.call('zadd', KEYS[2], ARGV[1], id)
+    out[#out + 1] = id
+end
+return out
+"""
+
+# Move due retries and expired leases back to the ready list.
+_PROMOTE_LUA = """
+local moved = 0
+for i = 1, 2 do
+    local ids = redis.call('zrangebyscore', KEYS[i], '-inf', ARGV[1], 'LIMIT', 0, 100)
+    for _, id in ipairs(ids) do
+        redis.call('zrem', KEYS[i], id)
+        redis.call('lpush', KEYS[3], id)
+        moved = moved + 1
+    end
+end
+return moved
+"""
+
+
+def proof_key(swap_tx: str) -> str:
+    return f"proof:{swap_tx}"
+
+
+def batch_key(merkle_root: str) -> str:
+    return f"proofbatch:{merkle_root}"
+
+
+def _normalize(tx_hash) -> str:
+    h = tx_hash.hex() if isinstance(tx_hash, (bytes, bytearray)) else str(tx_hash)
+    h = h.lower()
+    return h if h.startswith("0x") else "0x" + h
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+_enqueue_script = valkey.register_script(_ENQUEUE_LUA)
+_wakeup = threading.Event()
+# Uploads run here while the worker sends and awaits the on-chain log.
+_pin_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="proof-pin")
+
+
+def enqueue_proof(metadata: dict) -> bool:
+    """Queue a proof for metadata["tx_hash"]; False when that swap was already queued."""
+    swap_tx = _normalize(metadata["tx_hash"])
+    metadata = {**metadata, "tx_hash": swap_tx}
+    added = _enqueue_script(
+        keys=[proof_key(swap_tx), READY_KEY],
+        args=[swap_tx, json.dumps(metadata), _now_ms()],
+    )
+    _wakeup.set()
+    return bool(added)
+
+
+def enqueue_trade_proof(receipt, signal, token_in, token_out, amount_in_raw,
+                        quoted_amount_out, slippage_percent, current_price,
+                        short_sma, long_sma, token_in_decimals, token_out_decimals):
+    """Drop-in for trade_proof.record_trade_proof that returns as soon as the proof is queued."""
+    try:
+        metadata = build_trade_metadata(
+            receipt, signal, token_in, token_out, amount_in_raw,
+            quoted_amount_out, slippage_percent, current_price,
+            short_sma, long_sma, token_in_decimals, token_out_decimals,
+        )
+        if enqueue_proof(metadata):
+            log_info(f"[TradeProof] Queued proof for {_normalize(metadata['tx_hash'])}")
+    except Exception as e:
+        log_warn(f"[TradeProof] Could not queue proof: {e}")
+
+
+def get_proof(swap_tx: str) -> dict:
+    return valkey.hgetall(proof_key(_normalize(swap_tx)))
+
+
+def queue_stats() -> dict:
+    pipe = valkey.pipeline(transaction=False)
+    pipe.llen(READY_KEY)
+    pipe.zcard(INFLIGHT_KEY)
+    pipe.zcard(DELAYED_KEY)
+    pipe.llen(FAILED_KEY)
+    ready, inflight, delayed, failed = pipe.execute()
+    return {"ready": ready, "inflight": inflight, "delayed": delayed, "failed": failed}
+
+
+metrics.gauge("bot_proof_queue_depth", "Proof jobs by state (read from Valkey at scrape time).",
+              lambda: {(state,): n for state, n in queue_stats().items()}, ["state"])
+
+
+def verify_proof(swap_tx: str, w3=None) -> bool:
+    """Check a logged proof. Batched proofs are checked against their Merkle root
+    (and, with `w3`, by TradeLogger.verifyTrade); single proofs by the on-chain CID."""
+    state = get_proof(swap_tx)
+    if state.get("status") != "LOGGED":
+        return False
+    if state.get("batch_root"):
+        proof = json.loads(state["merkle_proof"])
+        if not merkle.verify_metadata(json.loads(state["metadata"]), proof, state["batch_root"]):
+            return False
+        if w3 is None:
+            return True
+        from trade_proof import _trade_logger
+        return _trade_logger(w3).functions.verifyTrade(
+            bytes.fromhex(state["batch_root"][2:]),
+            bytes.fromhex(state["leaf"][2:]),
+            [bytes.fromhex(p[2:]) for p in proof],
+        ).call()
+    return w3 is None or logged_cid(w3, state["swap_tx"]) == state.get("cid")
+
+
+class ProofWorker:
+    """Drains proofs:ready on a daemon thread using the bot's web3 connection and account.
+
+    With batch_size > 1 (PROOF_BATCH_SIZE) it claims up to that many proofs at once and
+    anchors them with one pin and one logBatch; see process_batch.
+    """
+
+    def __init__(self, w3, account, poll_interval: float = 1.0, batch_size: int | None = None):
+        self.w3 = w3
+        self.account = account
+        self.poll_interval = poll_interval
+        self.batch_size = max(1, batch_size or config.PROOF_BATCH_SIZE)
+        self._stop = threading.Event()
+        self._thread = None
+        self._claim = valkey.register_script(_CLAIM_LUA)
+        self._promote = valkey.register_script(_PROMOTE_LUA)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="proof-worker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        """Stop after the current proof; anything unfinished stays queued for the next start."""
+        self._stop.set()
+        _wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        if self.batch_size > 1:
+            self._check_batch_support()
+        while not self._stop.is_set():
+            ids = []
+            try:
+                self._promote(keys=[DELAYED_KEY, INFLIGHT_KEY, READY_KEY], args=[_now_ms()])
+                if self._batch_ready():
+                    ids = self._claim(keys=[READY_KEY, INFLIGHT_KEY],
+                                      args=[_now_ms() + config.PROOF_LEASE_MS, self.batch_size])
+            except Exception as e:
+                log_warn(f"[TradeProof] Queue unavailable: {e}")
+            if not ids:
+                _wakeup.wait(self.poll_interval)
+                _wakeup.clear()
+                continue
+            if self.batch_size == 1:
+                self._attempt(ids, lambda: self.process(ids[0]))
+            else:
+                self._attempt(ids, lambda: self.process_batch(ids))
+
+    def _check_batch_support(self):
+        """Fall back to one logTrade per proof unless the deployed logger has logBatch."""
+        try:
+            supported = logger_supports_batches(self.w3)
+        except Exception as e:
+            log_warn(f"[TradeProof] Could not read TradeLogger code ({e})")
+            supported = False
+        if not supported:
+            log_warn("[TradeProof] TradeLogger has no logBatch (deployed from older bytecode); "
+                     "PROOF_BATCH_SIZE ignored, logging proofs one by one")
+            self.batch_size = 1
+
+    def _batch_ready(self) -> bool:
+        """Claim once a full batch is waiting or the oldest waiting proof hit PROOF_BATCH_MAX_WAIT."""
+        if self.batch_size == 1:
+            return True
+        pipe = valkey.pipeline(transaction=False)
+        pipe.llen(READY_KEY)
+        pipe.lindex(READY_KEY, -1)
+        waiting, oldest = pipe.execute()
+        if waiting >= self.batch_size:
+            return True
+        if not oldest:
+            return False
+        created = int(valkey.hget(proof_key(oldest), "created") or 0)
+        return _now_ms() - created >= config.PROOF_BATCH_MAX_WAIT * 1000
+
+    def _attempt(self, ids: list, fn):
+        try:
+            fn()
+            valkey.zrem(INFLIGHT_KEY, *ids)
+        except Exception as e:
+            pipe = valkey.pipeline(transaction=False)
+            for swap_tx in ids:
+                pipe.hincrby(proof_key(swap_tx), "attempts", 1)
+            attempts_by_id = pipe.execute()
+            pipe = valkey.pipeline(transaction=True)
+            for swap_tx, attempts in zip(ids, attempts_by_id):
+                key = proof_key(swap_tx)
+                pipe.zrem(INFLIGHT_KEY, swap_tx)
+                if attempts >= config.PROOF_MAX_ATTEMPTS:
+                    log_err(f"[TradeProof] Giving up on {swap_tx} after {attempts} attempts: {e}")
+                    pipe.hset(key, mapping={"status": "FAILED", "error": str(e)[:500]})
+                    pipe.lpush(FAILED_KEY, swap_tx)
+                else:
+                    delay = min(config.PROOF_RETRY_BASE_SECONDS * 2 ** (attempts - 1), 600)
+                    log_warn(f"[TradeProof] Proof for {swap_tx} failed ({e}); retry {attempts} in {delay:.0f}s")
+                    pipe.hset(key, mapping={"error": str(e)[:500]})
+                    pipe.zadd(DELAYED_KEY, {swap_tx: _now_ms() + int(delay * 1000)})
+            pipe.execute()
+
+    def _await_sent(self, log_tx: str) -> bool:
+        """Wait for a tx sent by an earlier attempt. True if it succeeded, False if it was
+        dropped or reverted (re-send); raises while it is still pending."""
+        from web3.exceptions import TimeExhausted, TransactionNotFound
+
+        try:
+            receipt = self.w3.eth.wait_for_transaction_receipt(log_tx, timeout=config.PROOF_RECEIPT_TIMEOUT)
+        except TimeExhausted:
+            try:
+                self.w3.eth.get_transaction(log_tx)
+            except TransactionNotFound:
+                return False
+            raise RuntimeError(f"proof tx {log_tx} still pending")
+        return receipt["status"] == 1
+
+    def process(self, swap_tx: str):
+        """Pin and log one proof, resuming from whatever step the last attempt reached."""
+        key = proof_key(swap_tx)
+        state = valkey.hgetall(key)
+        if not state or state.get("status") == "LOGGED":
+            return
+        if state.get("batch_root"):
+            # Claimed by a batch before PROOF_BATCH_SIZE was lowered: finish it as a batch.
+            self._run_batch(state["batch_root"])
+            return
+        metadata = json.loads(state["metadata"])
+        cid = state.get("cid")
+        if not cid:
+            cid = proof_cid(metadata)
+            valkey.hset(key, "cid", cid)
+            log_info(f"[TradeProof] IPFS CID: {cid}")
+            log_info(f"[TradeProof] View: https://gateway.pinata.cloud/ipfs/{cid}")
+        pinned = None if state.get("pinned") else self._pin_async(key, pin_to_ipfs, metadata)
+        log_tx = state.get("log_tx")
+
+        if log_tx and self._await_sent(log_tx):
+            self._wait_pinned(pinned)
+            self._done(key, swap_tx, cid, log_tx)
+            return
+
+        onchain = logged_cid(self.w3, swap_tx)
+        if onchain:
+            self._wait_pinned(pinned)
+            self._done(key, swap_tx, onchain, state.get("log_tx", ""))
+            return
+
+        log_info("[TradeProof] Logging proof on-chain...")
+        log_tx = _normalize(send_log_trade(self.w3, self.account, swap_tx, cid))
+        valkey.hset(key, mapping={"log_tx": log_tx, "status": "SUBMITTED"})
+        receipt = self.w3.eth.wait_for_transaction_receipt(log_tx, timeout=config.PROOF_RECEIPT_TIMEOUT)
+        if receipt["status"] != 1:
+            valkey.hdel(key, "log_tx")
+            raise RuntimeError(f"logTrade tx {log_tx} reverted")
+        self._wait_pinned(pinned)
+        self._done(key, swap_tx, cid, log_tx)
+
+    @staticmethod
+    def _pin_async(key: str, pin, doc: dict) -> Future:
+        """Pin `doc` on the pin pool and flag `key` as pinned once the backend has it."""
+        def run():
+            pin(doc)
+            valkey.hset(key, "pinned", 1)
+        return _pin_pool.submit(run)
+
+    @staticmethod
+    def _wait_pinned(pinned: Future | None):
+        # A failed pin fails the attempt; the retry re-pins (same bytes, same CID) but
+        # finds the log tx already sent or confirmed.
+        if pinned is not None:
+            pinned.result()
+
+    def _done(self, key: str, swap_tx: str, cid: str, log_tx: str):
+        valkey.hset(key, mapping={"status": "LOGGED", "cid": cid, "log_tx": log_tx or "", "logged": _now_ms()})
+        if log_tx:
+            log_info(f"[TradeProof] On-chain TX: {log_tx}")
+            log_info(f"[TradeProof] Etherscan: https://sepolia.etherscan.io/tx/{log_tx}")
+        else:
+            log_info(f"[TradeProof] {swap_tx} was already logged on-chain (CID {cid})")
+
+    # ---- batch mode ----
+
+    def process_batch(self, swap_txs: list):
+        """Anchor claimed proofs as Merkle batches.
+
+        Proofs already assigned to a batch by an earlier attempt finish that batch (its
+        membership is fixed once recorded); the rest form one new batch.
+        """
+        pipe = valkey.pipeline(transaction=False)
+        for swap_tx in swap_txs:
+            pipe.hgetall(proof_key(swap_tx))
+        fresh, roots = [], []
+        for swap_tx, state in zip(swap_txs, pipe.execute()):
+            if not state or state.get("status") == "LOGGED":
+                continue
+            if state.get("batch_root"):
+                if state["batch_root"] not in roots:
+                    roots.append(state["batch_root"])
+            else:
+                fresh.append((swap_tx, json.loads(state["metadata"])))
+        if fresh:
+            roots.append(self._build_batch(fresh))
+        for root_hex in roots:
+            self._run_batch(root_hex)
+
+    def _build_batch(self, items: list) -> str:
+        leaves = [merkle.leaf_hash(meta) for _, meta in items]
+        levels = merkle.build_levels(leaves)
+        root_hex = "0x" + merkle.root(levels).hex()
+        pipe = valkey.pipeline(transaction=True)
+        pipe.hset(batch_key(root_hex), mapping={
+            "status": "BUILT",
+            "members": json.dumps([swap_tx for swap_tx, _ in items]),
+            "count": len(items),
+            "created": _now_ms(),
+        })
+        for i, (swap_tx, _) in enumerate(items):
+            pipe.hset(proof_key(swap_tx), mapping={
+                "status": "BATCHED",
+                "batch_root": root_hex,
+                "leaf_index": i,
+                "leaf": "0x" + leaves[i].hex(),
+                "merkle_proof": json.dumps(["0x" + h.hex() for h in merkle.inclusion_proof(levels, i)]),
+            })
+        pipe.execute()
+        return root_hex
+
+    def _run_batch(self, root_hex: str):
+        key = batch_key(root_hex)
+        batch = valkey.hgetall(key)
+        members = json.loads(batch["members"])
+        if batch.get("status") == "LOGGED":
+            self._batch_done(root_hex, members, batch.get("cid", ""), batch.get("log_tx", ""))
+            return
+        cid = batch.get("cid")
+        pinned = None
+        if not cid or not batch.get("pinned"):
+            pipe = valkey.pipeline(transaction=False)
+            for swap_tx in members:
+                pipe.hget(proof_key(swap_tx), "metadata")
+            doc = {
+                "version": 1,
+                "merkle_root": root_hex,
+                "leaf_encoding": "keccak256(keccak256(canonical_json(trade)))",
+                "node_encoding": "keccak256(min(a,b) || max(a,b))",
+                "trades": [json.loads(m) for m in pipe.execute()],
+            }
+            if not cid:
+                cid = proof_cid(doc)
+                valkey.hset(key, "cid", cid)
+                log_info(f"[TradeProof] Batch of {len(members)} trades, CID {cid}")
+            pinned = self._pin_async(key, pin_batch_to_ipfs, doc)
+        log_tx = batch.get("log_tx")
+
+        if log_tx and self._await_sent(log_tx):
+            self._wait_pinned(pinned)
+            self._batch_done(root_hex, members, cid, log_tx)
+            return
+        if batch_logged(self.w3, root_hex):
+            self._wait_pinned(pinned)
+            self._batch_done(root_hex, members, cid, log_tx or "")
+            return
+
+        log_info(f"[TradeProof] Anchoring batch root {root_hex[:18]}... on-chain")
+        log_tx = _normalize(send_log_batch(self.w3, self.account, root_hex, cid, len(members)))
+        valkey.hset(key, mapping={"log_tx": log_tx, "status": "SUBMITTED"})
+        receipt = self.w3.eth.wait_for_transaction_receipt(log_tx, timeout=config.PROOF_RECEIPT_TIMEOUT)
+        if receipt["status"] != 1:
+            valkey.hdel(key, "log_tx")
+            raise RuntimeError(f"logBatch tx {log_tx} reverted")
+        self._wait_pinned(pinned)
+        self._batch_done(root_hex, members, cid, log_tx)
+
+    def _batch_done(self, root_hex: str, members: list, cid: str, log_tx: str):
+        now = _now_ms()
+        pipe = valkey.pipeline(transaction=True)
+        pipe.hset(batch_key(root_hex), mapping={"status": "LOGGED", "cid": cid, "log_tx": log_tx, "logged": now})
+        for swap_tx in members:
+            pipe.hset(proof_key(swap_tx), mapping={"status": "LOGGED", "cid": cid, "log_tx": log_tx, "logged": now})
+            # Members may sit in other claims or retry slots; they are done now.
+            pipe.zrem(INFLIGHT_KEY, swap_tx)
+            pipe.zrem(DELAYED_KEY, swap_tx)
+            pipe.lrem(READY_KEY, 0, swap_tx)
+        pipe.execute()
+        log_info(f"[TradeProof] Batch of {len(members)} trades logged (CID {cid})")
+        if log_tx:
+            log_info(f"[TradeProof] Etherscan: https://sepolia.etherscan.io/tx/{log_tx}")
+
+
+def start_proof_worker(w3, account) -> ProofWorker:
+    return ProofWorker(w3, account).start()
@@ -0,0 +1,77 @@
+"""Production entry point for the Bot API: gunicorn with threaded workers.
+
+    python serve.py                  # binds 0.0.0.0:$BOT_API_PORT (default 5001)
+
+Without FLEET_MODE the bot runs inside the API process (app.runner), so /bot/start,
+/bot/status and /bot/stop must all reach the same process: one worker is used and
+API_THREADS threads serve requests concurrently. With FLEET_MODE runs live in Valkey
+and fleet workers, so API_WORKERS processes can serve in parallel. Each worker starts
+its own background services after the fork. The archiver and event indexer hold Valkey
+locks, so only one worker does each pass.
+
+Needs gunicorn (`pip install gunicorn`; not available on Windows). `python app.py`
+still runs the development server.
+"""
+
+import multiprocessing
+import os
+
+import config
+from bot_logger import info as log_info, warning as log_warn
+
+
+def worker_count() -> int:
+    if not config.FLEET_MODE:
+        if config.API_WORKERS > 1:
+            log_warn("API_WORKERS > 1 needs FLEET_MODE (the runner lives in the API process); using 1 worker")
+        return 1
+    return config.API_WORKERS or multiprocessing.cpu_count() * 2 + 1
+
+
+def options(port: int) -> dict:
+    return {
+        "bind": f"0.0.0.0:{port}",
+        "workers": worker_count(),
+        "worker_class": "gthread",
+        "threads": config.API_THREADS,
+        "timeout": config.API_TIMEOUT,
+        "graceful_timeout": 30,
+        "keepalive": 5,
+        "accesslog": None,
+        "post_fork": _post_fork,
+    }
+
+
+def _post_fork(server, worker):
+    # Threads and pooled connections do not survive fork: start them in each worker.
+    from app import start_background_services
+    start_background_services()
+
+
+def main():
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit("serve.py needs gunicorn: pip install gunicorn (or run `python app.py` for development)")
+
+    class BotAPI(BaseApplication):
+        def __init__(self, opts):
+            self.opts = opts
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.opts.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import app
+            return app
+
+    port = int(os.environ.get("BOT_API_PORT", 5001))
+    opts = options(port)
+    log_info(f"Serving Bot API on port {port} ({opts['workers']} worker(s) x {opts['threads']} threads)")
+    BotAPI(opts).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Shared setup: every test runs against the in-process Valkey (fakeredis), no network.
+
+The environment is set before any bot module is imported, since config.py reads it
+at import time.
+"""
+
+import os
+import sys
+
+os.environ.setdefault("VALKEY_BACKEND", "memory")
+os.environ.setdefault("LOG_SINKS", "none")
+os.environ.setdefault("LOG_STREAM_PERSIST", "false")
+os.environ.setdefault("TRADE_ARCHIVE_INTERVAL", "0")
+os.environ.setdefault("INDEXER_POLL_INTERVAL", "0")
+os.environ.setdefault("PREWARM", "false")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from valkey_client import valkey  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def clean_valkey():
+    valkey.flushall()
+    yield
+    valkey.flushall()
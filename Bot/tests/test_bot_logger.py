@@ -0,0 +1,55 @@
+"""Run log buffers: stream persistence through the writer and rings restored with holes."""
+
+import threading
+
+import bot_logger
+from bot_logger import LogBuffer, get_logs, read_stream
+from valkey_client import valkey
+
+
+def xadd(key, seq, ts, msg="m"):
+    valkey.xadd(key, {"ts": repr(ts), "level": "info", "msg": msg}, id=f"0-{seq}")
+
+
+def test_concurrent_appends_reach_stream_in_seq_order():
+    buf = LogBuffer(10_000, stream_key="run:t:logs")
+
+    def log():
+        for i in range(200):
+            buf.append("info", f"m{i}")
+
+    threads = [threading.Thread(target=log) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    bot_logger.flush()
+    seqs = [e["seq"] for e in read_stream("run:t:logs")]
+    assert seqs == list(range(1, 1601))
+
+
+def test_restored_ring_skips_missing_seqs():
+    for seq, ts in ((1, 1.0), (2, 2.0), (4, 4.0), (7, 7.0)):  # 3, 5 and 6 never persisted
+        xadd("run:g:logs", seq, ts)
+    buf = LogBuffer(10, stream_key="run:g:logs")
+    assert [e["seq"] for e in buf.read()] == [1, 2, 4, 7]
+    assert [e["seq"] for e in buf.read(after_seq=2, limit=2)] == [4, 7]
+    assert [e["seq"] for e in buf.read_since_ts(2.5)] == [4, 7]
+    assert [e["seq"] for e in buf.read_since_ts(4.0)] == [7]
+    assert buf.read_since_ts(7.0) == []
+
+
+def test_restored_ring_starting_past_capacity():
+    for seq in (25, 27):
+        xadd("run:h:logs", seq, float(seq))
+    buf = LogBuffer(10, stream_key="run:h:logs")
+    assert [e["seq"] for e in buf.read()] == [25, 27]
+    assert [e["seq"] for e in buf.read_since_ts(0)] == [25, 27]
+    assert buf.append("info", "next")["seq"] == 28
+
+
+def test_get_logs_applies_since_to_stream_fallback():
+    for seq, ts in ((1, 10.0), (2, 20.0), (3, 30.0)):
+        xadd("run:other:logs", seq, ts)
+    assert [e["seq"] for e in get_logs(since_ts=15.0, run_id="run:other")] == [2, 3]
+    assert [e["seq"] for e in get_logs(after_seq=2, run_id="run:other")] == [3]
@@ -0,0 +1,39 @@
+"""Indexed vault event queries, written through the indexer's own chunk writer."""
+
+from types import SimpleNamespace
+
+from event_indexer import EventIndexer, vault_events
+
+VAULT = "0x" + "11" * 20
+ALICE = "0x" + "aa" * 20
+BOB = "0x" + "bb" * 20
+
+
+def index(events):
+    """events: (block, name, user); written as one chunk like index_once does."""
+    records = [{"source": "vault", "event": name, "address": VAULT, "block": block, "log_index": 0,
+                "tx_hash": f"0x{block:064x}", "args": {"user": user, "timestamp": str(block)}}
+               for block, name, user in events]
+    stub = SimpleNamespace(_block_times=lambda blocks: {})
+    EventIndexer._write_chunk(stub, records, max(e[0] for e in events), "0xhash", 100)
+
+
+def test_account_and_event_pages_past_other_events():
+    # Alice's three withdrawals are buried under 100 newer deposits.
+    index([(b, "WithdrawnTo", ALICE) for b in (1, 2, 3)]
+          + [(b, "Deposited", ALICE) for b in range(4, 104)]
+          + [(b, "WithdrawnTo", BOB) for b in range(104, 110)])
+    got = vault_events(VAULT, account=ALICE, event="WithdrawnTo", limit=2)
+    assert [e["block"] for e in got] == [3, 2]
+    got = vault_events(VAULT, account=ALICE, event="WithdrawnTo", limit=10, newest_first=False)
+    assert [e["block"] for e in got] == [1, 2, 3]
+    got = vault_events(VAULT, account=ALICE, event="WithdrawnTo", from_block=2, to_block=50)
+    assert [e["block"] for e in got] == [3, 2]
+    assert vault_events(VAULT, account=BOB, event="Deposited") == []
+
+
+def test_single_filters_use_their_own_index():
+    index([(1, "Deposited", ALICE), (2, "WithdrawnTo", BOB), (3, "Deposited", BOB)])
+    assert [e["block"] for e in vault_events(VAULT, event="Deposited")] == [3, 1]
+    assert [e["block"] for e in vault_events(VAULT, account=BOB)] == [3, 2]
+    assert [e["block"] for e in vault_events(VAULT, limit=2)] == [3, 2]
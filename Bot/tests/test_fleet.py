@@ -0,0 +1,166 @@
+"""Fleet queue, leases, hand-off and pub/sub stop, with a stand-in for BotRunner."""
+
+import json
+import threading
+import time
+
+import pytest
+
+import fleet
+from trade_store import save_checkpoint
+from valkey_client import valkey
+
+LEASE_MS = 200
+
+
+class FakeRunner:
+    """Records what the worker asks of it; a run "trades" until stopped."""
+
+    instances: list = []
+
+    def __init__(self):
+        self.run_id = None
+        self.is_running = False
+        self.resumed_from = None
+        self.stopped = threading.Event()
+        FakeRunner.instances.append(self)
+
+    def start(self, *args, run_id=None):
+        self.run_id = run_id
+        self.is_running = True
+
+    def resume(self, checkpoint):
+        self.run_id = checkpoint["run_id"]
+        self.resumed_from = checkpoint
+        self.is_running = True
+
+    def stop(self):
+        self.is_running = False
+        self.stopped.set()
+
+    def detach(self, timeout=None):
+        self.is_running = False
+        return True
+
+    def get_status(self):
+        return {"run_id": self.run_id, "is_running": self.is_running, "total_trades": 3 if self.run_id else 0,
+                "stop_reason": None if self.is_running or not self.run_id else "USER_STOPPED"}
+
+
+@pytest.fixture(autouse=True)
+def fake_runner(monkeypatch):
+    FakeRunner.instances = []
+    monkeypatch.setattr(fleet, "BotRunner", FakeRunner)
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def claim_one(worker):
+    """Run the claim loop until the worker holds a run, then stop claiming."""
+    worker._heartbeat()
+    t = threading.Thread(target=worker._claim_loop, daemon=True)
+    t.start()
+    assert wait_until(lambda: worker._runners)
+    worker._stopping.set()
+    t.join(5)
+    return next(iter(worker._runners))
+
+
+def die(worker):
+    """Simulate a crash: no shutdown hand-off, the heartbeat just stops."""
+    valkey.delete(fleet.heartbeat_key(worker.worker_id))
+
+
+def test_claim_takes_lease():
+    run_id = fleet.enqueue_run(smart_account_address="0x" + "11" * 20)
+    worker = fleet.FleetWorker("w1", lease_ttl_ms=LEASE_MS)
+    assert claim_one(worker) == run_id
+    assert valkey.get(fleet.lease_key(run_id)) == "w1"
+    assert valkey.sismember(fleet.FLEET_RUNS_KEY, run_id)
+    assert valkey.llen(fleet.QUEUE_KEY) == 0
+
+
+def test_lease_expires_and_other_worker_adopts_from_checkpoint():
+    run_id = fleet.enqueue_run()
+    a = fleet.FleetWorker("a", lease_ttl_ms=LEASE_MS)
+    claim_one(a)
+    save_checkpoint(run_id, {"run_id": run_id, "next_tx": 4})
+    die(a)
+
+    b = fleet.FleetWorker("b", lease_ttl_ms=LEASE_MS)
+    b._heartbeat()
+    b._adopt_orphans()
+    assert not b._runners  # a's lease is still live
+
+    assert wait_until(lambda: not valkey.exists(fleet.lease_key(run_id)))
+    b._reap_dead_workers()
+    b._adopt_orphans()
+    assert b._runners[run_id].resumed_from["next_tx"] == 4
+    assert valkey.get(fleet.lease_key(run_id)) == "b"
+    assert not valkey.sismember(fleet.WORKERS_KEY, "a")
+    assert valkey.llen(fleet.claimed_key("a")) == 0
+
+
+def test_crash_before_first_checkpoint_requeues_and_leaves_fleet_runs():
+    run_id = fleet.enqueue_run()
+    a = fleet.FleetWorker("a", lease_ttl_ms=LEASE_MS)
+    claim_one(a)
+    die(a)
+    assert wait_until(lambda: not valkey.exists(fleet.lease_key(run_id)))
+
+    b = fleet.FleetWorker("b", lease_ttl_ms=LEASE_MS)
+    b._heartbeat()
+    b._reap_dead_workers()
+    b._adopt_orphans()
+    assert not valkey.sismember(fleet.FLEET_RUNS_KEY, run_id)
+    assert json.loads(valkey.lindex(fleet.QUEUE_KEY, 0))["run_id"] == run_id
+
+    assert claim_one(b) == run_id
+    assert valkey.sismember(fleet.FLEET_RUNS_KEY, run_id)
+
+
+def test_stop_reaches_owner_over_pubsub_and_keeps_final_status():
+    # A long lease keeps the maintenance loop (which also honours the stop flag) asleep,
+    # so only the control channel can deliver the stop in time.
+    worker = fleet.FleetWorker("w1", lease_ttl_ms=60_000)
+    t = threading.Thread(target=worker.run_forever, daemon=True)
+    t.start()
+    try:
+        run_id = fleet.enqueue_run()
+        assert wait_until(lambda: run_id in worker._runners)
+        runner = worker._runners[run_id]
+        assert wait_until(lambda: worker._pubsub is not None and worker._pubsub.subscribed)
+        assert fleet.request_stop(run_id)
+        assert runner.stopped.wait(5)
+        # Closing the run out leaves its last snapshot behind.
+        worker._tend_runs()
+        assert run_id not in worker._runners
+        status = fleet.get_run_status(run_id)
+        assert status["total_trades"] == 3 and not status["is_running"]
+        assert 0 < valkey.ttl(f"{run_id}:status") <= fleet.FINAL_STATUS_TTL
+        assert not valkey.sismember(fleet.FLEET_RUNS_KEY, run_id)
+    finally:
+        worker._stopping.set()
+        t.join(5)
+
+
+def test_stop_before_claim_cancels_without_run_record():
+    run_id = fleet.enqueue_run()
+    fleet.request_stop(run_id)
+    worker = fleet.FleetWorker("w1", lease_ttl_ms=LEASE_MS)
+    worker._heartbeat()
+    t = threading.Thread(target=worker._claim_loop, daemon=True)
+    t.start()
+    assert wait_until(lambda: valkey.exists(f"{run_id}:status"))
+    worker._stopping.set()
+    t.join(5)
+    assert fleet.get_run_status(run_id)["stop_reason"] == "CANCELLED"
+    assert not valkey.exists(run_id)
+    assert not worker._runners
@@ -0,0 +1,123 @@
+"""Stop alerts against a local stand-in for the Resend API: dedup, digests, rate limit, retries."""
+
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import config
+import notifier
+from notifier import NotificationDispatcher
+from valkey_client import valkey
+
+
+class ResendStub(ThreadingHTTPServer):
+    """Records posted emails; answers with `statuses` in turn, then 200."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.emails = []
+        self.statuses = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/emails"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        if status == 200:
+            self.server.emails.append(body)
+        self.send_response(status)
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def resend(monkeypatch):
+    server = ResendStub()
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    monkeypatch.setattr(notifier, "RESEND_EMAILS_URL", server.url)
+    monkeypatch.setattr(config, "RESEND_API_KEY", "re_test")
+    monkeypatch.setattr(config, "BOT_ALERT_EMAIL_TO", "ops@example.com")
+    monkeypatch.setattr(config, "BOT_ALERT_EMAIL_FROM", "bot@example.com")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_same_run_and_reason_alerts_once(resend):
+    d = NotificationDispatcher(digest_window=0)
+    assert d.notify_stop("run:01", "Insufficient funds", False)
+    assert not d.notify_stop("run:01", "Insufficient funds", False)
+    assert NotificationDispatcher(digest_window=0).notify_stop("run:01", "Insufficient funds", False) is False
+    assert d.notify_stop("run:01", "Session key expired", True)
+    assert d.flush()
+    assert len(resend.emails) == 2 and d.deduped == 1
+    assert resend.emails[0]["to"] == ["ops@example.com"]
+
+
+def test_alerts_in_the_window_go_out_as_one_digest(resend):
+    d = NotificationDispatcher(digest_window=0.3)
+    for i in range(3):
+        d.notify_stop(f"run:0{i}", "Insufficient funds", i == 0)
+    assert wait_until(lambda: resend.emails)
+    time.sleep(0.1)
+    assert len(resend.emails) == 1
+    email = resend.emails[0]
+    assert email["subject"] == "3 bots stopped (1 session key expired)"
+    assert all(f"run run:0{i}" in email["text"] for i in range(3))
+
+
+def test_rate_limit_holds_alerts_until_a_token_frees(resend):
+    d = NotificationDispatcher(digest_window=0, max_per_minute=1)
+    d.notify_stop("run:01", "Insufficient funds", False)
+    assert wait_until(lambda: resend.emails)
+    d.notify_stop("run:02", "Insufficient funds", False)
+    time.sleep(0.3)
+    assert len(resend.emails) == 1  # the next token is a minute away
+    assert d.flush()
+    assert len(resend.emails) == 2
+
+
+def test_failed_sends_retry_then_release_the_dedup_mark(resend):
+    resend.statuses = [500, 500, 500]
+    d = NotificationDispatcher(digest_window=0, max_attempts=2)
+    assert d.notify_stop("run:01", "Insufficient funds", False)
+    assert d.flush()  # the first attempt already failed; this is the second and last
+    assert not resend.emails and d.sent == 0
+    assert not valkey.exists(notifier._dedup_key("run:01", "Insufficient funds"))
+
+    # The alert was dropped, so the same stop can alert again; the stub now recovers after one 500.
+    assert d.notify_stop("run:01", "Insufficient funds", False)
+    assert d.flush()
+    assert len(resend.emails) == 1 and d.sent == 1
+    assert valkey.exists(notifier._dedup_key("run:01", "Insufficient funds"))
+
+
+def test_full_queue_releases_the_dedup_mark(resend, monkeypatch):
+    d = NotificationDispatcher(digest_window=0)
+    monkeypatch.setattr(d, "_ensure_started", lambda: None)
+    d._queue = queue.Queue(maxsize=1)
+    assert d.notify_stop("run:01", "Insufficient funds", False)
+    assert not d.notify_stop("run:02", "Insufficient funds", False)
+    assert not valkey.exists(notifier._dedup_key("run:02", "Insufficient funds"))
+    assert valkey.exists(notifier._dedup_key("run:01", "Insufficient funds"))
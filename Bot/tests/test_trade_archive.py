@@ -0,0 +1,89 @@
+"""Archive segments: streamed frames, per-wallet matches and the byte-bounded cache."""
+
+import pytest
+
+import config
+import trade_archive
+import trade_codec
+from trade_archive import DAY_MS, append_segment, iter_archived, iter_frames, segment_path
+from trade_store import build_trade
+from valkey_client import valkey
+
+DAY = 20_000 * DAY_MS
+ALICE = "0x" + "aa" * 20
+BOB = "0x" + "bb" * 20
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TRADE_ARCHIVE_DIR", str(tmp_path))
+    trade_archive._cache.clear()
+    trade_archive._cache_bytes = 0
+    return tmp_path
+
+
+def archive(records):
+    """Write records into their day segment and index them, as archive_once does."""
+    by_day = {}
+    for r in records:
+        by_day.setdefault(int(r["ts"]) - int(r["ts"]) % DAY_MS, []).append(r)
+    for day, rs in by_day.items():
+        append_segment(segment_path(day), [(r["trade_id"], trade_codec.encode(r)) for r in rs])
+        pipe = valkey.pipeline()
+        for r in rs:
+            trade_archive._index_days(pipe, day, r)
+        pipe.execute()
+
+
+def trades(wallet, run_id, count, start=DAY):
+    return [build_trade(run_id, wallet, "BUY", i + 1, f"tx-{i}", trade_id=f"trade:{wallet[-4:]}{i:04d}",
+                        ts=start + i * 1000) for i in range(count)]
+
+
+def test_frames_stream_across_chunks_and_members():
+    records = trades(ALICE, "run:01", 50)
+    archive(records[:20])
+    archive(records[20:])  # a second gzip member
+    frames = list(iter_frames(segment_path(DAY), chunk_size=7))
+    assert [t for t, _ in frames] == [r["trade_id"] for r in records]
+    assert trade_codec.decode(*frames[3]) == records[3]
+
+
+def test_query_keeps_only_the_wallet_and_pages_in_order():
+    alice = trades(ALICE, "run:01", 30)
+    archive(alice + trades(BOB, "run:02", 200))
+    got = [r for _, _, r in iter_archived("user_wallet", ALICE)]
+    assert got == sorted(alice, key=lambda r: int(r["ts"]), reverse=True)
+    after = (int(got[9]["ts"]), got[9]["trade_id"])
+    page = [r["trade_id"] for _, _, r in iter_archived("user_wallet", ALICE, after=after)]
+    assert page == [r["trade_id"] for r in got[10:]]
+    assert [r["run_id"] for _, _, r in iter_archived("run_id", "run:02")][:1] == ["run:02"]
+    # The cache holds Alice's and run:02's matches, not the whole day.
+    assert {k[1:] for k in trade_archive._cache} == {("user_wallet", ALICE), ("run_id", "run:02")}
+
+
+def test_duplicate_frames_are_dropped():
+    alice = trades(ALICE, "run:01", 5)
+    archive(alice)
+    archive(alice[:2])  # a crash between fsync and the Valkey delete re-archives these
+    assert len(list(iter_archived("user_wallet", ALICE))) == 5
+
+
+def test_cache_is_bounded_by_bytes(monkeypatch):
+    monkeypatch.setattr(config, "TRADE_ARCHIVE_CACHE_BYTES", 4000)
+    wallets = ["0x" + f"{i:02x}" * 20 for i in range(10)]
+    for i, wallet in enumerate(wallets):
+        archive(trades(wallet, f"run:{i:02x}", 20))
+    for wallet in wallets:
+        assert len(list(iter_archived("user_wallet", wallet))) == 20
+    assert 0 < trade_archive._cache_bytes <= 4000
+    assert trade_archive._cache_bytes == sum(v[2] for v in trade_archive._cache.values())
+    assert len(trade_archive._cache) < len(wallets)
+
+
+def test_reindex_rebuilds_day_indexes_from_segments():
+    archive(trades(ALICE, "run:01", 3) + trades(BOB, "run:02", 3, start=DAY + DAY_MS))
+    valkey.flushall()
+    assert trade_archive.reindex() == 2
+    assert valkey.zrange(trade_archive.days_key("user_wallet", BOB), 0, -1) == [str(DAY + DAY_MS)]
+    assert valkey.zrange(trade_archive.days_key("run_id", "run:01"), 0, -1) == [str(DAY)]
@@ -0,0 +1,73 @@
+"""Write-behind ingestion: spill files, replay at startup and the cross-process locks."""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from trade_ingest import TradeIngestor, _file_lock
+from trade_store import build_trade, trade_exists
+
+WALLET = "0x" + "aa" * 20
+
+
+def records(n, prefix="a"):
+    return [build_trade("run:01", WALLET, "BUY", 1, f"tx-{i}", trade_id=f"trade:{prefix}{i:04d}")
+            for i in range(n)]
+
+
+@pytest.fixture
+def spill_path(tmp_path):
+    return str(tmp_path / "spill.jsonl")
+
+
+def test_start_replays_spill_left_by_a_previous_process(spill_path):
+    TradeIngestor(spill_path=spill_path).spill(records(3))  # never started: nothing replays it
+    ingestor = TradeIngestor(spill_path=spill_path)
+    ingestor.start()
+    assert ingestor.flush()
+    assert all(trade_exists(f"trade:a{i:04d}") for i in range(3))
+    assert not os.path.exists(spill_path)
+
+
+def test_replay_skips_while_another_process_replays(spill_path):
+    ingestor = TradeIngestor(spill_path=spill_path)
+    ingestor.spill(records(2))
+    with _file_lock(spill_path + ".replay.lock"):
+        ingestor._replay_spill()
+        assert not trade_exists("trade:a0000")
+    ingestor._replay_spill()
+    assert trade_exists("trade:a0000") and trade_exists("trade:a0001")
+
+
+def test_unreadable_lines_are_set_aside(spill_path):
+    ingestor = TradeIngestor(spill_path=spill_path)
+    ingestor.spill(records(1))
+    with open(spill_path, "a", encoding="utf-8") as f:
+        f.write('{"trade_id": "trade:cut')  # a line cut short by a crash mid-spill
+    ingestor._replay_spill()
+    assert trade_exists("trade:a0000")
+    with open(spill_path + ".bad", encoding="utf-8") as f:
+        assert f.read().startswith('{"trade_id": "trade:cut')
+
+
+SPILL_SCRIPT = """
+import sys
+from trade_ingest import TradeIngestor
+from trade_store import build_trade
+TradeIngestor(spill_path=sys.argv[1]).spill(
+    [build_trade("run:01", "0x" + "aa" * 20, "BUY", 1, "tx", trade_id=f"trade:{sys.argv[2]}{i:04d}")
+     for i in range(300)])
+"""
+
+
+def test_processes_sharing_a_spill_path_do_not_interleave(spill_path):
+    bot_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=bot_dir)
+    procs = [subprocess.Popen([sys.executable, "-c", SPILL_SCRIPT, spill_path, p], env=env) for p in "abcd"]
+    assert all(p.wait(60) == 0 for p in procs)
+    with open(spill_path, encoding="utf-8") as f:
+        ids = [json.loads(line)["trade_id"] for line in f]
+    assert sorted(ids) == sorted(f"trade:{p}{i:04d}" for p in "abcd" for i in range(300))
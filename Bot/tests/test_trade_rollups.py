@@ -0,0 +1,81 @@
+"""Rollup buckets: packed counters, one script call per trade, retention and edge trimming."""
+
+import time
+
+import config
+import trade_rollups
+from trade_rollups import GWEI, bucket_start, get_rollups, queue_rollup_writes, rollup_key, summarize
+from trade_store import build_trade, write_trades
+from valkey_client import valkey
+
+WALLET = "0x" + "aa" * 20
+HOUR = 3_600_000
+# Recent enough that minute and hour buckets are still retained.
+T0 = bucket_start(int(time.time() * 1000) - 2 * 86_400_000 // 3, "day") + 10 * HOUR
+
+
+def trade(i, ts, side="BUY", status="CONFIRMED", amount=1):
+    return build_trade("run:01", WALLET, side, amount, f"tx-{i}", status=status, trade_id=f"trade:{i:04d}", ts=ts)
+
+
+def test_buckets_derive_totals_from_packed_fields():
+    big = 3 * 2**63  # wei sums past int64 stay exact
+    write_trades([trade(0, T0, amount=big), trade(1, T0 + 1, "SELL", "PENDING", 5), trade(2, T0 + 2)])
+    key = rollup_key("user", WALLET, "hour", T0)
+    assert set(valkey.hkeys(key)) == {"BUY:CONFIRMED", "BUY:amount_gwei", "BUY:amount_wei_rem",
+                                      "SELL:PENDING", "SELL:amount_wei_rem"}
+    [b] = get_rollups("user", WALLET, T0, T0 + HOUR - 1, "hour")
+    assert b["trades"] == 3
+    assert b["by_side"] == {"BUY": 2, "SELL": 1}
+    assert b["by_status"] == {"CONFIRMED": 2, "PENDING": 1}
+    assert b["by_side_status"] == {"BUY:CONFIRMED": 2, "SELL:PENDING": 1}
+    assert b["amount_wei_by_side"] == {"BUY": str(big + 1), "SELL": "5"}
+    assert b["amount_wei"] == str(big + 6)
+
+
+def test_one_command_per_trade():
+    pipe = valkey.pipeline(transaction=True)
+    queue_rollup_writes(pipe, trade(0, T0))
+    assert len(pipe.command_stack) == 1
+    pipe.execute()
+    for res in trade_rollups.RESOLUTIONS_MS:
+        assert valkey.hget(rollup_key("run", "run:01", res, bucket_start(T0, res)), "BUY:CONFIRMED") == "1"
+
+
+def test_every_resolution_expires():
+    write_trades([trade(0, T0)])
+    for res in trade_rollups.RESOLUTIONS_MS:
+        ttl = valkey.ttl(rollup_key("user", WALLET, res, bucket_start(T0, res)))
+        assert 0 < ttl <= trade_rollups.RETENTION_SECONDS[res]
+    assert trade_rollups.RETENTION_SECONDS["day"] == config.ROLLUP_DAY_RETENTION_DAYS * 86_400
+
+
+def test_legacy_buckets_decode_the_same():
+    key = rollup_key("user", WALLET, "day", bucket_start(T0, "day"))
+    valkey.hset(key, mapping={"trades": 2, "BUY": 2, "status:CONFIRMED": 2, "BUY:CONFIRMED": 2,
+                              "amount_gwei": 3, "amount_wei_rem": 4, "BUY:amount_gwei": 3, "BUY:amount_wei_rem": 4})
+    [b] = get_rollups("user", WALLET, bucket_start(T0, "day"), bucket_start(T0, "day") + 86_400_000 - 1, "day")
+    assert (b["trades"], b["by_side"], b["by_status"]) == (2, {"BUY": 2}, {"CONFIRMED": 2})
+    assert b["amount_wei"] == str(3 * GWEI + 4)
+
+
+def test_partial_edge_buckets_count_only_the_range():
+    # Trades every 10 minutes for 14 hours; query 11:30 to 23:29 at hour resolution.
+    write_trades([trade(i, T0 + i * 600_000) for i in range(84)])
+    start, end = T0 + HOUR + 30 * 60_000, T0 + 13 * HOUR + 30 * 60_000 - 1
+    buckets = get_rollups("user", WALLET, start, end, "hour")
+    assert [b["ts"] for b in buckets] == [T0 + h * HOUR for h in range(1, 14)]
+    assert buckets[0]["trades"] == 3 and buckets[-1]["trades"] == 3
+    in_range = sum(1 for i in range(84) if start <= T0 + i * 600_000 <= end)
+    assert summarize(buckets)["trades"] == in_range == 72
+
+    # A day bucket cut at both ends is summed from hours and minutes.
+    day = get_rollups("user", WALLET, start, end, "day")
+    assert len(day) == 1 and day[0]["trades"] == 72
+
+
+def test_edges_fall_back_to_whole_buckets_once_finer_ones_expire():
+    old = bucket_start(int(time.time() * 1000), "day") - 200 * 86_400_000 + HOUR
+    write_trades([trade(i, old + i * 600_000) for i in range(12)])
+    [b] = get_rollups("user", WALLET, old + 30 * 60_000, old + HOUR, "day")
+    assert b["trades"] == 12  # neither hour nor minute buckets that old are kept
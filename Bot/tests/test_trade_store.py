@@ -0,0 +1,70 @@
+"""Trade writes, run records and paged queries against the in-memory backend."""
+
+import pytest
+
+import config
+import trade_store
+from trade_store import (build_trade, get_run, get_run_trades, get_user_trades, load_checkpoint,
+                         save_checkpoint, start_run, stop_run, unfinished_runs, write_trades)
+from valkey_client import valkey
+
+WALLET = "0x" + "AB" * 20
+T0 = 1_700_000_000_000
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TRADE_ARCHIVE_DIR", str(tmp_path))
+
+
+def trades(run_id, n, side="BUY", ts=T0):
+    return [build_trade(run_id, WALLET, side, i + 1, f"tx-{i}", trade_id=f"trade:{run_id[-2:]}{side}{i:03d}",
+                        ts=ts + i * 1000) for i in range(n)]
+
+
+def test_write_indexes_and_counts():
+    run_id = start_run(WALLET, run_id="run:01")
+    write_trades(trades(run_id, 3) + trades(run_id, 2, side="SELL", ts=T0 + 500))
+    run = get_run(run_id)
+    assert run["user_wallet"] == WALLET.lower() and run["status"] == "RUNNING"
+    assert run["metrics"] == {"trades_total": 5, "buy_confirmed": 3, "sell_confirmed": 2}
+    assert valkey.zcard(f"user:{WALLET.lower()}:trades") == 5
+
+
+def test_skip_existing_makes_replays_idempotent():
+    batch = trades("run:01", 4)
+    assert len(write_trades(batch[:2])) == 2
+    assert write_trades(batch, skip_existing=True) == [r["trade_id"] for r in batch[2:]]
+    assert get_run("run:01") is None  # trades alone do not make a run record
+    assert int(valkey.hget("run:01:metrics", "trades_total")) == 4
+
+
+def test_pages_follow_the_cursor_and_filter():
+    write_trades(trades("run:01", 7) + trades("run:01", 5, side="SELL", ts=T0 + 500))
+    seen, cursor = [], None
+    while True:
+        page, cursor = get_user_trades(WALLET, limit=5, cursor=cursor)
+        seen += page
+        if cursor is None:
+            break
+    assert len(seen) == 12 and len({t.trade_id for t in seen}) == 12
+    assert [t.ts for t in seen] == sorted((t.ts for t in seen), reverse=True)
+
+    sells, cursor = get_run_trades("run:01", side="SELL", limit=10, newest_first=False)
+    assert [t.amount_wei for t in sells] == [1, 2, 3, 4, 5] and cursor is None
+    window, _ = get_run_trades("run:01", start_ms=T0 + 1000, end_ms=T0 + 2000)
+    assert {t.trade_id for t in window} == {"trade:01BUY001", "trade:01BUY002", "trade:01SELL001"}
+
+
+def test_checkpoints_clear_on_stop(monkeypatch):
+    monkeypatch.setattr(config, "RUN_RETENTION_DAYS", 1)
+    start_run(WALLET, run_id="run:01")
+    save_checkpoint("run:01", {"run_id": "run:01", "updated": 2})
+    save_checkpoint("run:02", {"run_id": "run:02", "updated": 1})
+    assert [c["run_id"] for c in unfinished_runs()] == ["run:01", "run:02"]
+    stop_run("run:01", "USER_STOPPED")
+    assert load_checkpoint("run:01") is None
+    assert [c["run_id"] for c in unfinished_runs()] == ["run:02"]
+    assert get_run("run:01")["stop_reason"] == "USER_STOPPED"
+    assert 0 < valkey.ttl("run:01") <= 86400
+    assert not valkey.sismember(trade_store.ACTIVE_RUNS_KEY, "run:01")
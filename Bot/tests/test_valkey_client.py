@@ -0,0 +1,31 @@
+"""Valkey client factory: pool accounting for /health, without reading redis-py internals."""
+
+import fakeredis
+
+import valkey_client
+from valkey_client import _CountingPool, health
+
+# Renamed in newer fakeredis releases; the old name still works but warns.
+FakeConnection = getattr(fakeredis, "FakeRedisConnection", None) or fakeredis.FakeConnection
+
+
+def test_pool_counts_open_and_in_use_connections(monkeypatch):
+    pool = _CountingPool(connection_class=FakeConnection, server=fakeredis.FakeServer(),
+                         max_connections=4)
+    a = pool.get_connection()
+    b = pool.get_connection()
+    assert (pool.created, pool.in_use) == (2, 2)
+    pool.release(a)
+    assert (pool.created, pool.in_use) == (2, 1)
+    assert pool.get_connection() is a  # reused, not a new connection
+    pool.release(a)
+    pool.release(b)
+
+    monkeypatch.setitem(valkey_client._pools, True, pool)
+    assert health()["pool"] == {"max": 4, "open": 2, "in_use": 0, "idle": 2}
+
+
+def test_health_on_memory_backend():
+    out = health()
+    assert out["backend"] == "memory" and out["ok"] and out["latency_ms"] >= 0
+    assert "pool" not in out
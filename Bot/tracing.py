@@ -0,0 +1,130 @@
+"""Per-iteration tracing spans for the run loops.
+
+`begin(run_id, iteration)` opens a trace for one loop iteration on the current thread
+and `end()` stores it. `trace(...)` is the context-manager form. Loops that break or
+continue call `end()` once more on the way out. `span(name)` times a phase inside the
+trace: price_fetch, signal, quote, sign, send, confirm, store, proof. Spans nest. Each
+span is also observed in metrics as bot_loop_phase_seconds{phase=name}, so spans
+outside a trace (e.g. a swap from a script) still count.
+
+A finished trace is pushed to the run's ring buffer in Valkey (`<run_id>:traces`, the
+newest TRACE_BUFFER_SIZE traces) with one pipeline. The API serves it at
+GET /runs/<run_id>/traces. Storing is best-effort: a Valkey error is logged and the
+loop carries on.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+import metrics
+from bot_logger import warning as log_warn
+from valkey_client import valkey
+
+_local = threading.local()
+
+
+def traces_key(run_id: str) -> str:
+    return f"{run_id}:traces"
+
+
+def begin(run_id: str, iteration: int, **attrs) -> dict:
+    """Start the current thread's trace for one loop iteration (closing any left open)."""
+    end()
+    record = {"run_id": run_id, "iteration": iteration, "start": time.time(), **attrs, "spans": []}
+    _local.trace, _local.depth, _local.t0 = record, 0, time.perf_counter()
+    return record
+
+
+def end(error: str | None = None) -> dict | None:
+    """Finish and store the current trace; a no-op when none is open."""
+    record = getattr(_local, "trace", None)
+    if record is None:
+        return None
+    elapsed = time.perf_counter() - _local.t0
+    _local.trace = None
+    record["duration_ms"] = round(elapsed * 1000, 3)
+    if error:
+        record["error"] = error
+    metrics.LOOP_PHASE_SECONDS.observe(elapsed, "iteration")
+    _store(record["run_id"], record)
+    return record
+
+
+@contextmanager
+def trace(run_id: str, iteration: int, **attrs):
+    record = begin(run_id, iteration, **attrs)
+    try:
+        yield record
+    except BaseException as e:
+        end(type(e).__name__)
+        raise
+    end()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time one phase; recorded in the current trace (if any) and in metrics."""
+    record = getattr(_local, "trace", None)
+    depth = getattr(_local, "depth", 0)
+    _local.depth = depth + 1
+    t0 = time.perf_counter()
+    entry = None
+    if record is not None:
+        # Appended at start so parents precede their children.
+        entry = {"name": name, "depth": depth, "offset_ms": round((t0 - _local.t0) * 1000, 3), **attrs}
+        record["spans"].append(entry)
+    try:
+        yield
+    except BaseException as e:
+        if entry is not None:
+            entry["error"] = type(e).__name__
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        _local.depth = depth
+        metrics.LOOP_PHASE_SECONDS.observe(elapsed, name)
+        if entry is not None:
+            entry["duration_ms"] = round(elapsed * 1000, 3)
+
+
+def annotate(**attrs):
+    """Add attributes (side, tx hash, ...) to the current trace."""
+    record = getattr(_local, "trace", None)
+    if record is not None:
+        record.update(attrs)
+
+
+def _store(run_id: str, record: dict):
+    size = config.TRACE_BUFFER_SIZE
+    if size <= 0:
+        return
+    try:
+        pipe = valkey.pipeline(transaction=False)
+        pipe.lpush(traces_key(run_id), json.dumps(record, separators=(",", ":")))
+        pipe.ltrim(traces_key(run_id), 0, size - 1)
+        pipe.execute()
+    except Exception as e:
+        log_warn(f"Tracing: could not store trace for {run_id} ({e})")
+
+
+def get_traces(run_id: str, limit: int = 50) -> list[dict]:
+    """Newest first."""
+    return [json.loads(raw) for raw in valkey.lrange(traces_key(run_id), 0, max(0, limit - 1))]
+
+
+def summarize(traces: list[dict]) -> dict:
+    """Per-span count, mean and max duration (ms) across traces."""
+    out: dict = {}
+    for t in traces:
+        for s in t["spans"] + [{"name": "iteration", "duration_ms": t["duration_ms"]}]:
+            if "duration_ms" not in s:  # still open when the iteration was cut short
+                continue
+            agg = out.setdefault(s["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            agg["count"] += 1
+            agg["total_ms"] += s["duration_ms"]
+            agg["max_ms"] = max(agg["max_ms"], s["duration_ms"])
+    return {name: {"count": a["count"], "mean_ms": round(a["total_ms"] / a["count"], 3), "max_ms": a["max_ms"]}
+            for name, a in out.items()}
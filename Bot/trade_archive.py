@@ -0,0 +1,313 @@
+"""Tiered trade retention: old trades move from Valkey to compressed segment files.
+
+Trades younger than TRADE_HOT_DAYS live in Valkey (packed by trade_codec). The archiver
+moves older ones into append-only day segments, one file per UTC day of trade time:
+
+    <TRADE_ARCHIVE_DIR>/trades-YYYYMMDD.seg
+
+Each archive pass appends one gzip member of frames (varint id length, id, varint
+payload length, trade_codec payload); concatenated members read back as one gzip
+stream. Segments are fsynced before the trades are deleted from Valkey, so a crash in
+between can only leave a trade in both tiers; readers drop the duplicate.
+
+trade_store.query_trades merges segments with the hot indexes, so archived trades stay
+readable through the same API. The archiver also records which days hold trades for
+each wallet and run (archive:days:user_wallet:<wallet>, archive:days:run_id:<run_id>),
+in the same transaction that deletes the hot copies; queries open only those segments,
+and a paged query skips the days before its cursor. A segment is streamed, and only the
+queried wallet's or run's records are kept (and cached, up to TRADE_ARCHIVE_CACHE_BYTES). Only one process archives at a
+time (Valkey lock).
+
+    python trade_archive.py             # run forever, every TRADE_ARCHIVE_INTERVAL seconds
+    python trade_archive.py --once      # one pass
+    python trade_archive.py --reindex   # rebuild the day indexes from the segments on disk
+"""
+
+import argparse
+import gzip
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import config
+import trade_codec
+from bot_logger import info as log_info, error as log_err
+from valkey_client import valkey
+
+DAY_MS = 86_400_000
+LOCK_KEY = "lock:trade_archiver"
+_SEGMENT_PREFIX = "trades-"
+_SEGMENT_SUFFIX = ".seg"
+
+
+def days_key(field: str, value: str) -> str:
+    return f"archive:days:{field}:{value}"
+
+
+def _index_days(pipe, day: int, record: dict) -> None:
+    for field in ("user_wallet", "run_id"):
+        pipe.zadd(days_key(field, record[field]), {str(day): day})
+
+
+def segment_path(day_start_ms: int, archive_dir: str | None = None) -> str:
+    day = datetime.fromtimestamp(day_start_ms / 1000, tz=timezone.utc).strftime("%Y%m%d")
+    return os.path.join(archive_dir or config.TRADE_ARCHIVE_DIR, f"{_SEGMENT_PREFIX}{day}{_SEGMENT_SUFFIX}")
+
+
+def _segment_days(archive_dir: str) -> list[int]:
+    """Day start (ms) of every segment on disk, oldest first."""
+    try:
+        names = os.listdir(archive_dir)
+    except FileNotFoundError:
+        return []
+    days = []
+    for name in names:
+        if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX):
+            stamp = name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)]
+            try:
+                day = datetime.strptime(stamp, "%Y%m%d").replace(tzinfo=timezone.utc)
+            except ValueError:
+                continue
+            days.append(int(day.timestamp() * 1000))
+    return sorted(days)
+
+
+def append_segment(path: str, items: list[tuple[str, bytes]]) -> None:
+    """Append (trade_id, packed record) frames as one gzip member and fsync."""
+    frames = bytearray()
+    for trade_id, blob in items:
+        tid = trade_id.encode("utf-8")
+        trade_codec.put_varint(frames, len(tid))
+        frames += tid
+        trade_codec.put_varint(frames, len(blob))
+        frames += blob
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "ab") as f:
+        f.write(gzip.compress(bytes(frames)))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def iter_frames(path: str, chunk_size: int = 1 << 16):
+    """Yield (trade_id, packed record) frames from a segment, decompressing as it goes."""
+    with gzip.open(path, "rb") as f:
+        buf = b""
+        pos = 0
+        eof = False
+        while True:
+            try:
+                n, p = trade_codec.get_varint(buf, pos)
+                n2, p2 = trade_codec.get_varint(buf, p + n)
+                if p2 + n2 > len(buf):
+                    raise IndexError
+            except IndexError:
+                if eof:
+                    if pos < len(buf):
+                        raise ValueError(f"truncated frame at the end of {path}")
+                    return
+                data = f.read(chunk_size)
+                eof = not data
+                buf = buf[pos:] + data
+                pos = 0
+                continue
+            yield buf[p:p + n].decode("utf-8"), buf[p2:p2 + n2]
+            pos = p2 + n2
+
+
+# Per-segment matches for one wallet/run: (ts, trade_id, packed record), sorted. Keyed by
+# (path, field, value) and validated against (mtime, size), since paging re-reads the same
+# days. Bounded by packed size, so memory follows what queries return, not daily volume.
+_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_bytes = 0
+_ENTRY_OVERHEAD = 64  # tuple, ints and str headers around each packed record
+
+
+def _matches(path: str, field: str, value: str) -> list[tuple[int, str, bytes]]:
+    """Frames in a segment whose record[field] == value, sorted by (ts, trade_id), deduplicated."""
+    global _cache_bytes
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = (path, field, value)
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit and hit[0] == stamp:
+            _cache.move_to_end(key)
+            return hit[1]
+    head_index = 1 if field == "run_id" else 2
+    by_id = {}
+    for trade_id, blob in iter_frames(path):
+        head = trade_codec.decode_head(blob)
+        if head[head_index] == value:
+            by_id[trade_id] = (head[0], trade_id, blob)
+    entries = sorted(by_id.values())
+    size = sum(len(b) + len(t) + _ENTRY_OVERHEAD for _, t, b in entries)
+    with _cache_lock:
+        old = _cache.pop(key, None)
+        if old:
+            _cache_bytes -= old[2]
+        if size <= config.TRADE_ARCHIVE_CACHE_BYTES:
+            _cache[key] = (stamp, entries, size)
+            _cache_bytes += size
+            while _cache_bytes > config.TRADE_ARCHIVE_CACHE_BYTES:
+                _, evicted = _cache.popitem(last=False)
+                _cache_bytes -= evicted[2]
+    return entries
+
+
+def iter_archived(field: str, value: str, start_ms=None, end_ms=None, newest_first=True,
+                  after=None, archive_dir: str | None = None):
+    """Yield (ts, trade_id, record) for archived trades where record[field] == value.
+
+    Order and the `after` (ts, trade_id) cursor match trade_store's index iteration.
+    """
+    archive_dir = archive_dir or config.TRADE_ARCHIVE_DIR
+    # Days that can hold a match: those indexed for this wallet/run, within the range and
+    # past the cursor.
+    lo_ms, hi_ms = start_ms, end_ms
+    if after:
+        if newest_first:
+            hi_ms = after[0] if hi_ms is None else min(hi_ms, after[0])
+        else:
+            lo_ms = after[0] if lo_ms is None else max(lo_ms, after[0])
+    lo = "-inf" if lo_ms is None else f"({lo_ms - DAY_MS}"
+    hi = "+inf" if hi_ms is None else hi_ms
+    days = [int(d) for d in valkey.zrangebyscore(days_key(field, value), lo, hi)]
+    if newest_first:
+        days.reverse()
+    for day in days:
+        path = segment_path(day, archive_dir)
+        if not os.path.exists(path):
+            continue
+        entries = _matches(path, field, value)
+        for ts, trade_id, blob in (reversed(entries) if newest_first else entries):
+            key = (ts, trade_id)
+            if start_ms is not None and ts < start_ms:
+                continue
+            if end_ms is not None and ts > end_ms:
+                continue
+            if after and ((newest_first and key >= after) or (not newest_first and key <= after)):
+                continue
+            yield ts, trade_id, trade_codec.decode(trade_id, blob)
+
+
+# ---- Archiver ----
+
+def archive_once(now_ms: int | None = None, batch: int = 1000, archive_dir: str | None = None) -> int:
+    """Move trades older than TRADE_HOT_DAYS to segments; returns how many moved."""
+    from trade_store import fetch_records, now_ms as _now_ms
+
+    now_ms = now_ms or _now_ms()
+    cutoff = now_ms - config.TRADE_HOT_DAYS * DAY_MS
+    token = uuid.uuid4().hex
+    if not valkey.set(LOCK_KEY, token, nx=True, ex=600):
+        return 0
+    moved = 0
+    try:
+        for index_key in valkey.scan_iter(match="user:*:trades", count=500):
+            while True:
+                ids = valkey.zrangebyscore(index_key, "-inf", f"({cutoff}", start=0, num=batch)
+                if not ids:
+                    break
+                records = fetch_records(ids)
+                by_day: dict[int, list] = {}
+                for trade_id, r in zip(ids, records):
+                    if r:
+                        ts = int(r["ts"])
+                        by_day.setdefault(ts - ts % DAY_MS, []).append((trade_id, trade_codec.encode(r)))
+                for day, items in by_day.items():
+                    append_segment(segment_path(day, archive_dir), items)
+                pipe = valkey.pipeline(transaction=True)
+                for trade_id, r in zip(ids, records):
+                    pipe.delete(trade_id)
+                    pipe.zrem(index_key, trade_id)
+                    if r:
+                        pipe.zrem(f"{r['run_id']}:trades", trade_id)
+                        ts = int(r["ts"])
+                        _index_days(pipe, ts - ts % DAY_MS, r)
+                pipe.execute()
+                moved += sum(1 for r in records if r)
+                if len(ids) < batch:
+                    break
+        _prune_runs(now_ms)
+    finally:
+        if valkey.get(LOCK_KEY) == token:
+            valkey.delete(LOCK_KEY)
+    if moved:
+        log_info(f"Trade archive: moved {moved} trades older than {config.TRADE_HOT_DAYS}d to disk")
+    return moved
+
+
+def _prune_runs(now_ms: int) -> None:
+    """Drop index entries for runs whose keys expired (see trade_store.stop_run)."""
+    cutoff = now_ms - config.RUN_RETENTION_DAYS * DAY_MS
+    keys = ["runs:by_time", *valkey.scan_iter(match="user:*:runs", count=500)]
+    for key in keys:
+        run_ids = valkey.zrangebyscore(key, "-inf", f"({cutoff}")
+        if not run_ids:
+            continue
+        pipe = valkey.pipeline(transaction=False)
+        for run_id in run_ids:
+            pipe.exists(run_id)
+        gone = [rid for rid, found in zip(run_ids, pipe.execute()) if not found]
+        if gone:
+            valkey.zrem(key, *gone)
+
+
+def reindex(archive_dir: str | None = None) -> int:
+    """Rebuild the per-wallet/run day indexes from the segments on disk; returns days read.
+
+    Needed once for segments written before the indexes existed.
+    """
+    archive_dir = archive_dir or config.TRADE_ARCHIVE_DIR
+    days = _segment_days(archive_dir)
+    for day in days:
+        owners = set()
+        for _, blob in iter_frames(segment_path(day, archive_dir)):
+            _, run_id, wallet = trade_codec.decode_head(blob)
+            owners.add((wallet, run_id))
+        pipe = valkey.pipeline(transaction=False)
+        for wallet, run_id in owners:
+            _index_days(pipe, day, {"user_wallet": wallet, "run_id": run_id})
+        pipe.execute()
+    log_info(f"Trade archive: indexed {len(days)} segment days")
+    return len(days)
+
+
+def run_forever(interval: int | None = None, stop_event: threading.Event | None = None):
+    interval = interval or config.TRADE_ARCHIVE_INTERVAL
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            archive_once()
+        except Exception as e:
+            log_err(f"Trade archive pass failed: {e}")
+        stop_event.wait(interval)
+
+
+def start_archiver() -> threading.Thread | None:
+    """Run the archiver on a daemon thread (no-op when TRADE_ARCHIVE_INTERVAL is 0)."""
+    if config.TRADE_ARCHIVE_INTERVAL <= 0:
+        return None
+    t = threading.Thread(target=run_forever, name="trade-archiver", daemon=True)
+    t.start()
+    return t
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old trades from Valkey to disk segments")
+    parser.add_argument("--once", action="store_true", help="run a single pass and exit")
+    parser.add_argument("--reindex", action="store_true", help="rebuild the day indexes from the segments and exit")
+    args = parser.parse_args()
+    if args.reindex:
+        reindex()
+    elif args.once:
+        archive_once()
+    else:
+        run_forever()
+
+
+if __name__ == "__main__":
+    main()
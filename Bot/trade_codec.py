@@ -0,0 +1,178 @@
+"""Compact binary encoding for trade records (stdlib only).
+
+A trade is stored as one Valkey string instead of a hash of string fields. The key is
+the trade id, so the id itself is not repeated in the value. Layout (version 1):
+
+    version:u8  flags:u8  side  status  ts:varint  run_id  user_wallet  amount_wei:varint
+    tx_ref  [vault_address] [bot_wallet] [to_wallet] [meta_count:varint (key value)*]
+
+Side and status are one byte when they are one of the known values. Strings are tagged:
+"0x<hex>" (addresses, tx hashes) is stored as raw bytes, "run:<hex>" as raw bytes, and
+anything else as UTF-8. `decode(trade_id, encode(record))` returns exactly the dict
+that trade_store.build_trade produced.
+"""
+
+from typing import Dict, Tuple
+
+VERSION = 1
+
+SIDES = ("BUY", "SELL")
+STATUSES = ("CONFIRMED", "PENDING", "FAILED")
+_CUSTOM = 0xFF
+
+_F_VAULT = 0x01
+_F_BOT = 0x02
+_F_TO = 0x04
+_F_META = 0x08
+_OPTIONAL = ((_F_VAULT, "vault_address"), (_F_BOT, "bot_wallet"), (_F_TO, "to_wallet"))
+
+_T_UTF8 = 0
+_T_HEX = 1  # "0x" + lowercase hex
+_T_RUN = 2  # "run:" + lowercase hex
+
+
+def put_varint(out: bytearray, n: int) -> None:
+    if n < 0:
+        raise ValueError("varint must be non-negative")
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def get_varint(buf: bytes, pos: int):
+    n = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _hex_payload(s: str, prefix: str):
+    """Raw bytes when s is prefix + lowercase even-length hex that round-trips exactly."""
+    if not s.startswith(prefix):
+        return None
+    body = s[len(prefix):]
+    if not body or len(body) % 2:
+        return None
+    try:
+        raw = bytes.fromhex(body)
+    except ValueError:
+        return None
+    return raw if raw.hex() == body else None
+
+
+def _put_str(out: bytearray, s: str) -> None:
+    for tag, prefix in ((_T_HEX, "0x"), (_T_RUN, "run:")):
+        raw = _hex_payload(s, prefix)
+        if raw is not None:
+            break
+    else:
+        tag, raw = _T_UTF8, s.encode("utf-8")
+    out.append(tag)
+    put_varint(out, len(raw))
+    out += raw
+
+
+def _get_str(buf: bytes, pos: int):
+    tag = buf[pos]
+    n, pos = get_varint(buf, pos + 1)
+    raw = buf[pos:pos + n]
+    pos += n
+    if tag == _T_HEX:
+        return "0x" + raw.hex(), pos
+    if tag == _T_RUN:
+        return "run:" + raw.hex(), pos
+    return raw.decode("utf-8"), pos
+
+
+def _put_enum(out: bytearray, value: str, known) -> None:
+    if value in known:
+        out.append(known.index(value))
+    else:
+        out.append(_CUSTOM)
+        _put_str(out, value)
+
+
+def _get_enum(buf: bytes, pos: int, known):
+    code = buf[pos]
+    if code == _CUSTOM:
+        return _get_str(buf, pos + 1)
+    return known[code], pos + 1
+
+
+def encode(record: Dict[str, str]) -> bytes:
+    """Pack a record from trade_store.build_trade (trade_id is not included)."""
+    meta = {k[len("meta:"):]: v for k, v in record.items() if k.startswith("meta:")}
+    flags = 0
+    for bit, name in _OPTIONAL:
+        if record.get(name):
+            flags |= bit
+    if meta:
+        flags |= _F_META
+
+    out = bytearray((VERSION, flags))
+    _put_enum(out, record["side"], SIDES)
+    _put_enum(out, record.get("status", "CONFIRMED"), STATUSES)
+    put_varint(out, int(record["ts"]))
+    _put_str(out, record["run_id"])
+    _put_str(out, record["user_wallet"])
+    put_varint(out, int(record["amount_wei"]))
+    _put_str(out, record.get("tx_ref", ""))
+    for bit, name in _OPTIONAL:
+        if flags & bit:
+            _put_str(out, record[name])
+    if meta:
+        put_varint(out, len(meta))
+        for k, v in meta.items():
+            _put_str(out, k)
+            _put_str(out, str(v))
+    return bytes(out)
+
+
+def decode_head(buf: bytes) -> Tuple[int, str, str]:
+    """(ts, run_id, user_wallet) without decoding the rest, for filtering packed records."""
+    if buf[0] != VERSION:
+        raise ValueError(f"unknown trade encoding version {buf[0]}")
+    _, pos = _get_enum(buf, 2, SIDES)
+    _, pos = _get_enum(buf, pos, STATUSES)
+    ts, pos = get_varint(buf, pos)
+    run_id, pos = _get_str(buf, pos)
+    user_wallet, pos = _get_str(buf, pos)
+    return ts, run_id, user_wallet
+
+
+def decode(trade_id: str, buf: bytes) -> Dict[str, str]:
+    """Inverse of encode: the flat string dict build_trade produced."""
+    if buf[0] != VERSION:
+        raise ValueError(f"unknown trade encoding version {buf[0]}")
+    flags = buf[1]
+    side, pos = _get_enum(buf, 2, SIDES)
+    status, pos = _get_enum(buf, pos, STATUSES)
+    ts, pos = get_varint(buf, pos)
+    run_id, pos = _get_str(buf, pos)
+    user_wallet, pos = _get_str(buf, pos)
+    amount, pos = get_varint(buf, pos)
+    tx_ref, pos = _get_str(buf, pos)
+    record = {
+        "trade_id": trade_id,
+        "run_id": run_id,
+        "user_wallet": user_wallet,
+        "side": side,
+        "amount_wei": str(amount),
+        "tx_ref": tx_ref,
+        "status": status,
+        "ts": str(ts),
+    }
+    for bit, name in _OPTIONAL:
+        if flags & bit:
+            record[name], pos = _get_str(buf, pos)
+    if flags & _F_META:
+        count, pos = get_varint(buf, pos)
+        for _ in range(count):
+            k, pos = _get_str(buf, pos)
+            record[f"meta:{k}"], pos = _get_str(buf, pos)
+    return record
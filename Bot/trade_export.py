@@ -0,0 +1,77 @@
+"""Streaming trade export (NDJSON or CSV, optionally gzipped).
+
+Rows come from trade_store.get_user_trades / get_run_trades one page at a time and
+are encoded as they are produced, so memory use depends on the page size, not on
+how many trades the wallet or run has.
+"""
+
+import csv
+import io
+import json
+import zlib
+from typing import Iterator, Optional
+
+from trade_store import get_run_trades, get_user_trades
+
+EXPORT_PAGE_SIZE = 1000
+CSV_COLUMNS = ("trade_id", "ts", "run_id", "user_wallet", "side", "amount_wei", "tx_ref", "status",
+               "vault_address", "bot_wallet", "to_wallet", "meta")
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def iter_trades(wallet: Optional[str] = None, run_id: Optional[str] = None, **query) -> Iterator:
+    """Every matching TradeRecord in order, fetched EXPORT_PAGE_SIZE at a time."""
+    cursor = None
+    while True:
+        if run_id:
+            page, cursor = get_run_trades(run_id, limit=EXPORT_PAGE_SIZE, cursor=cursor, **query)
+        else:
+            page, cursor = get_user_trades(wallet, limit=EXPORT_PAGE_SIZE, cursor=cursor, **query)
+        yield from page
+        if not cursor:
+            return
+
+
+def _ndjson(trades) -> Iterator[bytes]:
+    lines = []
+    for t in trades:
+        lines.append(json.dumps(t.to_dict(), separators=(",", ":")))
+        if len(lines) >= EXPORT_PAGE_SIZE:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _csv(trades) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_COLUMNS)
+    rows = 0
+    for t in trades:
+        d = t.to_dict()
+        d["meta"] = json.dumps(d["meta"], separators=(",", ":")) if d["meta"] else ""
+        writer.writerow([d.get(c, "") for c in CSV_COLUMNS])
+        rows += 1
+        if rows % EXPORT_PAGE_SIZE == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def export_stream(fmt: str, wallet: Optional[str] = None, run_id: Optional[str] = None,
+                  gzip: bool = False, **query) -> Iterator[bytes]:
+    """Encoded export body as a byte generator; `query` takes query_trades' range/filter args."""
+    trades = iter_trades(wallet=wallet, run_id=run_id, **query)
+    body = _csv(trades) if fmt == "csv" else _ndjson(trades)
+    return _gzip(body) if gzip else body
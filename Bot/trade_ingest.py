@@ -0,0 +1,252 @@
+"""Write-behind trade ingestion: the run loop enqueues, a background thread writes batches.
+
+`submit` builds the trade record immediately (id and timestamp are fixed at trade time)
+and puts it on a bounded queue. The flusher writes a batch when it reaches
+TRADE_INGEST_BATCH_SIZE records or TRADE_INGEST_FLUSH_MS after the first record,
+using one trade_store.write_trades transaction per batch. When the queue is full,
+submit blocks (backpressure) for up to TRADE_INGEST_PUT_TIMEOUT seconds and then spills
+the record to disk instead. A batch that keeps failing is also spilled, to
+TRADE_SPILL_PATH (JSON lines). The spill file is replayed, skipping ids already
+written, when the flusher starts (so trades spilled before a crash or restart are not
+left waiting for new traffic) and after each successful flush; lines that do not parse
+are moved to TRADE_SPILL_PATH + ".bad".
+
+The API process and every fleet worker share TRADE_SPILL_PATH: appends hold an flock on
+TRADE_SPILL_PATH + ".lock", and one process at a time replays (".replay.lock").
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one process per spill path
+    fcntl = None
+
+import config
+import metrics
+from bot_logger import info as log_info, warning as log_warn, error as log_err
+from trade_store import build_trade, write_trades
+
+
+@contextmanager
+def _file_lock(path: str, blocking: bool = True):
+    """Exclusive flock on `path`, shared with other processes; yields False if not blocking and taken."""
+    if fcntl is None:
+        yield True
+        return
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class TradeIngestor:
+    def __init__(self, max_queue=None, batch_size=None, flush_ms=None, spill_path=None,
+                 max_retries=3, put_timeout=None):
+        self.batch_size = batch_size or config.TRADE_INGEST_BATCH_SIZE
+        self.flush_interval = (flush_ms or config.TRADE_INGEST_FLUSH_MS) / 1000.0
+        self.spill_path = spill_path or config.TRADE_SPILL_PATH
+        self.max_retries = max_retries
+        self.put_timeout = config.TRADE_INGEST_PUT_TIMEOUT if put_timeout is None else put_timeout
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue or config.TRADE_INGEST_MAX_QUEUE)
+        self._pending: set = set()  # ids submitted but not yet written or spilled
+        self._pending_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.spilled = 0
+
+    # ---- producer side ----
+
+    def submit(self, run_id, user_wallet, side, amount_wei, tx_ref, **kwargs) -> str:
+        """Queue a trade (same arguments as trade_store.create_trade); returns its trade_id."""
+        return self.submit_record(build_trade(run_id, user_wallet, side, amount_wei, tx_ref, **kwargs))
+
+    def submit_record(self, record) -> str:
+        """Queue a record already built by trade_store.build_trade; returns its trade_id."""
+        self._ensure_started()
+        with self._pending_lock:
+            self._pending.add(record["trade_id"])
+        try:
+            self._queue.put(record, timeout=self.put_timeout)
+        except queue.Full:
+            log_warn("Trade ingest queue full; spilling trade to disk")
+            self._spill([record])
+        return record["trade_id"]
+
+    def is_pending(self, trade_id: str) -> bool:
+        with self._pending_lock:
+            return trade_id in self._pending
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything submitted so far is written or spilled; False on timeout."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    # ---- flusher ----
+
+    def start(self):
+        """Start the flusher now (at process start) so an existing spill file is replayed."""
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trade-ingest", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        try:
+            self._replay_spill()
+        except Exception as e:
+            log_warn(f"Trade ingest: spill replay at startup failed ({e}); will retry")
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and not isinstance(batch[-1], threading.Event):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            markers = [r for r in batch if isinstance(r, threading.Event)]
+            records = [r for r in batch if not isinstance(r, threading.Event)]
+            if records:
+                self._write_batch(records)
+            for m in markers:
+                m.set()
+
+    def _write_batch(self, records):
+        delay = 0.1
+        for attempt in range(self.max_retries + 1):
+            try:
+                # Retries skip ids that made it in before a dropped reply.
+                write_trades(records, skip_existing=attempt > 0)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    log_err(f"Trade ingest: batch of {len(records)} failed ({e}); spilling to {self.spill_path}")
+                    break
+                time.sleep(delay)
+                delay = min(delay * 2, 2.0)
+                continue
+            self.written += len(records)
+            self._done(records)
+            # Outside the retry loop: a replay problem must not make this batch look failed.
+            try:
+                self._replay_spill()
+            except Exception as e:
+                log_warn(f"Trade ingest: spill replay failed ({e}); will retry")
+            return
+        self._spill(records)
+
+    def _done(self, records):
+        with self._pending_lock:
+            for r in records:
+                self._pending.discard(r["trade_id"])
+
+    # ---- spill file ----
+
+    def spill(self, records):
+        """Hand records to the spill file; they are written (skipping existing ids) on the next replay."""
+        self._spill(records)
+
+    def _spill(self, records):
+        with self._spill_lock, _file_lock(self.spill_path + ".lock"):
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for r in records:
+                    f.write(json.dumps(r, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self.spilled += len(records)
+        self._done(records)
+
+    def _replay_spill(self):
+        with _file_lock(self.spill_path + ".replay.lock", blocking=False) as owned:
+            if owned:  # else another process is replaying; the next flush tries again
+                self._replay_owned()
+
+    def _replay_owned(self):
+        replay_path = self.spill_path + ".replay"
+        with self._spill_lock, _file_lock(self.spill_path + ".lock"):
+            if os.path.exists(self.spill_path):
+                # Append rather than rename so a replay file left by a crash is not clobbered.
+                with open(self.spill_path, encoding="utf-8") as src, open(replay_path, "a", encoding="utf-8") as dst:
+                    dst.write(src.read())
+                os.remove(self.spill_path)
+        if not os.path.exists(replay_path):
+            return
+        records, bad = [], []
+        with open(replay_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record, dict) or "trade_id" not in record:
+                        raise ValueError("not a trade record")
+                    records.append(record)
+                except ValueError:
+                    bad.append(line if line.endswith("\n") else line + "\n")
+        if bad:
+            # e.g. a line cut short by a crash mid-spill; kept aside for inspection, not retried.
+            with open(self.spill_path + ".bad", "a", encoding="utf-8") as f:
+                f.writelines(bad)
+            log_warn(f"Trade ingest: {len(bad)} unreadable spill line(s) moved to {self.spill_path}.bad")
+        try:
+            for i in range(0, len(records), self.batch_size):
+                write_trades(records[i:i + self.batch_size], skip_existing=True)
+        except Exception as e:
+            log_warn(f"Trade ingest: spill replay failed ({e}); will retry")
+            with self._spill_lock, _file_lock(self.spill_path + ".lock"), \
+                    open(self.spill_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(r, separators=(",", ":")) + "\n" for r in records[i:])
+            os.remove(replay_path)
+            return
+        os.remove(replay_path)
+        log_info(f"Trade ingest: replayed {len(records)} spilled trades")
+
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+
+def get_ingestor() -> TradeIngestor:
+    """Process-wide ingestor shared by all runners."""
+    global _ingestor
+    if _ingestor is None:
+        with _ingestor_lock:
+            if _ingestor is None:
+                _ingestor = TradeIngestor()
+    return _ingestor
+
+
+metrics.gauge("bot_trade_ingest_queue_depth", "Trades waiting for the write-behind flusher.",
+              lambda: _ingestor.depth() if _ingestor else 0)
+
+
+def submit_trade(*args, **kwargs) -> str:
+    return get_ingestor().submit(*args, **kwargs)
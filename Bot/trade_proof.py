@@ -1,11 +1,12 @@
 import json
 import time
-
-import requests
-from web3 import Web3
+from concurrent.futures import ThreadPoolExecutor
 
 import config
-from uniswap import load_abi
+import pinning
+from bot_logger import info as log_info, warning as log_warn
+from ipfs_cid import cid_for_bytes
+from uniswap import load_abi, tx_lock
 
 
 def build_trade_metadata(receipt, signal, token_in, token_out, amount_in_raw,
@@ -31,57 +32,119 @@ def build_trade_metadata(receipt, signal, token_in, token_out, amount_in_raw,
     }
 
 
-def pin_to_ipfs(metadata):
-    """Pin a JSON object to IPFS via Pinata V3 Files API and return the CID."""
-    url = "https://uploads.pinata.cloud/v3/files"
-    headers = {
-        "Authorization": f"Bearer {config.PINATA_JWT}",
-    }
-    # V3 API uses multipart form-data with a file upload
-    json_bytes = json.dumps(metadata).encode("utf-8")
-    files = {
-        "file": (f"trade-{metadata['tx_hash'][:10]}.json", json_bytes, "application/json"),
-    }
-    data = {
-        "network": "public",
-        "name": f"trade-{metadata['tx_hash'][:10]}",
-    }
-    resp = requests.post(url, headers=headers, files=files, data=data, timeout=30)
-    resp.raise_for_status()
-    result = resp.json()
-    cid = result["data"]["cid"]
+def proof_bytes(obj):
+    """The exact bytes pinned for a proof document; its CID is computed from these."""
+    return json.dumps(obj).encode("utf-8")
+
+
+def proof_cid(obj):
+    """IPFS CIDv1 of a proof document, computed locally (no upload)."""
+    return cid_for_bytes(proof_bytes(obj))
+
+
+def _pin_json(obj, name):
+    """Pin a JSON object through the configured backend and return its CID.
+
+    Raises if the backend stored it under a different CID than the one computed
+    locally, since that is the CID already (or about to be) logged on-chain.
+    """
+    data = proof_bytes(obj)
+    expected = cid_for_bytes(data)
+    cid = pinning.get_backend().pin(data, f"{name}.json")
+    if cid != expected:
+        raise RuntimeError(f"pinning backend returned CID {cid}, expected {expected}")
     return cid
 
 
-def log_trade_on_chain(w3, account, swap_tx_hash_hex, cid):
-    """Call TradeLogger.logTrade(swapTxHash, cid) on Sepolia."""
-    abi = load_abi("trade_logger_abi.json")
-    contract = w3.eth.contract(
-        address=Web3.to_checksum_address(config.TRADE_LOGGER_ADDRESS),
-        abi=abi,
+def pin_to_ipfs(metadata):
+    """Pin one trade's metadata and return the CID."""
+    return _pin_json(metadata, f"trade-{metadata['tx_hash'][:10]}")
+
+
+def pin_batch_to_ipfs(batch_doc):
+    """Pin a batch document (see proof_queue batch mode) and return the CID."""
+    return _pin_json(batch_doc, f"batch-{batch_doc['merkle_root'][:10]}")
+
+
+# logBatch(bytes32,string,uint256). The compiled dispatcher PUSH4es every selector, so a
+# logger deployed from bytecode without batch support does not contain it.
+LOG_BATCH_SELECTOR = bytes.fromhex("a7e30e34")
+
+
+def logger_supports_batches(w3):
+    """True if the TradeLogger at TRADE_LOGGER_ADDRESS was deployed with logBatch."""
+    code = w3.eth.get_code(w3.to_checksum_address(config.TRADE_LOGGER_ADDRESS))
+    return LOG_BATCH_SELECTOR in bytes(code)
+
+
+def _trade_logger(w3):
+    return w3.eth.contract(
+        address=w3.to_checksum_address(config.TRADE_LOGGER_ADDRESS),
+        abi=load_abi("trade_logger_abi.json"),
     )
 
+
+def send_log_trade(w3, account, swap_tx_hash_hex, cid):
+    """Broadcast TradeLogger.logTrade(swapTxHash, cid); returns the tx hash without waiting."""
+    contract = _trade_logger(w3)
+    swap_tx_hash_bytes32 = bytes.fromhex(swap_tx_hash_hex.replace("0x", ""))
+
+    with tx_lock:
+        nonce = w3.eth.get_transaction_count(account.address, "pending")
+        tx = contract.functions.logTrade(swap_tx_hash_bytes32, cid).build_transaction({
+            "from": account.address,
+            "nonce": nonce,
+            "maxFeePerGas": w3.eth.gas_price * 2,
+            "maxPriorityFeePerGas": w3.to_wei(2, "gwei"),
+        })
+
+        signed = account.sign_transaction(tx)
+        return w3.eth.send_raw_transaction(signed.raw_transaction)
+
+
+def logged_cid(w3, swap_tx_hash_hex):
+    """CID already recorded on-chain for a swap, or "" when it has not been logged."""
     swap_tx_hash_bytes32 = bytes.fromhex(swap_tx_hash_hex.replace("0x", ""))
+    _trader, cid, _ts = _trade_logger(w3).functions.getTradeByHash(swap_tx_hash_bytes32).call()
+    return cid
 
-    nonce = w3.eth.get_transaction_count(account.address)
-    tx = contract.functions.logTrade(swap_tx_hash_bytes32, cid).build_transaction({
-        "from": account.address,
-        "nonce": nonce,
-        "maxFeePerGas": w3.eth.gas_price * 2,
-        "maxPriorityFeePerGas": w3.to_wei(2, "gwei"),
-    })
 
-    signed = account.sign_transaction(tx)
-    tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
+def log_trade_on_chain(w3, account, swap_tx_hash_hex, cid):
+    """Call TradeLogger.logTrade(swapTxHash, cid) on Sepolia."""
+    tx_hash = send_log_trade(w3, account, swap_tx_hash_hex, cid)
     receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
     return receipt
 
 
+def send_log_batch(w3, account, merkle_root_hex, cid, count):
+    """Broadcast TradeLogger.logBatch(merkleRoot, cid, count); returns the tx hash."""
+    contract = _trade_logger(w3)
+    root_bytes32 = bytes.fromhex(merkle_root_hex.replace("0x", ""))
+
+    with tx_lock:
+        nonce = w3.eth.get_transaction_count(account.address, "pending")
+        tx = contract.functions.logBatch(root_bytes32, cid, count).build_transaction({
+            "from": account.address,
+            "nonce": nonce,
+            "maxFeePerGas": w3.eth.gas_price * 2,
+            "maxPriorityFeePerGas": w3.to_wei(2, "gwei"),
+        })
+
+        signed = account.sign_transaction(tx)
+        return w3.eth.send_raw_transaction(signed.raw_transaction)
+
+
+def batch_logged(w3, merkle_root_hex):
+    """True when a batch with this Merkle root is already anchored on-chain."""
+    root_bytes32 = bytes.fromhex(merkle_root_hex.replace("0x", ""))
+    return _trade_logger(w3).functions.batchIdByRoot(root_bytes32).call() != 0
+
+
 def record_trade_proof(w3, account, receipt, signal, token_in, token_out,
                        amount_in_raw, quoted_amount_out, slippage_percent,
                        current_price, short_sma, long_sma,
                        token_in_decimals, token_out_decimals):
-    """End-to-end: build metadata → pin to IPFS → log on-chain.
+    """End-to-end: build metadata → log on-chain while pinning to IPFS.
 
     Wrapped in try/except so proof logging never interrupts trading.
     """
@@ -93,20 +156,22 @@ def record_trade_proof(w3, account, receipt, signal, token_in, token_out,
             short_sma, long_sma, token_in_decimals, token_out_decimals,
         )
 
-        # 2. Pin to IPFS
-        print(f"[TradeProof] Pinning trade metadata to IPFS...")
-        cid = pin_to_ipfs(metadata)
-        print(f"[TradeProof] IPFS CID: {cid}")
-        print(f"[TradeProof] View: https://gateway.pinata.cloud/ipfs/{cid}")
-
-        # 3. Log on-chain
-        print(f"[TradeProof] Logging proof on-chain...")
-        log_receipt = log_trade_on_chain(
-            w3, account, receipt["transactionHash"].hex(), cid,
-        )
-        print(f"[TradeProof] On-chain TX: {log_receipt['transactionHash'].hex()}")
-        print(f"[TradeProof] Etherscan: https://sepolia.etherscan.io/tx/{log_receipt['transactionHash'].hex()}")
+        # 2. Address the metadata locally and pin it in the background
+        cid = proof_cid(metadata)
+        log_info(f"[TradeProof] IPFS CID: {cid}")
+        log_info(f"[TradeProof] View: https://gateway.pinata.cloud/ipfs/{cid}")
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pinned = pool.submit(pin_to_ipfs, metadata)
+
+            # 3. Log on-chain
+            log_info("[TradeProof] Logging proof on-chain...")
+            log_receipt = log_trade_on_chain(
+                w3, account, receipt["transactionHash"].hex(), cid,
+            )
+            pinned.result()
+        log_info(f"[TradeProof] On-chain TX: {log_receipt['transactionHash'].hex()}")
+        log_info(f"[TradeProof] Etherscan: https://sepolia.etherscan.io/tx/{log_receipt['transactionHash'].hex()}")
 
     except Exception as e:
-        print(f"[TradeProof] WARNING: Proof logging failed: {e}")
-        print(f"[TradeProof] Trading will continue normally.")
+        log_warn(f"[TradeProof] Proof logging failed: {e}")
+        log_warn("[TradeProof] Trading will continue normally.")
@@ -0,0 +1,194 @@
+"""Per-user and per-run trade rollups by minute, hour and day, maintained at write time.
+
+Every trade increments one hash per (scope, resolution) bucket inside the same
+MULTI/EXEC as the trade itself (see trade_store.write_trades):
+
+    rollup:user:<wallet>:<res>:<bucket_start_ms>
+    rollup:run:<run_id>:<res>:<bucket_start_ms>
+
+Only three fields per bucket are written: <SIDE>:<STATUS> counts and the per-side
+amount as gwei + wei-remainder counters (each an int64 HINCRBY, which avoids both
+float rounding and the int64 ceiling on raw wei sums). Totals, per-side and
+per-status counts are derived when a bucket is read. All six buckets of a trade are
+updated by one script call, so a trade costs one command rather than one per field.
+Older buckets that also carry the derived fields decode the same way.
+
+Queries read one key per bucket in the requested range, so a report costs O(buckets)
+regardless of how many trades it covers. A bucket the range only partly covers is
+rebuilt from finer buckets for the covered part, down to whole minutes, while those
+are retained; past that it is counted whole.
+"""
+
+import time
+from typing import Any, Dict, List, Optional
+
+import config
+from valkey_client import valkey
+
+RESOLUTIONS_MS = {
+    "minute": 60_000,
+    "hour": 3_600_000,
+    "day": 86_400_000,
+}
+# Fine-grained buckets are only useful for recent activity.
+RETENTION_SECONDS = {
+    "minute": 2 * 86_400,
+    "hour": 90 * 86_400,
+    "day": config.ROLLUP_DAY_RETENTION_DAYS * 86_400 or None,  # 0 keeps them forever
+}
+FINER = {"day": "hour", "hour": "minute"}
+GWEI = 10**9
+# Most bucket keys one query may read, whatever resolution it ends up with.
+MAX_BUCKETS = 5000
+
+
+def bucket_start(ts_ms: int, resolution: str) -> int:
+    size = RESOLUTIONS_MS[resolution]
+    return ts_ms - ts_ms % size
+
+
+def rollup_key(scope: str, scope_id: str, resolution: str, start_ms: int) -> str:
+    return f"rollup:{scope}:{scope_id}:{resolution}:{start_ms}"
+
+
+# KEYS: bucket keys. ARGV: count field, gwei field, remainder field, gwei, remainder,
+# then one TTL in seconds per key (0 = no expiry).
+_INCR_LUA = """
+for i, key in ipairs(KEYS) do
+  redis.call('HINCRBY', key, ARGV[1], 1)
+  if ARGV[4] ~= '0' then redis.call('HINCRBY', key, ARGV[2], ARGV[4]) end
+  if ARGV[5] ~= '0' then redis.call('HINCRBY', key, ARGV[3], ARGV[5]) end
+  local ttl = tonumber(ARGV[5 + i])
+  if ttl > 0 then redis.call('EXPIRE', key, ttl) end
+end
+"""
+
+_incr_script = valkey.register_script(_INCR_LUA)
+
+
+def queue_rollup_writes(pipe, record: Dict[str, str]) -> None:
+    """Add the rollup increments for one built trade record to a pipeline."""
+    ts = int(record["ts"])
+    side = record["side"]
+    status = record.get("status", "CONFIRMED")
+    gwei, rem = divmod(int(record["amount_wei"]), GWEI)
+    keys, ttls = [], []
+    for resolution in RESOLUTIONS_MS:
+        start = bucket_start(ts, resolution)
+        for scope, scope_id in (("user", record["user_wallet"]), ("run", record["run_id"])):
+            keys.append(rollup_key(scope, scope_id, resolution, start))
+            ttls.append(RETENTION_SECONDS[resolution] or 0)
+    _incr_script(keys=keys, args=[f"{side}:{status}", f"{side}:amount_gwei", f"{side}:amount_wei_rem",
+                                  gwei, rem, *ttls], client=pipe)
+
+
+def _decode_bucket(start_ms: int, raw: Dict[str, int]) -> Dict[str, Any]:
+    by_side, by_status, by_side_status, amount_by_side = {}, {}, {}, {}
+    for field, value in raw.items():
+        if field.endswith(":amount_gwei") or field.endswith(":amount_wei_rem"):
+            side = field.split(":", 1)[0]
+            amount_by_side.setdefault(side, 0)
+            amount_by_side[side] += value * (GWEI if field.endswith("gwei") else 1)
+        elif ":" in field and not field.startswith("status:"):
+            side, status = field.split(":", 1)
+            by_side_status[field] = value
+            by_side[side] = by_side.get(side, 0) + value
+            by_status[status] = by_status.get(status, 0) + value
+        # Anything else is a derived field written by older versions.
+    return {
+        "ts": start_ms,
+        "trades": sum(by_side_status.values()),
+        "by_side": by_side,
+        "by_status": by_status,
+        "by_side_status": by_side_status,
+        "amount_wei": str(sum(amount_by_side.values())),
+        "amount_wei_by_side": {k: str(v) for k, v in amount_by_side.items()},
+    }
+
+
+def _retained(resolution: str, start_ms: int, now_ms: int) -> bool:
+    ttl = RETENTION_SECONDS[resolution]
+    return ttl is None or start_ms >= now_ms - ttl * 1000
+
+
+def _cover(lo: int, hi: int, resolution: str, now_ms: int) -> List[tuple]:
+    """(resolution, bucket_start) keys whose buckets together span [lo, hi]: whole
+    buckets where they fit, finer ones at the ends while the finer level is retained."""
+    size = RESOLUTIONS_MS[resolution]
+    finer = FINER.get(resolution)
+    out = []
+    for s in range(bucket_start(lo, resolution), hi + 1, size):
+        a, b = max(s, lo), min(s + size - 1, hi)
+        if (a, b) == (s, s + size - 1) or finer is None or not _retained(finer, bucket_start(a, finer), now_ms):
+            out.append((resolution, s))
+        else:
+            out.extend(_cover(a, b, finer, now_ms))
+    return out
+
+
+def pick_resolution(start_ms: int, end_ms: int, max_buckets: int = 500) -> str:
+    """Finest resolution that covers the range within max_buckets keys."""
+    for resolution, size in RESOLUTIONS_MS.items():
+        if (end_ms - start_ms) // size + 1 <= max_buckets:
+            return resolution
+    return "day"
+
+
+def get_rollups(
+    scope: str,
+    scope_id: str,
+    start_ms: int,
+    end_ms: int,
+    resolution: Optional[str] = None,
+    include_empty: bool = False,
+) -> List[Dict[str, Any]]:
+    """Buckets for a user ("user", wallet) or run ("run", run_id) in [start_ms, end_ms].
+
+    The first and last bucket count only trades inside the range, to the minute; they
+    are summed from finer buckets (see _cover). Where those have expired (minute
+    buckets after two days, hour buckets after 90), the edge bucket is counted whole.
+    All hashes are fetched in one pipelined round trip. Raises ValueError when the
+    range needs more than MAX_BUCKETS buckets at the chosen resolution.
+    """
+    if scope == "user":
+        scope_id = scope_id.lower()
+    resolution = resolution or pick_resolution(start_ms, end_ms)
+    size = RESOLUTIONS_MS[resolution]
+    if (end_ms - start_ms) // size + 1 > MAX_BUCKETS:
+        raise ValueError(f"range needs more than {MAX_BUCKETS} {resolution} buckets")
+    now = int(time.time() * 1000)
+    plan = []  # (bucket_start, [(resolution, start), ...]) in bucket order
+    for s in range(bucket_start(start_ms, resolution), end_ms + 1, size):
+        lo, hi = max(s, start_ms), min(s + size - 1, end_ms)
+        plan.append((s, _cover(lo, hi, resolution, now) if (lo, hi) != (s, s + size - 1) else [(resolution, s)]))
+    pipe = valkey.pipeline(transaction=False)
+    for _, parts in plan:
+        for res, part in parts:
+            pipe.hgetall(rollup_key(scope, scope_id, res, part))
+    hashes = iter(pipe.execute())
+    out = []
+    for s, parts in plan:
+        merged: Dict[str, int] = {}
+        for _ in parts:
+            for field, value in next(hashes).items():
+                merged[field] = merged.get(field, 0) + int(value)
+        if merged or include_empty:
+            out.append(_decode_bucket(s, merged))
+    return out
+
+
+def summarize(buckets: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Collapse buckets from get_rollups into range totals."""
+    total = {"trades": 0, "by_side": {}, "by_status": {}, "amount_wei": 0, "amount_wei_by_side": {}}
+    for b in buckets:
+        total["trades"] += b["trades"]
+        for k, v in b["by_side"].items():
+            total["by_side"][k] = total["by_side"].get(k, 0) + v
+        for k, v in b["by_status"].items():
+            total["by_status"][k] = total["by_status"].get(k, 0) + v
+        total["amount_wei"] += int(b["amount_wei"])
+        for k, v in b["amount_wei_by_side"].items():
+            total["amount_wei_by_side"][k] = total["amount_wei_by_side"].get(k, 0) + int(v)
+    total["amount_wei"] = str(total["amount_wei"])
+    total["amount_wei_by_side"] = {k: str(v) for k, v in total["amount_wei_by_side"].items()}
+    return total
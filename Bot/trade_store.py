@@ -1,7 +1,16 @@
+import json
 import time
 import uuid
-from typing import Optional, Dict, Any
-from valkey_client import valkey
+from itertools import islice
+import heapq
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+import config
+import trade_codec
+from redis.exceptions import ResponseError
+from trade_archive import DAY_MS, iter_archived
+from trade_rollups import queue_rollup_writes
+from valkey_client import valkey, valkey_raw
 
 def now_ms() -> int:
     return int(time.time() * 1000)
@@ -10,7 +19,13 @@ def new_run_id() -> str:
     # stable enough for hackathon; you can also do timestamp-based
     return f"run:{uuid.uuid4().hex}"
 
-def create_trade(
+def new_trade_id() -> str:
+    return f"trade:{uuid.uuid4().hex}"
+
+def trade_exists(trade_id: str) -> bool:
+    return bool(valkey.exists(trade_id))
+
+def build_trade(
     run_id: str,
     user_wallet: str,
     side: str,                 # "BUY" or "SELL"
@@ -21,9 +36,12 @@ def create_trade(
     to_wallet: Optional[str] = None,
     status: str = "CONFIRMED", # or "PENDING"
     meta: Optional[Dict[str, Any]] = None,
-) -> str:
-    ts = now_ms()
-    trade_id = f"trade:{uuid.uuid4().hex}"
+    trade_id: Optional[str] = None,  # pre-allocated id (see new_trade_id) for idempotent retries
+    ts: Optional[int] = None,        # ms; defaults to now (backfills pass the original time)
+) -> Dict[str, str]:
+    """Build the flat hash stored for a trade. Nothing is written until write_trades."""
+    ts = ts or now_ms()
+    trade_id = trade_id or new_trade_id()
 
     record = {
         "trade_id": trade_id,
@@ -45,28 +63,69 @@ def create_trade(
         # store a few useful fields; keep it flat to avoid JSON parsing complexity
         for k, v in meta.items():
             record[f"meta:{k}"] = str(v)
+    return record
 
-    # 1) store trade object
-    valkey.hset(trade_id, mapping=record)
+def _queue_trade_writes(pipe, record: Dict[str, str]) -> None:
+    trade_id = record["trade_id"]
+    run_id = record["run_id"]
+    ts = int(record["ts"])
+
+    # 1) store trade object, packed (see trade_codec)
+    pipe.set(trade_id, trade_codec.encode(record))
 
     # 2) index for analysis / dashboard
-    valkey.zadd(f"user:{user_wallet.lower()}:trades", {trade_id: ts})
-    valkey.zadd(f"{run_id}:trades", {trade_id: ts})
+    pipe.zadd(f"user:{record['user_wallet']}:trades", {trade_id: ts})
+    pipe.zadd(f"{run_id}:trades", {trade_id: ts})
 
     # 3) quick metrics per run
-    valkey.hincrby(f"{run_id}:metrics", "trades_total", 1)
-    if side == "BUY":
-        valkey.hincrby(f"{run_id}:metrics", "buy_confirmed", 1)
-    elif side == "SELL":
-        valkey.hincrby(f"{run_id}:metrics", "sell_confirmed", 1)
+    pipe.hincrby(f"{run_id}:metrics", "trades_total", 1)
+    if record["side"] == "BUY":
+        pipe.hincrby(f"{run_id}:metrics", "buy_confirmed", 1)
+    elif record["side"] == "SELL":
+        pipe.hincrby(f"{run_id}:metrics", "sell_confirmed", 1)
+
+    # 4) minute/hour/day rollups per user and per run (see trade_rollups)
+    queue_rollup_writes(pipe, record)
+
+def write_trades(records: list, skip_existing: bool = False) -> list:
+    """Write built trade records in one MULTI/EXEC round trip; returns the ids written.
+
+    With skip_existing, ids already in Valkey are left alone (one extra round trip),
+    which makes retrying or replaying a batch safe.
+    """
+    if skip_existing and records:
+        pipe = valkey.pipeline(transaction=False)
+        for r in records:
+            pipe.exists(r["trade_id"])
+        records = [r for r, found in zip(records, pipe.execute()) if not found]
+    if not records:
+        return []
+    # The trades, their indexes and the run metrics land together or not at all.
+    pipe = valkey.pipeline(transaction=True)
+    for r in records:
+        _queue_trade_writes(pipe, r)
+    pipe.execute()
+    return [r["trade_id"] for r in records]
+
+def create_trade(run_id: str, user_wallet: str, side: str, amount_wei: int, tx_ref: str, **kwargs) -> str:
+    """Write one trade synchronously (see build_trade for the optional fields)."""
+    record = build_trade(run_id, user_wallet, side, amount_wei, tx_ref, **kwargs)
+    write_trades([record])
+    return record["trade_id"]
+
+def create_trades(trades: list) -> list:
+    """Bulk insert (e.g. backfills): each item is a dict of create_trade kwargs.
 
-    return trade_id
+    All trades go out in a single transaction and round trip; chunk very large loads.
+    """
+    return write_trades([build_trade(**t) for t in trades])
 
-def start_run(user_wallet: str, buy_amount_wei: int = 10) -> str:
-    run_id = new_run_id()
+def start_run(user_wallet: str, buy_amount_wei: int = 10, run_id: Optional[str] = None) -> str:
+    run_id = run_id or new_run_id()
     ts = now_ms()
 
-    valkey.hset(run_id, mapping={
+    pipe = valkey.pipeline(transaction=True)
+    pipe.hset(run_id, mapping={
         "run_id": run_id,
         "user_wallet": user_wallet.lower(),
         "buy_amount_wei": str(buy_amount_wei),
@@ -74,14 +133,254 @@ def start_run(user_wallet: str, buy_amount_wei: int = 10) -> str:
         "started_ts": str(ts),
     })
 
-    valkey.zadd("runs:by_time", {run_id: ts})
-    valkey.zadd(f"user:{user_wallet.lower()}:runs", {run_id: ts})
+    pipe.zadd("runs:by_time", {run_id: ts})
+    pipe.zadd(f"user:{user_wallet.lower()}:runs", {run_id: ts})
+    pipe.execute()
     return run_id
 
 def stop_run(run_id: str, reason: str) -> None:
     ts = now_ms()
-    valkey.hset(run_id, mapping={
+    # A stopped run has nothing left to resume, so its checkpoint goes in the same transaction.
+    pipe = valkey.pipeline(transaction=True)
+    pipe.hset(run_id, mapping={
         "status": "STOPPED",
         "stop_reason": reason,
         "stopped_ts": str(ts),
     })
+    pipe.delete(checkpoint_key(run_id))
+    pipe.srem(ACTIVE_RUNS_KEY, run_id)
+    # Retention: a stopped run's own keys expire; its trades are archived long before.
+    ttl = config.RUN_RETENTION_DAYS * DAY_MS // 1000
+    for key in (run_id, f"{run_id}:metrics", f"{run_id}:trades", f"{run_id}:logs", f"{run_id}:traces"):
+        pipe.expire(key, ttl)
+    pipe.execute()
+
+# ---- Run checkpoints (crash-safe resume) ----
+# One compact JSON blob per unfinished run, plus a set of run ids that still need one.
+
+ACTIVE_RUNS_KEY = "runs:active"
+
+def checkpoint_key(run_id: str) -> str:
+    return f"{run_id}:checkpoint"
+
+def save_checkpoint(run_id: str, state: Dict[str, Any]) -> None:
+    pipe = valkey.pipeline(transaction=True)
+    pipe.set(checkpoint_key(run_id), json.dumps(state, separators=(",", ":")))
+    pipe.sadd(ACTIVE_RUNS_KEY, run_id)
+    pipe.execute()
+
+def load_checkpoint(run_id: str) -> Optional[Dict[str, Any]]:
+    raw = valkey.get(checkpoint_key(run_id))
+    return json.loads(raw) if raw else None
+
+def clear_checkpoint(run_id: str) -> None:
+    pipe = valkey.pipeline(transaction=True)
+    pipe.delete(checkpoint_key(run_id))
+    pipe.srem(ACTIVE_RUNS_KEY, run_id)
+    pipe.execute()
+
+def unfinished_runs() -> list:
+    """Checkpoints of runs that never reached stop_run, newest first."""
+    out = []
+    for run_id in valkey.smembers(ACTIVE_RUNS_KEY):
+        cp = load_checkpoint(run_id)
+        if cp is None:
+            valkey.srem(ACTIVE_RUNS_KEY, run_id)
+            continue
+        out.append(cp)
+    out.sort(key=lambda c: c.get("updated", 0), reverse=True)
+    return out
+
+# ---- Queries ----
+# Index pages come from the user/run sorted sets; the trade hashes for a page are fetched
+# in one pipelined round trip. Cursors are "<ts>:<trade_id>" of the last item returned,
+# so paging is stable even when several trades share a timestamp.
+
+MAX_PAGE_SIZE = 5000
+
+@dataclass
+class TradeRecord:
+    trade_id: str
+    run_id: str
+    user_wallet: str
+    side: str
+    amount_wei: int
+    tx_ref: str
+    status: str
+    ts: int
+    vault_address: Optional[str] = None
+    bot_wallet: Optional[str] = None
+    to_wallet: Optional[str] = None
+    meta: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_hash(cls, h: Dict[str, str]) -> "TradeRecord":
+        return cls(
+            trade_id=h["trade_id"],
+            run_id=h["run_id"],
+            user_wallet=h["user_wallet"],
+            side=h["side"],
+            amount_wei=int(h["amount_wei"]),
+            tx_ref=h.get("tx_ref", ""),
+            status=h.get("status", ""),
+            ts=int(h["ts"]),
+            vault_address=h.get("vault_address"),
+            bot_wallet=h.get("bot_wallet"),
+            to_wallet=h.get("to_wallet"),
+            meta={k[len("meta:"):]: v for k, v in h.items() if k.startswith("meta:")},
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {
+            "trade_id": self.trade_id,
+            "run_id": self.run_id,
+            "user_wallet": self.user_wallet,
+            "side": self.side,
+            "amount_wei": str(self.amount_wei),
+            "tx_ref": self.tx_ref,
+            "status": self.status,
+            "ts": self.ts,
+            "meta": self.meta,
+        }
+        for k in ("vault_address", "bot_wallet", "to_wallet"):
+            if getattr(self, k):
+                d[k] = getattr(self, k)
+        return d
+
+def _encode_cursor(ts: int, trade_id: str) -> str:
+    return f"{ts}:{trade_id}"
+
+def _decode_cursor(cursor: str) -> Tuple[int, str]:
+    ts, trade_id = cursor.split(":", 1)
+    return int(ts), trade_id
+
+def _iter_index(key: str, start_ms, end_ms, newest_first: bool, cursor: Optional[str],
+                chunk: int) -> Iterator[Tuple[str, int]]:
+    """Yield (trade_id, ts) from a trade index in order, resuming after `cursor`."""
+    lo = "-inf" if start_ms is None else start_ms
+    hi = "+inf" if end_ms is None else end_ms
+    after = _decode_cursor(cursor) if cursor else None
+    if after:
+        # Restart at the cursor's score (inclusive) and skip ties already returned.
+        if newest_first:
+            hi = after[0]
+        else:
+            lo = after[0]
+    offset = 0
+    while True:
+        if newest_first:
+            rows = valkey.zrevrangebyscore(key, hi, lo, start=offset, num=chunk, withscores=True)
+        else:
+            rows = valkey.zrangebyscore(key, lo, hi, start=offset, num=chunk, withscores=True)
+        for trade_id, score in rows:
+            score = int(score)
+            if after and score == after[0]:
+                # Ties come back in member order (descending when newest_first).
+                if (newest_first and trade_id >= after[1]) or (not newest_first and trade_id <= after[1]):
+                    continue
+            yield trade_id, score
+        if len(rows) < chunk:
+            return
+        offset += chunk
+
+def fetch_records(trade_ids: List[str]) -> List[Optional[Dict[str, str]]]:
+    """Hot trade records for ids, in order (None when missing), in one pipelined round trip.
+
+    Trades written before packed storage are hashes; those are read with a follow-up HGETALL.
+    """
+    pipe = valkey_raw.pipeline(transaction=False)
+    for tid in trade_ids:
+        pipe.get(tid)
+    raw = pipe.execute(raise_on_error=False)
+    legacy = [i for i, v in enumerate(raw) if isinstance(v, ResponseError)]
+    out = [trade_codec.decode(tid, v) if isinstance(v, bytes) else None for tid, v in zip(trade_ids, raw)]
+    if legacy:
+        pipe = valkey.pipeline(transaction=False)
+        for i in legacy:
+            pipe.hgetall(trade_ids[i])
+        for i, h in zip(legacy, pipe.execute()):
+            out[i] = h or None
+    return out
+
+def get_trades(trade_ids: List[str]) -> List[TradeRecord]:
+    """Fetch many hot trades in one pipelined round trip (missing ids are skipped)."""
+    if not trade_ids:
+        return []
+    return [TradeRecord.from_hash(r) for r in fetch_records(trade_ids) if r]
+
+def query_trades(
+    index_key: str,
+    start_ms: Optional[int] = None,
+    end_ms: Optional[int] = None,
+    side: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    newest_first: bool = True,
+    archive_match: Optional[Tuple[str, str]] = None,
+) -> Tuple[List[TradeRecord], Optional[str]]:
+    """One page of trades from a sorted-set index; returns (trades, next_cursor or None).
+
+    With archive_match=(field, value), archived trades (see trade_archive) with
+    record[field] == value are merged in, in the same order. Unfiltered pages of hot
+    trades cost two round trips (index range + pipelined GETs).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    # Filtering discards rows, so read ahead to fill the page in fewer round trips.
+    chunk = limit * 2 if (side or status) else limit
+    hot = ((ts, tid, None) for tid, ts in _iter_index(index_key, start_ms, end_ms, newest_first, cursor, chunk))
+    rows: Iterator[Tuple[int, str, Optional[Dict[str, str]]]] = hot
+    if archive_match:
+        cold = iter_archived(*archive_match, start_ms=start_ms, end_ms=end_ms, newest_first=newest_first,
+                             after=_decode_cursor(cursor) if cursor else None)
+        rows = heapq.merge(hot, cold, key=lambda r: (r[0], r[1]), reverse=newest_first)
+    out: List[TradeRecord] = []
+    last = None
+    while len(out) < limit:
+        batch = list(islice(rows, chunk))
+        if not batch:
+            return out, None
+        hot_ids = [tid for _, tid, r in batch if r is None]
+        fetched = dict(zip(hot_ids, fetch_records(hot_ids))) if hot_ids else {}
+        for ts, trade_id, r in batch:
+            if last and last[1] == trade_id:
+                continue  # in both tiers after an interrupted archive pass
+            last = (ts, trade_id)
+            r = r or fetched.get(trade_id)
+            if r and not (side and r.get("side") != side) and not (status and r.get("status") != status):
+                out.append(TradeRecord.from_hash(r))
+                if len(out) >= limit:
+                    break
+        if len(batch) < chunk and last == batch[-1][:2]:
+            return out, None
+    return out, _encode_cursor(*last)
+
+def get_user_trades(user_wallet: str, **kwargs) -> Tuple[List[TradeRecord], Optional[str]]:
+    """Trades for a wallet, hot and archived; see query_trades for range, filter and paging."""
+    wallet = user_wallet.lower()
+    return query_trades(f"user:{wallet}:trades", archive_match=("user_wallet", wallet), **kwargs)
+
+def get_run_trades(run_id: str, **kwargs) -> Tuple[List[TradeRecord], Optional[str]]:
+    """Trades for a run, hot and archived; see query_trades for range, filter and paging."""
+    return query_trades(f"{run_id}:trades", archive_match=("run_id", run_id), **kwargs)
+
+def get_run(run_id: str) -> Optional[Dict[str, Any]]:
+    """Run record plus its lifetime metrics (one round trip)."""
+    pipe = valkey.pipeline(transaction=False)
+    pipe.hgetall(run_id)
+    pipe.hgetall(f"{run_id}:metrics")
+    run, metrics = pipe.execute()
+    if not run:
+        return None
+    run["metrics"] = {k: int(v) for k, v in metrics.items()}
+    return run
+
+def get_user_runs(user_wallet: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """Most recent runs for a wallet, newest first."""
+    run_ids = valkey.zrevrange(f"user:{user_wallet.lower()}:runs", 0, limit - 1)
+    if not run_ids:
+        return []
+    pipe = valkey.pipeline(transaction=False)
+    for rid in run_ids:
+        pipe.hgetall(rid)
+    return [r for r in pipe.execute() if r]
@@ -0,0 +1,97 @@
+"""Small in-process TTL cache for API read endpoints.
+
+Entries live for a few seconds in each worker process. Concurrent misses on one key
+are single-flight: one thread computes and the others wait for its result, so a burst
+of dashboard polls costs one RPC/Valkey read per TTL instead of one per request.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+_MISS = object()
+
+
+class TTLCache:
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, expires_at)
+        self._inflight: dict = {}  # key -> Lock held by the computing thread
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                return entry[0]
+        return default
+
+    def set(self, key, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute, ttl: float, cacheable=lambda value: True):
+        value = self.get(key, _MISS)
+        if value is not _MISS:
+            self.hits += 1
+            return value
+        with self._lock:
+            lock = self._inflight.setdefault(key, threading.Lock())
+        with lock:
+            value = self.get(key, _MISS)  # filled while we waited
+            if value is not _MISS:
+                self.hits += 1
+                return value
+            self.misses += 1
+            try:
+                value = compute()
+                if cacheable(value):
+                    self.set(key, value, ttl)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def cached_view(ttl):
+    """Cache a GET view's successful responses per path + query string for `ttl()` seconds.
+
+    `ttl` is a callable so the value can come from config at request time; 0 disables.
+    """
+    cache = TTLCache()
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            seconds = ttl()
+            if seconds <= 0:
+                return view(*args, **kwargs)
+
+            def compute():
+                resp = make_response(view(*args, **kwargs))
+                # Every header the view set (full Content-Type with charset included);
+                # Content-Length is recomputed from the body.
+                headers = [(k, v) for k, v in resp.headers.items() if k.lower() != "content-length"]
+                return resp.status_code, resp.get_data(), headers
+
+            status, body, headers = cache.get_or_compute(
+                request.full_path, compute, seconds, cacheable=lambda v: v[0] == 200,
+            )
+            return Response(body, status=status, headers=headers)
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
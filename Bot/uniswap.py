@@ -1,9 +1,12 @@
+import functools
 import json
 import os
-
-from web3 import Web3
+import threading
 
 import config
+import metrics
+import tracing
+from bot_logger import debug as log_debug, info as log_info, error as log_err
 
 ABI_DIR = os.path.join(os.path.dirname(__file__), "abi")
 MAX_UINT256 = 2**256 - 1
@@ -13,13 +16,53 @@ DEFAULT_RPC_URL = "https://rpc.sepolia.org"
 DEFAULT_GAS_WEI = 2050  # 20 gwei
 SEPOLIA_CHAIN_ID = 11155111
 
+# Held from nonce lookup to broadcast. The proof worker (proof_queue) sends logTrade
+# transactions from the same account as the trading loop; without this, both could
+# pick the same nonce.
+tx_lock = threading.Lock()
+
+
+_clients: dict = {}  # RPC URL -> Web3
+_clients_lock = threading.Lock()
+
+
+@functools.cache
+def _timed_provider_class():
+    # web3 takes over a second to import, so it is imported with the first client.
+    from web3 import Web3
+
+    class TimedHTTPProvider(Web3.HTTPProvider):
+        """HTTPProvider that records per-method latency and errors in metrics."""
+
+        def make_request(self, method, params):
+            with metrics.RPC_SECONDS.time(method, errors=metrics.RPC_ERRORS):
+                response = super().make_request(method, params)
+            if "error" in response:
+                metrics.RPC_ERRORS.inc(method)
+            return response
+
+        def make_batch_request(self, batch_requests):
+            with metrics.RPC_SECONDS.time("batch", errors=metrics.RPC_ERRORS):
+                return super().make_batch_request(batch_requests)
+
+    return TimedHTTPProvider
+
 
 def get_web3():
-    """Create a Web3 instance connected to the configured RPC. Uses hardcoded Sepolia RPC if env not set."""
+    """Process-wide Web3 instance for the configured RPC. Uses hardcoded Sepolia RPC if env not set.
+
+    Created on first call and shared by every thread after that. It does not probe the
+    RPC: an unreachable endpoint fails the first call that uses it.
+    """
     rpc = (getattr(config, "RPC_URL", None) or os.getenv("RPC_URL") or "").strip() or DEFAULT_RPC_URL
-    w3 = Web3(Web3.HTTPProvider(rpc))
-    if not w3.is_connected():
-        raise ConnectionError(f"Failed to connect to RPC: {rpc}")
+    w3 = _clients.get(rpc)
+    if w3 is None:
+        with _clients_lock:
+            w3 = _clients.get(rpc)
+            if w3 is None:
+                from web3 import Web3
+
+                w3 = _clients[rpc] = Web3(_timed_provider_class()(rpc))
     return w3
 
 
@@ -49,42 +92,58 @@ def _gas_fee(w3):
     return DEFAULT_GAS_WEI
 
 
-def send_eth(w3, account, to_address, amount_wei):
-    """Send native ETH from account to to_address. Returns receipt."""
-    to_address = Web3.to_checksum_address(to_address)
-    nonce = w3.eth.get_transaction_count(account.address)
+def send_eth(w3, account, to_address, amount_wei, before_send=None):
+    """Send native ETH from account to to_address. Returns receipt.
+
+    The nonce is taken from the pending block and the transaction broadcast under
+    tx_lock, so runners and the proof worker sharing the account never collide.
+    `before_send(signed, nonce)` runs just before the broadcast (still under the lock),
+    e.g. to checkpoint the transaction so a resumed run can tell whether it went out.
+    """
+    to_address = w3.to_checksum_address(to_address)
     max_fee = _gas_fee(w3)
-    # Use explicit Sepolia chain ID so signer and RPC match (11155111)
-    tx = {
-        "from": account.address,
-        "to": to_address,
-        "value": amount_wei,
-        "nonce": nonce,
-        "gas": 21000,
-        "maxFeePerGas": max_fee,
-        "maxPriorityFeePerGas": min(Web3.to_wei(2, "gwei"), max_fee),
-        "chainId": SEPOLIA_CHAIN_ID,
-    }
-    signed = account.sign_transaction(tx)
-    tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
-    return w3.eth.wait_for_transaction_receipt(tx_hash)
+    with tx_lock:
+        nonce = w3.eth.get_transaction_count(account.address, "pending")
+        # Use explicit Sepolia chain ID so signer and RPC match (11155111)
+        tx = {
+            "from": account.address,
+            "to": to_address,
+            "value": amount_wei,
+            "nonce": nonce,
+            "gas": 21000,
+            "maxFeePerGas": max_fee,
+            "maxPriorityFeePerGas": min(w3.to_wei(2, "gwei"), max_fee),
+            "chainId": SEPOLIA_CHAIN_ID,
+        }
+        with tracing.span("sign"):
+            signed = account.sign_transaction(tx)
+        if before_send:
+            before_send(signed, nonce)
+        with tracing.span("send"):
+            tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
+    with tracing.span("confirm"):
+        return w3.eth.wait_for_transaction_receipt(tx_hash)
 
 
 def unwrap_weth(w3, account, amount_wei):
-    """Unwrap WETH to native ETH. Sends ETH to account."""
-    weth_address = Web3.to_checksum_address(config.TOKENS["WETH"]["address"])
+    """Unwrap WETH to native ETH. Sends ETH to account.
+
+    Like send_eth, the pending nonce is read and the transaction broadcast under tx_lock.
+    """
+    weth_address = w3.to_checksum_address(config.TOKENS["WETH"]["address"])
     weth_abi = [{"inputs": [{"name": "wad", "type": "uint256"}], "name": "withdraw", "outputs": [], "stateMutability": "nonpayable", "type": "function"}]
     weth = w3.eth.contract(address=weth_address, abi=weth_abi)
-    nonce = w3.eth.get_transaction_count(account.address)
     max_fee = _gas_fee(w3)
-    tx = weth.functions.withdraw(amount_wei).build_transaction({
-        "from": account.address,
-        "nonce": nonce,
-        "maxFeePerGas": max_fee,
-        "maxPriorityFeePerGas": min(Web3.to_wei(2, "gwei"), max_fee),
-    })
-    signed = account.sign_transaction(tx)
-    tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
+    with tx_lock:
+        nonce = w3.eth.get_transaction_count(account.address, "pending")
+        tx = weth.functions.withdraw(amount_wei).build_transaction({
+            "from": account.address,
+            "nonce": nonce,
+            "maxFeePerGas": max_fee,
+            "maxPriorityFeePerGas": min(w3.to_wei(2, "gwei"), max_fee),
+        })
+        signed = account.sign_transaction(tx)
+        tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
     return w3.eth.wait_for_transaction_receipt(tx_hash)
 
 
@@ -92,10 +151,10 @@ def get_token_balance(w3, wallet_address, token_address):
     """Get the ERC-20 token balance for a wallet (raw units)."""
     erc20_abi = load_abi("erc20.json")
     token = w3.eth.contract(
-        address=Web3.to_checksum_address(token_address), abi=erc20_abi
+        address=w3.to_checksum_address(token_address), abi=erc20_abi
     )
     return token.functions.balanceOf(
-        Web3.to_checksum_address(wallet_address)
+        w3.to_checksum_address(wallet_address)
     ).call()
 
 
@@ -103,34 +162,35 @@ def check_and_approve(w3, account, token_address, spender_address, amount):
     """Check allowance and approve if insufficient. Uses infinite approval."""
     erc20_abi = load_abi("erc20.json")
     token = w3.eth.contract(
-        address=Web3.to_checksum_address(token_address), abi=erc20_abi
+        address=w3.to_checksum_address(token_address), abi=erc20_abi
     )
 
     current_allowance = token.functions.allowance(
-        account.address, Web3.to_checksum_address(spender_address)
+        account.address, w3.to_checksum_address(spender_address)
     ).call()
 
     if current_allowance >= amount:
-        print(f"  Allowance sufficient ({current_allowance}), skipping approval.")
+        log_debug(f"  Allowance sufficient ({current_allowance}), skipping approval.")
         return None
 
-    print(f"  Approving {token_address} for spending...")
-    nonce = w3.eth.get_transaction_count(account.address)
-    max_fee = _gas_fee(w3)
-    tx = token.functions.approve(
-        Web3.to_checksum_address(spender_address), MAX_UINT256
-    ).build_transaction({
-        "from": account.address,
-        "nonce": nonce,
-        "maxFeePerGas": max_fee,
-        "maxPriorityFeePerGas": min(Web3.to_wei(2, "gwei"), max_fee),
-    })
-
-    signed = account.sign_transaction(tx)
-    tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
-    print(f"  Approval tx sent: {tx_hash.hex()}")
+    log_info(f"  Approving {token_address} for spending...")
+    with tx_lock:
+        nonce = w3.eth.get_transaction_count(account.address, "pending")
+        max_fee = _gas_fee(w3)
+        tx = token.functions.approve(
+            w3.to_checksum_address(spender_address), MAX_UINT256
+        ).build_transaction({
+            "from": account.address,
+            "nonce": nonce,
+            "maxFeePerGas": max_fee,
+            "maxPriorityFeePerGas": min(w3.to_wei(2, "gwei"), max_fee),
+        })
+
+        signed = account.sign_transaction(tx)
+        tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
+    log_info(f"  Approval tx sent: {tx_hash.hex()}")
     receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-    print(f"  Approval confirmed in block {receipt['blockNumber']}")
+    log_info(f"  Approval confirmed in block {receipt['blockNumber']}")
     return receipt
 
 
@@ -138,12 +198,12 @@ def get_quote(w3, token_in, token_out, fee, amount_in):
     """Get expected output amount from the Uniswap V3 Quoter (static call)."""
     quoter_abi = load_abi("quoter.json")
     quoter = w3.eth.contract(
-        address=Web3.to_checksum_address(config.QUOTER_ADDRESS), abi=quoter_abi
+        address=w3.to_checksum_address(config.QUOTER_ADDRESS), abi=quoter_abi
     )
     # QuoterV2 takes a struct as a tuple
     params = (
-        Web3.to_checksum_address(token_in),
-        Web3.to_checksum_address(token_out),
+        w3.to_checksum_address(token_in),
+        w3.to_checksum_address(token_out),
         amount_in,
         fee,
         0,  # sqrtPriceLimitX96 = 0 means no limit
@@ -168,18 +228,19 @@ def execute_swap(w3, account, token_in, token_out, fee, amount_in, slippage_perc
     Returns:
         Tuple of (transaction receipt, quoted_amount_out).
     """
-    token_in = Web3.to_checksum_address(token_in)
-    token_out = Web3.to_checksum_address(token_out)
-    router_address = Web3.to_checksum_address(config.SWAP_ROUTER_ADDRESS)
-    weth_address = Web3.to_checksum_address(
+    token_in = w3.to_checksum_address(token_in)
+    token_out = w3.to_checksum_address(token_out)
+    router_address = w3.to_checksum_address(config.SWAP_ROUTER_ADDRESS)
+    weth_address = w3.to_checksum_address(
         config.TOKENS["WETH"]["address"]
     )
 
     # Get quote for amountOutMinimum
-    print(f"  Getting quote for swap...")
-    quoted_amount_out = get_quote(w3, token_in, token_out, fee, amount_in)
+    log_debug("  Getting quote for swap...")
+    with tracing.span("quote"):
+        quoted_amount_out = get_quote(w3, token_in, token_out, fee, amount_in)
     amount_out_minimum = int(quoted_amount_out * (1 - slippage_percent / 100))
-    print(f"  Quoted output: {quoted_amount_out}, min accepted: {amount_out_minimum}")
+    log_info(f"  Quoted output: {quoted_amount_out}, min accepted: {amount_out_minimum}")
 
     # Build params as a TUPLE (critical — web3.py encodes structs as ordered tuples)
     # SwapRouter02 has no deadline field (use multicall wrapper if needed)
@@ -200,23 +261,26 @@ def execute_swap(w3, account, token_in, token_out, fee, amount_in, slippage_perc
     is_native_eth = token_in == weth_address
     tx_value = amount_in if is_native_eth else 0
 
-    nonce = w3.eth.get_transaction_count(account.address)
-    max_fee = _gas_fee(w3)
-    tx = router.functions.exactInputSingle(params).build_transaction({
-        "from": account.address,
-        "value": tx_value,
-        "nonce": nonce,
-        "maxFeePerGas": max_fee,
-        "maxPriorityFeePerGas": min(Web3.to_wei(2, "gwei"), max_fee),
-    })
-
-    signed = account.sign_transaction(tx)
-    tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
-    print(f"  Swap tx sent: {tx_hash.hex()}")
-
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    with tx_lock:
+        with tracing.span("sign"):  # nonce, fees and gas estimate, then signature
+            nonce = w3.eth.get_transaction_count(account.address, "pending")
+            max_fee = _gas_fee(w3)
+            tx = router.functions.exactInputSingle(params).build_transaction({
+                "from": account.address,
+                "value": tx_value,
+                "nonce": nonce,
+                "maxFeePerGas": max_fee,
+                "maxPriorityFeePerGas": min(w3.to_wei(2, "gwei"), max_fee),
+            })
+            signed = account.sign_transaction(tx)
+        with tracing.span("send"):
+            tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
+    log_info(f"  Swap tx sent: {tx_hash.hex()}")
+
+    with tracing.span("confirm"):
+        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
     if receipt["status"] == 1:
-        print(f"  Swap confirmed in block {receipt['blockNumber']}")
+        log_info(f"  Swap confirmed in block {receipt['blockNumber']}")
     else:
-        print(f"  Swap FAILED in block {receipt['blockNumber']}")
+        log_err(f"  Swap FAILED in block {receipt['blockNumber']}")
     return receipt, quoted_amount_out
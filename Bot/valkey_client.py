@@ -1,17 +1,233 @@
+"""Shared Valkey clients.
+
+`valkey` (str responses) and `valkey_raw` (bytes responses) are created once per process
+by `create_client`, on first use rather than at import, and share one blocking connection pool per backend: redis-py clients
+are thread-safe, and a thread that finds every connection busy waits up to
+VALKEY_POOL_TIMEOUT for one instead of opening more. Connect/reset errors are retried
+with exponential backoff; socket timeouts are not retried (the command may have run).
+Idle pooled connections are PINGed before reuse after VALKEY_HEALTH_CHECK_INTERVAL.
+Every command's latency is recorded in metrics by command name (pipelines as PIPELINE).
+
+VALKEY_BACKEND=memory swaps in an in-process server (fakeredis, from requirements-dev.txt)
+so trade_store, the runner, the tests and benchmarks work with no Valkey running.
+"""
+
 import os
+import threading
+import time
+
 import redis
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError as RedisConnectionError, NoScriptError
+from redis.client import Pipeline
+from redis.retry import Retry
+
+import metrics
 
 VALKEY_HOST = os.getenv("VALKEY_HOST", "localhost")
 VALKEY_PORT = int(os.getenv("VALKEY_PORT", "6379"))
 VALKEY_DB = int(os.getenv("VALKEY_DB", "0"))
+VALKEY_BACKEND = os.getenv("VALKEY_BACKEND", "valkey").lower()  # valkey | memory
+VALKEY_MAX_CONNECTIONS = int(os.getenv("VALKEY_MAX_CONNECTIONS", "64"))
+VALKEY_POOL_TIMEOUT = float(os.getenv("VALKEY_POOL_TIMEOUT", "5"))
+VALKEY_SOCKET_TIMEOUT = float(os.getenv("VALKEY_SOCKET_TIMEOUT", "5"))
+VALKEY_CONNECT_TIMEOUT = float(os.getenv("VALKEY_CONNECT_TIMEOUT", "2"))
+VALKEY_RETRIES = int(os.getenv("VALKEY_RETRIES", "3"))
+VALKEY_HEALTH_CHECK_INTERVAL = int(os.getenv("VALKEY_HEALTH_CHECK_INTERVAL", "30"))
+
+_pools: dict = {}
+_memory_server = None
+_memory_client_cls = None
+_lock = threading.Lock()
+
+
+class _TimedPipeline(Pipeline):
+    def execute(self, raise_on_error=True):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        except Exception:
+            metrics.VALKEY_ERRORS.inc("PIPELINE")
+            raise
+        finally:
+            metrics.VALKEY_SECONDS.observe(time.perf_counter() - t0, "PIPELINE")
+
+
+class _Timed:
+    """Mixin for redis.Redis (and FakeRedis) clients that times each command."""
+
+    def execute_command(self, *args, **options):
+        t0 = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        except NoScriptError:
+            raise  # expected once per script; redis-py loads it and retries
+        except Exception:
+            metrics.VALKEY_ERRORS.inc(str(args[0]).upper())
+            raise
+        finally:
+            metrics.VALKEY_SECONDS.observe(time.perf_counter() - t0, str(args[0]).upper())
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return _TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class TimedRedis(_Timed, redis.Redis):
+    pass
+
+
+class _CountingPool(redis.BlockingConnectionPool):
+    """Blocking pool that counts its own connections, so health() need not read
+    redis-py internals."""
+
+    def reset(self):
+        super().reset()
+        self._count_lock = threading.Lock()
+        self.created = 0
+        self.in_use = 0
+
+    def make_connection(self):
+        conn = super().make_connection()
+        with self._count_lock:
+            self.created += 1
+        return conn
+
+    def get_connection(self, *args, **kwargs):
+        conn = super().get_connection(*args, **kwargs)
+        with self._count_lock:
+            self.in_use += 1
+        return conn
+
+    def release(self, connection):
+        with self._count_lock:
+            self.in_use = max(0, self.in_use - 1)
+        super().release(connection)
+
 
-valkey = redis.Redis(
-    host=VALKEY_HOST,
-    port=VALKEY_PORT,
-    db=VALKEY_DB,
-    decode_responses=True,  # strings instead of bytes
-)
+def _retry() -> Retry:
+    return Retry(ExponentialBackoff(cap=1.0, base=0.05), VALKEY_RETRIES,
+                 supported_errors=(RedisConnectionError,))
+
+
+def _pool(decode_responses: bool) -> redis.BlockingConnectionPool:
+    with _lock:
+        pool = _pools.get(decode_responses)
+        if pool is None:
+            pool = _CountingPool(
+                host=VALKEY_HOST,
+                port=VALKEY_PORT,
+                db=VALKEY_DB,
+                decode_responses=decode_responses,
+                max_connections=VALKEY_MAX_CONNECTIONS,
+                timeout=VALKEY_POOL_TIMEOUT,
+                socket_timeout=VALKEY_SOCKET_TIMEOUT,
+                socket_connect_timeout=VALKEY_CONNECT_TIMEOUT,
+                socket_keepalive=True,
+                health_check_interval=VALKEY_HEALTH_CHECK_INTERVAL,
+                retry=_retry(),
+                retry_on_error=[RedisConnectionError],
+            )
+            _pools[decode_responses] = pool
+        return pool
+
+
+def _memory_client(decode_responses: bool):
+    global _memory_server, _memory_client_cls
+    try:
+        import fakeredis
+    except ImportError as e:
+        raise RuntimeError("VALKEY_BACKEND=memory needs fakeredis: pip install -r requirements-dev.txt") from e
+    with _lock:
+        if _memory_server is None:
+            _memory_server = fakeredis.FakeServer()
+            _memory_client_cls = type("TimedFakeRedis", (_Timed, fakeredis.FakeRedis), {})
+    return _memory_client_cls(server=_memory_server, decode_responses=decode_responses)
+
+
+def create_client(decode_responses: bool = True, backend: str | None = None) -> redis.Redis:
+    """Client on the shared pool for this process (or the shared in-memory server)."""
+    if (backend or VALKEY_BACKEND) == "memory":
+        return _memory_client(decode_responses)
+    return TimedRedis(connection_pool=_pool(decode_responses))
+
+
+def create_async_client(decode_responses: bool = True):
+    """asyncio client with the same settings. asyncio pools belong to one event loop,
+    so create one per loop rather than sharing it across threads."""
+    if VALKEY_BACKEND == "memory":
+        import fakeredis
+        _memory_client(decode_responses)  # make sure the shared server exists
+        return fakeredis.FakeAsyncRedis(server=_memory_server, decode_responses=decode_responses)
+    import redis.asyncio as aioredis
+    from redis.asyncio.retry import Retry as AsyncRetry
+    pool = aioredis.BlockingConnectionPool(
+        host=VALKEY_HOST,
+        port=VALKEY_PORT,
+        db=VALKEY_DB,
+        decode_responses=decode_responses,
+        max_connections=VALKEY_MAX_CONNECTIONS,
+        timeout=VALKEY_POOL_TIMEOUT,
+        socket_timeout=VALKEY_SOCKET_TIMEOUT,
+        socket_connect_timeout=VALKEY_CONNECT_TIMEOUT,
+        socket_keepalive=True,
+        health_check_interval=VALKEY_HEALTH_CHECK_INTERVAL,
+        retry=AsyncRetry(ExponentialBackoff(cap=1.0, base=0.05), VALKEY_RETRIES,
+                         supported_errors=(RedisConnectionError,)),
+        retry_on_error=[RedisConnectionError],
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+
+class _LazyClient:
+    """Stands in for a shared client and creates it on first attribute access."""
+
+    __slots__ = ("_decode_responses", "_client")
+
+    def __init__(self, decode_responses: bool):
+        self._decode_responses = decode_responses
+        self._client = None
+
+    def _get(self):
+        client = self._client
+        if client is None:
+            with _client_lock:
+                if self._client is None:
+                    self._client = create_client(decode_responses=self._decode_responses)
+                client = self._client
+        return client
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def __repr__(self):
+        return f"<lazy {self._client!r}>"
+
+
+_client_lock = threading.Lock()
+
+valkey = _LazyClient(decode_responses=True)  # strings instead of bytes
+
+# Same server, bytes responses: for binary values such as packed trades (trade_codec).
+valkey_raw = _LazyClient(decode_responses=False)
 
 
 def valkey_ping() -> bool:
     return bool(valkey.ping())
+
+
+def health() -> dict:
+    """Round-trip latency and pool usage, for /health and monitoring."""
+    out = {"backend": VALKEY_BACKEND, "ok": False}
+    t0 = time.perf_counter()
+    try:
+        out["ok"] = bool(valkey.ping())
+        out["latency_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    except Exception as e:
+        out["error"] = str(e)
+    pool = _pools.get(True)
+    if pool is not None:
+        with pool._count_lock:
+            created, in_use = pool.created, pool.in_use
+        out["pool"] = {"max": pool.max_connections, "open": created, "in_use": in_use,
+                       "idle": max(0, created - in_use)}
+    return out
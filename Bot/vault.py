@@ -2,6 +2,7 @@ from web3 import Web3
 
 import config
 from uniswap import load_abi
+from vault_cache import get_vault_cache
 
 # address(0) represents native ETH in the vault's token mappings
 ETH_TOKEN = "0x0000000000000000000000000000000000000000"
@@ -26,10 +27,8 @@ def get_smart_account_vault_balance(w3, vault_address, smart_account_address):
     On contract revert or RPC error, raises VaultError with a clear message.
     """
     contract = get_vault_contract(w3, vault_address)
-    eth_token = Web3.to_checksum_address(ETH_TOKEN)
-    account = Web3.to_checksum_address(smart_account_address)
     try:
-        return contract.functions.balances(eth_token, account).call()
+        return get_vault_cache(w3).get(contract, "balances", ETH_TOKEN, smart_account_address)
     except Exception as e:
         # Contract revert (e.g. custom error) or RPC error; avoid surfacing raw revert data
         raise VaultError("Vault balance read failed (contract reverted or RPC error)") from e
@@ -110,26 +109,23 @@ class Vault:
             address=Web3.to_checksum_address(vault_addr),
             abi=abi,
         )
+        self.cache = get_vault_cache(w3)
 
     # ---- Read methods ----
 
     def get_vault_balance(self):
         """Return bot's ETH balance in the vault (wei)."""
-        return self.contract.functions.balances(
-            self.eth_token, self.account.address
-        ).call()
+        return self.cache.get(self.contract, "balances", self.eth_token, self.account.address)
 
     def get_withdrawal_count(self):
         """Return how many times the current session key has withdrawn."""
-        return self.contract.functions.withdrawalCount(
-            self.eth_token, self.account.address, self.session_key
-        ).call()
+        return self.cache.get(
+            self.contract, "withdrawalCount", self.eth_token, self.account.address, self.session_key
+        )
 
     def get_max_withdrawals(self):
         """Return the on-chain max withdrawal count for ETH."""
-        return self.contract.functions.maxWithdrawalsPerAccount(
-            self.eth_token
-        ).call()
+        return self.cache.get(self.contract, "maxWithdrawalsPerAccount", self.eth_token)
 
     def can_withdraw(self):
         """Return True if the session key still has withdrawals remaining."""
@@ -156,6 +152,7 @@ class Vault:
         tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
         receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
 
+        self.cache.invalidate(self.contract.address, account=self.account.address)
         if receipt["status"] != 1:
             raise VaultError(f"Vault withdrawal tx reverted: {tx_hash.hex()}")
         return receipt
@@ -173,6 +170,7 @@ class Vault:
         signed = self.account.sign_transaction(tx)
         tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
         receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+        self.cache.invalidate(self.contract.address, account=self.account.address)
         if receipt["status"] != 1:
             raise VaultError(f"Vault deposit tx reverted: {tx_hash.hex()}")
         return receipt
@@ -0,0 +1,170 @@
+"""In-memory cache of MockVault reads shared by every Vault and runner in the process.
+
+Entries are keyed by (vault, function, token, account, session key). State that
+changes with withdrawals and deposits (balances, withdrawalCount, totalWithdrawn)
+lives up to VAULT_STATE_TTL seconds. Limits (maxWithdrawalsPerAccount,
+getEffectiveLimits), which only change when the owner or account sets them, live
+VAULT_LIMITS_TTL seconds.
+
+Both are invalidated by the vault's own events. At most every
+VAULT_CACHE_POLL_INTERVAL seconds a read checks the head block. When new blocks have
+arrived, one eth_getLogs call over the cached vaults drops what they touched:
+
+    Deposited / Withdrawn / WithdrawnTo(user)   every entry for that account
+    TokenLimitsSet(token)                       every limits entry for that token
+    MyTokenLimitsSet(account, token)            that account's limits entries
+
+If the log fetch fails, all state entries are dropped (limits stay). Reads in between
+polls are answered from memory. Vault's own writes invalidate their account directly.
+"""
+
+import threading
+import time
+
+from eth_utils import keccak
+from web3 import Web3
+
+import config
+from bot_logger import warning as log_warn
+
+_LIMIT_FNS = ("maxWithdrawalsPerAccount", "getEffectiveLimits")
+_TOPIC_ACCOUNT = {  # event topic0 -> index of the indexed account topic
+    "0x" + keccak(text="Deposited(address,uint256)").hex(): 1,
+    "0x" + keccak(text="Withdrawn(address,uint256)").hex(): 1,
+    "0x" + keccak(text="WithdrawnTo(address,address,uint256)").hex(): 1,
+}
+_TOPIC_TOKEN_LIMITS = "0x" + keccak(text="TokenLimitsSet(address,uint256,uint256)").hex()
+_TOPIC_MY_LIMITS = "0x" + keccak(text="MyTokenLimitsSet(address,address,uint256,uint256)").hex()
+
+
+def _hex(value) -> str:
+    h = value.hex() if isinstance(value, (bytes, bytearray)) else str(value)
+    h = h.lower()
+    return h if h.startswith("0x") else "0x" + h
+
+
+def _topic_address(topic) -> str:
+    return "0x" + _hex(topic)[-40:]
+
+
+class VaultStateCache:
+    def __init__(self, w3, poll_interval=None, state_ttl=None, limits_ttl=None):
+        self.w3 = w3
+        self.poll_interval = config.VAULT_CACHE_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.state_ttl = config.VAULT_STATE_TTL if state_ttl is None else state_ttl
+        self.limits_ttl = config.VAULT_LIMITS_TTL if limits_ttl is None else limits_ttl
+        self._entries: dict = {}  # (vault, fn, token, account, session_key) -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._head = None
+        self._polled = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    # ---- reads ----
+
+    def get(self, contract, fn: str, token: str = "", account: str = "", session_key: str = ""):
+        """contract.functions.<fn>(*args).call() through the cache; args follow the key order."""
+        key = (contract.address.lower(), fn, token.lower(), account.lower(), session_key.lower())
+        self._sync()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        args = [Web3.to_checksum_address(a) for a in (token, account, session_key) if a]
+        value = getattr(contract.functions, fn)(*args).call()
+        ttl = self.limits_ttl if fn in _LIMIT_FNS else self.state_ttl
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+        return value
+
+    # ---- invalidation ----
+
+    def invalidate(self, vault: str, account: str | None = None, token: str | None = None,
+                   limits_only: bool = False):
+        """Drop entries for a vault, optionally only one account's and/or one token's."""
+        vault = vault.lower()
+        account = account.lower() if account else None
+        token = token.lower() if token else None
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] != vault or (limits_only and key[1] not in _LIMIT_FNS):
+                    continue
+                if account and key[3] != account:
+                    continue
+                if token and key[2] != token:
+                    continue
+                del self._entries[key]
+
+    def clear(self, state_only: bool = False):
+        with self._lock:
+            if state_only:
+                self._entries = {k: v for k, v in self._entries.items() if k[1] in _LIMIT_FNS}
+            else:
+                self._entries.clear()
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self._polled < self.poll_interval:
+            return
+        self._polled = now
+        try:
+            head = self.w3.eth.block_number
+        except Exception as e:
+            log_warn(f"Vault cache: head poll failed ({e}); dropping cached state")
+            self.clear(state_only=True)
+            return
+        last, self._head = self._head, head
+        if last is None or head <= last:
+            return
+        with self._lock:
+            vaults = sorted({k[0] for k in self._entries})
+        if not vaults:
+            return
+        try:
+            logs = self.w3.eth.get_logs({
+                "fromBlock": last + 1,
+                "toBlock": head,
+                "address": [Web3.to_checksum_address(v) for v in vaults],
+            })
+        except Exception as e:
+            log_warn(f"Vault cache: getLogs {last + 1}-{head} failed ({e}); dropping cached state")
+            self.clear(state_only=True)
+            return
+        for log in logs:
+            self._apply(log)
+
+    def _apply(self, log):
+        vault = log["address"].lower()
+        topics = log["topics"]
+        topic0 = _hex(topics[0]) if topics else ""
+        if topic0 in _TOPIC_ACCOUNT:
+            self.invalidate(vault, account=_topic_address(topics[_TOPIC_ACCOUNT[topic0]]))
+        elif topic0 == _TOPIC_TOKEN_LIMITS:
+            self.invalidate(vault, token=_topic_address(topics[1]), limits_only=True)
+        elif topic0 == _TOPIC_MY_LIMITS:
+            self.invalidate(vault, account=_topic_address(topics[1]), token=_topic_address(topics[2]),
+                            limits_only=True)
+        elif topic0:
+            self.invalidate(vault)  # an event this cache does not know: play safe
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        return {"entries": size, "hits": self.hits, "misses": self.misses, "head": self._head}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_vault_cache(w3) -> VaultStateCache:
+    """Process-wide cache; the first caller's web3 connection is used for refreshes."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = VaultStateCache(w3)
+    return _cache
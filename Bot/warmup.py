@@ -0,0 +1,44 @@
+"""Background warm-up of the modules and clients that load on first use.
+
+web3 takes over a second to import, so the API and fleet workers only import it (with
+the chain helpers and the shared Web3 client) when a request or run first needs it.
+They start serving in a fraction of the time. `start()` then loads all of it on a
+daemon thread so that first request does not pay for it either. PREWARM=false turns
+this off; short-lived tools such as deploy_logger.py never call it.
+"""
+
+import importlib
+import threading
+import time
+
+import config
+from bot_logger import debug as log_debug, warning as log_warn
+
+# Imported in this order; each pulls in its own dependencies (web3, eth_utils, requests).
+MODULES = ("eth_utils", "requests", "vault", "vault_cache", "withdrawal_watch", "trade_proof")
+
+
+def warm():
+    t0 = time.perf_counter()
+    for name in MODULES:
+        importlib.import_module(name)
+    from uniswap import get_web3
+
+    get_web3()
+    log_debug(f"Warm-up done in {time.perf_counter() - t0:.2f}s")
+
+
+def _run():
+    try:
+        warm()
+    except Exception as e:
+        log_warn(f"Warm-up failed ({e}); modules load on first use instead")
+
+
+def start() -> threading.Thread | None:
+    """Warm up on a daemon thread (no-op when PREWARM is false)."""
+    if not config.PREWARM:
+        return None
+    thread = threading.Thread(target=_run, name="warmup", daemon=True)
+    thread.start()
+    return thread
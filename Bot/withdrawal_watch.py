@@ -0,0 +1,260 @@
+"""Confirm vault withdrawals from WithdrawnTo logs instead of balance polling.
+
+A BUY is filled when the frontend's smart account calls
+vault.withdrawTo(amount, recipient, sessionKey). `WithdrawalWatcher` runs one thread
+per process that polls eth_getLogs for WithdrawnTo on the vaults being waited on,
+every WITHDRAWAL_POLL_INTERVAL seconds. The poll is filtered to the waiting
+recipients, so many runners share one RPC call. A log matches a waiter when the
+vault, recipient and amount match and it is at or after the waiter's start block.
+The user (smart account) must also match when known. The event does not carry the
+session key, so a match is then checked against withdrawalCount(ETH, user,
+sessionKey): it must have gone up in that block. Where the node has pruned that
+block's state, the current count must be above the count just before the waiter's
+start block (read by expect()); with neither available the match is rejected. Each
+log confirms at most one waiter.
+
+getLogs ranges are at most INDEXER_MAX_BLOCK_RANGE blocks and halve when the RPC
+rejects one, as in event_indexer, so catching up after an outage still works.
+"""
+
+import threading
+
+from eth_utils import keccak
+from web3 import Web3
+
+import clock as clocks
+import config
+import metrics
+from bot_logger import warning as log_warn
+from uniswap import load_abi
+from vault import ETH_TOKEN
+
+WITHDRAWN_TO_TOPIC = "0x" + keccak(text="WithdrawnTo(address,address,uint256)").hex()
+
+
+def _hex(value) -> str:
+    h = value.hex() if isinstance(value, (bytes, bytearray)) else str(value)
+    h = h.lower()
+    return h if h.startswith("0x") else "0x" + h
+
+
+def _address_topic(address: str) -> str:
+    return "0x" + "0" * 24 + address.lower()[2:]
+
+
+class Withdrawal:
+    """One expected withdrawTo; `wait` returns the matching log's details or None."""
+
+    def __init__(self, vault, recipient, amount_wei, session_key=None, user=None, from_block=0):
+        self.vault = vault.lower()
+        self.recipient = recipient.lower()
+        self.amount_wei = int(amount_wei)
+        self.session_key = session_key.lower() if session_key else None
+        self.user = user.lower() if user else None
+        self.from_block = from_block
+        self.scanned_to = from_block - 1  # last block already searched for this waiter
+        self.base_count = None  # withdrawalCount just before from_block, when it could be read
+        self.match = None
+        self._done = threading.Event()
+
+    def wait(self, timeout: float | None = None) -> dict | None:
+        self._done.wait(timeout)
+        return self.match
+
+    def interrupt(self):
+        """Make a wait() in progress return now, without a match."""
+        self._done.set()
+
+
+class WithdrawalWatcher:
+    def __init__(self, w3, poll_interval=None, clock=None):
+        self.w3 = w3
+        self.clock = clock or clocks.REAL
+        self.poll_interval = config.WITHDRAWAL_POLL_INTERVAL if poll_interval is None else poll_interval
+        self._waiters: list[Withdrawal] = []
+        self._claimed: set = set()  # (tx_hash, log_index) already matched
+        self._scanned = None  # last block covered by the shared poll
+        self._span = config.INDEXER_MAX_BLOCK_RANGE  # getLogs blocks per request
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._contracts = {}
+
+    def expect(self, vault, recipient, amount_wei, session_key=None, user=None, from_block=None) -> Withdrawal:
+        """Start waiting for a withdrawTo at or after `from_block` (default: the current block)."""
+        if from_block is None:
+            from_block = self.w3.eth.block_number
+        w = Withdrawal(vault, recipient, amount_wei, session_key, user, from_block)
+        if w.session_key and w.user:
+            try:
+                w.base_count = self._withdrawal_count(w.vault, w.user, w.session_key).call(
+                    block_identifier=max(0, from_block - 1))
+            except Exception as e:
+                log_warn(f"Withdrawal watch: could not read withdrawalCount at block {from_block - 1} ({e})")
+        with self._lock:
+            self._waiters.append(w)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="withdrawal-watch", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return w
+
+    def cancel(self, w: Withdrawal):
+        with self._lock:
+            if w in self._waiters:
+                self._waiters.remove(w)
+
+    # ---- polling ----
+
+    def _run(self):
+        with self.clock.attach():
+            self._poll_loop()
+
+    def _poll_loop(self):
+        while True:
+            with self._lock:
+                waiters = list(self._waiters)
+            if not waiters:
+                self._scanned = None
+                with self._lock:
+                    if not self._waiters:
+                        self._thread = None
+                        return
+                continue
+            try:
+                self._poll(waiters)
+            except Exception as e:
+                log_warn(f"Withdrawal watch: poll failed ({e})")
+            self.clock.sleep(self.poll_interval, self._wakeup)
+            self._wakeup.clear()
+
+    def _poll(self, waiters: list):
+        head = self.w3.eth.block_number
+        if self._scanned is None:
+            self._scanned = head
+        # Waiters that start before the shared cursor get a one-off backfill up to it.
+        for w in waiters:
+            if w.scanned_to < self._scanned:
+                try:
+                    self._scan(w.scanned_to + 1, self._scanned, [w])
+                except Exception as e:
+                    log_warn(f"Withdrawal watch: backfill from block {w.scanned_to + 1} failed ({e})")
+        caught_up = [w for w in waiters if w.scanned_to >= self._scanned]
+        if head > self._scanned:
+            self._scan(self._scanned + 1, head, caught_up, shared=True)
+
+    def _scan(self, start: int, end: int, waiters: list, shared: bool = False):
+        """Search [start, end] in chunks, advancing scanned_to (and the shared cursor) per chunk."""
+        while start <= end:
+            stop = min(end, start + self._span - 1)
+            try:
+                self._scan_chunk(start, stop, waiters)
+            except Exception as e:
+                if stop == start:
+                    raise
+                self._span = max(1, (stop - start + 1) // 2)
+                log_warn(f"Withdrawal watch: getLogs {start}-{stop} failed ({e}); range now {self._span} blocks")
+                continue
+            for w in waiters:
+                w.scanned_to = stop
+            if shared:
+                self._scanned = stop
+            self._span = min(config.INDEXER_MAX_BLOCK_RANGE, self._span * 2)
+            start = stop + 1
+
+    def _scan_chunk(self, start: int, end: int, waiters: list):
+        waiters = [w for w in waiters if not w._done.is_set()]
+        if not waiters:
+            return
+        logs = self.w3.eth.get_logs({
+            "fromBlock": start,
+            "toBlock": end,
+            "address": sorted({Web3.to_checksum_address(w.vault) for w in waiters}),
+            "topics": [WITHDRAWN_TO_TOPIC, None, sorted({_address_topic(w.recipient) for w in waiters})],
+        })
+        for log in logs:
+            key = (_hex(log["transactionHash"]), log["logIndex"])
+            if key in self._claimed:
+                continue
+            for w in waiters:
+                if not w._done.is_set() and self._matches(w, log):
+                    w.match = {"tx_hash": key[0], "log_index": key[1], "block": log["blockNumber"],
+                               "user": "0x" + _hex(log["topics"][1])[-40:]}
+                    self._claimed.add(key)
+                    self.cancel(w)
+                    w._done.set()
+                    break
+
+    def _matches(self, w: Withdrawal, log) -> bool:
+        topics = log["topics"]
+        user = "0x" + _hex(topics[1])[-40:]
+        if log["address"].lower() != w.vault or log["blockNumber"] < w.from_block:
+            return False
+        if "0x" + _hex(topics[2])[-40:] != w.recipient or int(_hex(log["data"]), 16) != w.amount_wei:
+            return False
+        if w.user and user != w.user:
+            return False
+        if not w.session_key:
+            return True
+        return self._session_key_used(w, user, log["blockNumber"])
+
+    def _withdrawal_count(self, vault, user, session_key):
+        contract = self._contracts.get(vault)
+        if contract is None:
+            contract = self.w3.eth.contract(address=Web3.to_checksum_address(vault), abi=load_abi("mock_vault_abi.json"))
+            self._contracts[vault] = contract
+        return contract.functions.withdrawalCount(
+            Web3.to_checksum_address(ETH_TOKEN), Web3.to_checksum_address(user), Web3.to_checksum_address(session_key)
+        )
+
+    def _session_key_used(self, w: Withdrawal, user, block) -> bool:
+        count = self._withdrawal_count(w.vault, user, w.session_key)
+        try:
+            return count.call(block_identifier=block) > count.call(block_identifier=block - 1)
+        except Exception as e:
+            # Historical state can be pruned on non-archive nodes; fall back to the count
+            # read by expect(), and fail closed without it.
+            if w.base_count is None or user != w.user:
+                log_warn(f"Withdrawal watch: session key check at block {block} unavailable ({e}); rejecting match")
+                return False
+        try:
+            return count.call() > w.base_count
+        except Exception as e:
+            log_warn(f"Withdrawal watch: session key check failed ({e}); rejecting match")
+            return False
+
+
+_watchers: dict = {}  # clock -> WithdrawalWatcher
+_watcher_lock = threading.Lock()
+
+
+def get_withdrawal_watcher(w3, clock=None) -> WithdrawalWatcher:
+    """Shared watcher for a clock; the first caller's web3 connection is used for polling.
+
+    Runs on different clocks (a backtest next to live trading) get separate watchers, so
+    each one polls and sleeps in its own time. Idle watchers for other clocks are dropped.
+    """
+    clock = clock or clocks.REAL
+    watcher = _watchers.get(clock)
+    if watcher is None:
+        with _watcher_lock:
+            for other in [c for c, w in _watchers.items() if c is not clocks.REAL and c is not clock]:
+                if _watchers[other]._thread is None:
+                    del _watchers[other]
+            watcher = _watchers.get(clock)
+            if watcher is None:
+                watcher = _watchers[clock] = WithdrawalWatcher(w3, clock=clock)
+    return watcher
+
+
+metrics.gauge("bot_withdrawal_waiters", "BUY withdrawals waiting for a WithdrawnTo log.",
+              lambda: sum(len(w._waiters) for w in list(_watchers.values())))
+
+
+def wait_for_withdrawal(w3, timeout: float, **expect) -> dict | None:
+    watcher = get_withdrawal_watcher(w3)
+    w = watcher.expect(**expect)
+    try:
+        return w.wait(timeout)
+    finally:
+        watcher.cancel(w)
@@ -26,6 +26,15 @@ function getRedis() {
   return Promise.resolve(redisClient);
 }
 
+const BOT_API_URL =
+  process.env.BOT_API_URL || process.env.NEXT_PUBLIC_BOT_API_URL || "http://localhost:5001";
+
+async function botApi(path: string) {
+  const res = await fetch(`${BOT_API_URL}${path}`, { cache: "no-store" });
+  if (!res.ok) throw new Error(`${path}: ${res.status}`);
+  return res.json();
+}
+
 function parseGeminiJson(text: string) {
   const trimmed = text.trim();
   const fenced = trimmed.match(/^```(?:json)?\s*([\s\S]*?)\s*```$/i);
@@ -80,58 +89,57 @@ export async function GET(req: NextRequest) {
   try {
     redis = await getRedis();
   } catch {
-    // Redis unavailable (no VALKEY_URL / not running); use zeros from DB below
+    // Redis unavailable (no VALKEY_URL / not running); reports are just not cached
   }
 
-  if (redis) {
+  if (redis && !forceRefresh) {
     try {
-      if (!forceRefresh) {
-        const cached = await redis.get(cacheKey);
-        if (cached) return NextResponse.json(JSON.parse(cached));
-      }
-
-      const tradeIds = await redis.zRangeByScore(`user:${wallet}:trades`, start, end);
-      totalTrades = tradeIds.length;
-      const runIds = new Set<string>();
-
-      for (const tradeKey of tradeIds) {
-        try {
-          const t = await redis!.hGetAll(tradeKey);
-          const side = (t.side || "").toUpperCase();
-          const status = (t.status || "").toUpperCase();
-          const amountWei = BigInt(t.amount_wei || "0");
-
-          if (side === "BUY") { buyCount++; buyWei += amountWei; }
-          else if (side === "SELL") { sellCount++; sellWei += amountWei; }
-
-          if (status === "CONFIRMED") confirmed++;
-          else if (status === "PENDING") pending++;
-          else if (status === "FAILED") failed++;
-
-          const rid = (t.run_id || tradeKey).trim();
-          if (rid) runIds.add(rid);
-
-          if (sampleTrades.length < maxSamples) {
-            sampleTrades.push({
-              side,
-              amount_wei: t.amount_wei || "0",
-              status,
-              tx_ref: t.tx_ref || "",
-              ts: t.ts || "",
-              run_id: t.run_id || "",
-              to_wallet: t.to_wallet || "",
-            });
-          }
-        } catch {
-          // skip bad trade key
-        }
-      }
-      operationalRuns = runIds.size || (totalTrades > 0 ? 1 : 0);
+      const cached = await redis.get(cacheKey);
+      if (cached) return NextResponse.json(JSON.parse(cached));
     } catch {
-      // Redis read failed; keep zeros
+      // ignore cache read failure
     }
   }
 
+  // Trades are stored packed by the bot, so counts and samples come from its API:
+  // rollup buckets for the totals, one page of /trades for the samples, /runs for run counts.
+  try {
+    const query = `wallet=${wallet}&start=${start}&end=${end}`;
+    const [rollups, page, runs] = await Promise.all([
+      botApi(`/insights/rollups?${query}`),
+      botApi(`/trades?${query}&limit=${maxSamples}`),
+      botApi(`/runs?wallet=${wallet}&limit=500`),
+    ]);
+
+    const t = rollups.totals;
+    totalTrades = t.trades;
+    buyCount = t.by_side.BUY || 0;
+    sellCount = t.by_side.SELL || 0;
+    confirmed = t.by_status.CONFIRMED || 0;
+    pending = t.by_status.PENDING || 0;
+    failed = t.by_status.FAILED || 0;
+    buyWei = BigInt(t.amount_wei_by_side.BUY || "0");
+    sellWei = BigInt(t.amount_wei_by_side.SELL || "0");
+
+    for (const trade of page.trades) {
+      sampleTrades.push({
+        side: trade.side,
+        amount_wei: trade.amount_wei,
+        status: trade.status,
+        tx_ref: trade.tx_ref || "",
+        ts: String(trade.ts),
+        run_id: trade.run_id || "",
+        to_wallet: trade.to_wallet || "",
+      });
+    }
+
+    operationalRuns = runs.runs.filter((r: Record<string, string>) =>
+      Number(r.started_ts) <= end && (!r.stopped_ts || Number(r.stopped_ts) >= start)
+    ).length || (totalTrades > 0 ? 1 : 0);
+  } catch {
+    // Bot API unavailable; keep zeros
+  }
+
   const totals = {
     date: useRange ? "" : date,
     range_label: rangeLabel ?? undefined,
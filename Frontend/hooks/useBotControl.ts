@@ -5,6 +5,35 @@ import { useState, useCallback, useEffect, useRef } from "react";
 const BOT_API_URL =
   process.env.NEXT_PUBLIC_BOT_API_URL || "http://localhost:5001";
 
+// Fleet mode addresses every run by the run_id /bot/start returned; keep it across reloads.
+const RUN_ID_STORAGE_KEY = "bot_run_id";
+
+function loadRunId(): string | null {
+  if (typeof window === "undefined") return null;
+  try {
+    return localStorage.getItem(RUN_ID_STORAGE_KEY);
+  } catch {
+    return null;
+  }
+}
+
+function saveRunId(runId: string | null): void {
+  if (typeof window === "undefined") return;
+  try {
+    if (runId) localStorage.setItem(RUN_ID_STORAGE_KEY, runId);
+    else localStorage.removeItem(RUN_ID_STORAGE_KEY);
+  } catch {
+    // ignore
+  }
+}
+
+function withRunId(path: string, runId: string | null, params: Record<string, string> = {}): string {
+  const query = new URLSearchParams(params);
+  if (runId) query.set("run_id", runId);
+  const qs = query.toString();
+  return `${BOT_API_URL}${path}${qs ? `?${qs}` : ""}`;
+}
+
 export interface BotInfo {
   wallet_address: string;
   bot_recipient_address?: string; // Where vault withdrawals go (same as wallet_address when no key)
@@ -65,6 +94,8 @@ export interface BotStatus {
 }
 
 export interface BotLogEntry {
+  /** Monotonic sequence id; pass the last one back as `after` to get only newer entries */
+  seq: number;
   ts: number;
   level: string;
   msg: string;
@@ -90,7 +121,8 @@ export function useBotControl() {
   const [fundingStatus, setFundingStatus] = useState<FundingStatus>(null);
   const pollingRef = useRef<ReturnType<typeof setInterval> | null>(null);
   const logPollingRef = useRef<ReturnType<typeof setInterval> | null>(null);
-  const lastLogTsRef = useRef<number>(0);
+  const lastLogSeqRef = useRef<number>(0);
+  const runIdRef = useRef<string | null>(null);
 
   const fetchBotInfo = useCallback(async () => {
     try {
@@ -108,7 +140,9 @@ export function useBotControl() {
 
   const fetchBotStatus = useCallback(async () => {
     try {
-      const res = await fetch(`${BOT_API_URL}/bot/status`);
+      const res = await fetch(withRunId("/bot/status", runIdRef.current));
+      // Fleet mode without a known run: nothing to show yet.
+      if (res.status === 400 && !runIdRef.current) return null;
       if (!res.ok) throw new Error(`HTTP ${res.status}`);
       const data: BotStatus = await res.json();
       setBotStatus(data);
@@ -131,18 +165,17 @@ export function useBotControl() {
 
   const fetchLogs = useCallback(async () => {
     try {
-      const since = lastLogTsRef.current > 0 ? lastLogTsRef.current : undefined;
-      const url = since ? `${BOT_API_URL}/bot/logs?since=${since}` : `${BOT_API_URL}/bot/logs`;
+      const after = lastLogSeqRef.current > 0 ? lastLogSeqRef.current : undefined;
+      const url = withRunId("/bot/logs", runIdRef.current, after ? { after: String(after) } : {});
       const res = await fetch(url);
       if (!res.ok) throw new Error(`HTTP ${res.status}`);
       const data = await res.json();
       const newLogs: BotLogEntry[] = data.logs ?? [];
       if (newLogs.length > 0) {
-        const maxTs = Math.max(...newLogs.map((l) => l.ts));
-        lastLogTsRef.current = maxTs;
+        lastLogSeqRef.current = data.cursor ?? newLogs[newLogs.length - 1].seq;
         setLogs((prev) => {
-          const existing = new Set(prev.map((l) => `${l.ts}-${l.msg}`));
-          const appended = newLogs.filter((l) => !existing.has(`${l.ts}-${l.msg}`));
+          const lastSeq = prev.length > 0 ? prev[prev.length - 1].seq : 0;
+          const appended = newLogs.filter((l) => l.seq > lastSeq);
           return [...prev, ...appended].slice(-300);
         });
       }
@@ -157,7 +190,7 @@ export function useBotControl() {
       fetchBotStatus();
     }, 5000);
     // Also poll logs more frequently for real-time feel
-    lastLogTsRef.current = 0;
+    lastLogSeqRef.current = 0;
     fetchLogs();
     if (logPollingRef.current) return;
     logPollingRef.current = setInterval(() => {
@@ -181,6 +214,13 @@ export function useBotControl() {
           setError(data.message || `HTTP ${res.status}`);
           return false;
         }
+        if (data.run_id && data.run_id !== runIdRef.current) {
+          // Log seqs restart at 1 for every fleet run: drop the old run's cursor and lines.
+          runIdRef.current = data.run_id;
+          saveRunId(data.run_id);
+          lastLogSeqRef.current = 0;
+          setLogs([]);
+        }
         await fetchBotStatus();
         startPolling();
         return true;
@@ -200,7 +240,11 @@ export function useBotControl() {
     setLoading("stop");
     setError(null);
     try {
-      const res = await fetch(`${BOT_API_URL}/bot/stop`, { method: "POST" });
+      const res = await fetch(`${BOT_API_URL}/bot/stop`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(runIdRef.current ? { run_id: runIdRef.current } : {}),
+      });
       const data = await res.json();
       if (!res.ok) {
         setError(data.message || `HTTP ${res.status}`);
@@ -219,6 +263,7 @@ export function useBotControl() {
 
   // Fetch info and status on mount; resume polling if already running
   useEffect(() => {
+    runIdRef.current = loadRunId();
     fetchBotInfo();
     fetchBotStatus().then((status) => {
       if (status?.is_running) {